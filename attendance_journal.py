@@ -0,0 +1,247 @@
+# attendance_journal.py
+
+import os
+import json
+import time
+import datetime
+import logging
+import threading
+import pandas as pd
+
+ATTENDANCE_DIR = "Attendance"
+JOURNAL_DIR = os.path.join(ATTENDANCE_DIR, ".journal")
+CORRUPT_SUFFIX = ".corrupt"  # Unreadable journals are renamed to <name>.jsonl.corrupt
+
+# Journals currently written, resumed or finalized by this process; recovery must not touch them.
+_active_journals = set()
+_active_lock = threading.Lock()
+
+class AttendanceJournal:
+    """
+    An append-only, on-disk log of one attendance session.
+
+    Every recognition is written as a JSON line and fsynced to disk as soon as
+    it happens, so a crash never loses a recognized student. Each student is
+    recorded at most once per session, which keeps the fsyncs rare. When the
+    session ends, finalize() turns the journal into the usual
+    Attendance/<subject>/<subject>_<date>_<time>.csv sheet.
+    """
+    def __init__(self, path, subject, started_at):
+        self.path = path
+        self.subject = subject
+        self.started_at = started_at
+        self.present = {}  # enrollment -> {"Enrollment", "Name", "time", "confidence"}, in recognition order
+        self.last_event_at = started_at
+        self._file = None
+
+    @classmethod
+    def start(cls, subject, journal_dir=JOURNAL_DIR):
+        """Creates a new journal for a session that starts now."""
+        os.makedirs(journal_dir, exist_ok=True)
+        started_at = time.time()
+        stamp = datetime.datetime.fromtimestamp(started_at).strftime("%Y-%m-%d_%H-%M-%S")
+        journal = cls(os.path.join(journal_dir, f"{subject}_{stamp}.jsonl"), subject, started_at)
+        journal._open()
+        journal._write({"event": "session", "subject": subject, "started_at": started_at})
+        journal.flush()
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads an existing journal. A torn final line left by a crash is ignored.
+        The journal is not reopened for writing; call resume() for that.
+        """
+        journal = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Ignoring unreadable line {line_no} in journal {path}.")
+                    continue
+                if entry.get("event") == "session":
+                    journal = cls(path, entry["subject"], entry["started_at"])
+                elif entry.get("event") == "present" and journal is not None:
+                    journal.present.setdefault(entry["enrollment"], {
+                        "Enrollment": entry["enrollment"], "Name": entry["name"],
+                        "time": entry["time"], "confidence": entry.get("confidence"),
+                    })
+                    journal.last_event_at = max(journal.last_event_at, entry["time"])
+        if journal is None:
+            raise ValueError(f"Journal {path} has no session header.")
+        return journal
+
+    def resume(self):
+        """Reopens a loaded journal for appending so an interrupted session can continue."""
+        torn = False
+        with open(self.path, "rb") as f:
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._open()
+        if torn:
+            self._file.write("\n")  # Terminate a line torn by the crash before appending
+        self._write({"event": "resumed", "time": time.time()})
+        self.flush()
+        return self
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        with _active_lock:
+            _active_journals.add(os.path.abspath(self.path))
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+
+    def record(self, enrollment, name, confidence=None):
+        """
+        Appends a recognition to the journal and forces it to disk before returning.
+        Students already present are ignored.
+
+        Returns:
+            bool: True if this is the student's first recognition in the session.
+        """
+        enrollment = str(enrollment)
+        if enrollment in self.present:
+            return False
+        now = time.time()
+        self.present[enrollment] = {"Enrollment": enrollment, "Name": name, "time": now, "confidence": confidence}
+        self.last_event_at = now
+        self._write({"event": "present", "enrollment": enrollment, "name": name, "time": now,
+                     "confidence": None if confidence is None else float(confidence)})
+        self.flush()
+        return True
+
+    def flush(self):
+        """Forces buffered journal lines to disk."""
+        if self._file is None or self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flushes and closes the journal file without finalizing it."""
+        self._close_file()
+        release_journal(self.path)
+
+    def _close_file(self):
+        if self._file is not None and not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            logging.warning(f"Journal {self.path} was already removed.")
+
+    def to_dataframe(self):
+        """Returns the session's attendance in the standard Enrollment/Name layout."""
+        return pd.DataFrame([{"Enrollment": r["Enrollment"], "Name": r["Name"]} for r in self.present.values()],
+                            columns=["Enrollment", "Name"])
+
+    def finalize(self, attendance_dir=ATTENDANCE_DIR, finished_at=None):
+        """
+        Writes the attendance sheet and removes the journal.
+
+        Args:
+            attendance_dir (str): Root attendance directory.
+            finished_at (float): Session end time used in the sheet's filename; defaults to now.
+
+        Returns:
+            tuple: (filename, DataFrame, date "YYYY-MM-DD", time "HH-MM-SS"), or
+            (None, empty DataFrame, None, None) if nobody was recognized.
+        """
+        # The journal stays claimed until it is gone, so recovery cannot pick it up halfway
+        self._close_file()
+        try:
+            attendance = self.to_dataframe()
+            if attendance.empty:
+                self._remove()
+                return None, attendance, None, None
+
+            filename, date, timestamp = write_attendance_sheet(self.subject, attendance, finished_at, attendance_dir)
+            self._remove()
+            return filename, attendance, date, timestamp
+        finally:
+            release_journal(self.path)
+
+def claim_journal(path):
+    """
+    Reserves an interrupted journal for the calling thread before it is loaded,
+    so startup recovery and a session starting at the same time never both
+    finalize it. Resuming keeps the claim; close() and finalize() release it.
+
+    Returns:
+        bool: False if the journal is already claimed or no longer exists.
+    """
+    path = os.path.abspath(path)
+    with _active_lock:
+        if path in _active_journals or not os.path.exists(path):
+            return False
+        _active_journals.add(path)
+        return True
+
+def release_journal(path):
+    """Gives up a claim on a journal, e.g. one that was loaded but not used."""
+    with _active_lock:
+        _active_journals.discard(os.path.abspath(path))
+
+def quarantine_journal(path):
+    """
+    Renames a claimed journal that cannot be read (e.g. no session header) to
+    <name>.corrupt and releases it, so it is kept for inspection but no longer
+    picked up on every start.
+    """
+    try:
+        os.replace(path, path + CORRUPT_SUFFIX)
+        logging.warning(f"Moved unreadable journal {path} aside as {os.path.basename(path)}{CORRUPT_SUFFIX}.")
+    except OSError as e:
+        logging.error(f"Could not move unreadable journal {path} aside: {e}")
+    finally:
+        release_journal(path)
+
+def write_attendance_sheet(subject, attendance, ts=None, attendance_dir=ATTENDANCE_DIR):
+    """
+    Writes an attendance DataFrame to Attendance/<subject>/<subject>_<date>_<time>.csv.
+
+    Args:
+        subject (str): The subject name.
+        attendance (pd.DataFrame): Rows with Enrollment and Name columns.
+        ts (float): Session time used in the filename; defaults to now.
+        attendance_dir (str): Root attendance directory.
+
+    Returns:
+        tuple: (filename, date "YYYY-MM-DD", time "HH-MM-SS").
+    """
+    ts = ts if ts is not None else time.time()
+    date = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+    timestamp = datetime.datetime.fromtimestamp(ts).strftime("%H-%M-%S")
+
+    path = os.path.join(attendance_dir, subject)
+    os.makedirs(path, exist_ok=True)
+    filename = os.path.join(path, f"{subject}_{date}_{timestamp}.csv")
+    # Write to a temporary file first so a crash never leaves a half-written sheet
+    tmp_filename = filename + ".tmp"
+    attendance.to_csv(tmp_filename, index=False)
+    os.replace(tmp_filename, filename)
+    return filename, date, timestamp
+
+def find_interrupted_journals(journal_dir=JOURNAL_DIR, subject=None):
+    """Returns paths of journals left behind by sessions that never finished, oldest first."""
+    if not os.path.isdir(journal_dir):
+        return []
+    with _active_lock:
+        active = set(_active_journals)
+    paths = []
+    for f in sorted(os.listdir(journal_dir)):
+        path = os.path.join(journal_dir, f)
+        if not f.endswith(".jsonl") or os.path.abspath(path) in active:
+            continue
+        if subject is not None and not f.startswith(f"{subject}_"):
+            continue
+        paths.append(path)
+    return paths
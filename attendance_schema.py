@@ -0,0 +1,204 @@
+# attendance_schema.py
+
+"""
+The unified attendance schema for MongoDB.
+
+The original layout writes one collection per (free-text) subject with the
+date as a "YYYY:MM:DD" string, so a report across subjects or a date range
+scans many collections and compares strings. In the unified schema every
+record lives in one "attendance" collection with a real datetime, indexed on
+(subject, date) and (enrollment, date), and optionally one "sessions"
+document per session holds its present list.
+
+Datetimes are the session's local wall-clock time, as on the attendance sheets.
+
+Usage (copies the per-subject collections into the unified schema):
+    python attendance_schema.py --sessions
+"""
+
+import re
+import time
+import argparse
+import datetime
+import logging
+import threading
+from pymongo import MongoClient, UpdateOne, ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from settings import load_settings
+
+ATTENDANCE_COLLECTION = "attendance"
+SESSIONS_COLLECTION = "sessions"
+MIGRATION_BATCH_SIZE = 1000
+
+_indexed_databases = set()
+_indexed_lock = threading.Lock()
+
+def session_datetime(date, timestamp):
+    """Parses the stored date ("YYYY:MM:DD" or "YYYY-MM-DD") and time ("HH-MM-SS" or "HH:MM:SS")."""
+    year, month, day = (int(part) for part in re.split(r"[:\-]", str(date))[:3])
+    hour, minute, second = (int(part) for part in re.split(r"[:\-]", str(timestamp))[:3])
+    return datetime.datetime(year, month, day, hour, minute, second)
+
+def session_id(subject, when):
+    """The same <subject>_<YYYY-MM-DD>_<HH-MM-SS> name as the session's attendance sheet."""
+    return f"{subject}_{when.strftime('%Y-%m-%d_%H-%M-%S')}"
+
+def unified_document(doc):
+    """Converts a per-subject attendance document into the unified schema."""
+    when = session_datetime(doc["date"], doc["timestamp"])
+    return {
+        "enrollment": str(doc["enrollment"]),
+        "name": doc.get("name"),
+        "subject": doc["subject"],
+        "date": when,
+        "session_id": session_id(doc["subject"], when),
+        "status": doc.get("status", "Present"),
+    }
+
+def ensure_indexes(db):
+    """
+    Creates the unified schema's indexes once per database. If that fails, writes
+    go ahead without them and the next write tries again.
+    """
+    with _indexed_lock:
+        if db.name in _indexed_databases:
+            return
+    try:
+        attendance = db[ATTENDANCE_COLLECTION]
+        # One record per student per session; also serves "who attended this session"
+        attendance.create_index([("subject", ASCENDING), ("date", ASCENDING), ("enrollment", ASCENDING)],
+                                unique=True, name="subject_date_enrollment")
+        attendance.create_index([("enrollment", ASCENDING), ("date", ASCENDING)], name="enrollment_date")
+        db[SESSIONS_COLLECTION].create_index([("subject", ASCENDING), ("date", ASCENDING)], name="subject_date")
+    except PyMongoError as e:
+        logging.warning(f"Could not create the unified attendance indexes in {db.name}: {e}")
+        return
+    with _indexed_lock:
+        _indexed_databases.add(db.name)
+
+def upsert_unified(db, documents, sessions=False):
+    """
+    Writes per-subject style attendance documents into the unified collection with
+    one unordered bulk_write of upserts keyed on (subject, date, enrollment). With
+    sessions=True every record that was written is also added to its session
+    document, even if other records failed; $addToSet keeps that idempotent when
+    a session arrives in several batches or is sent again.
+
+    Raises:
+        BulkWriteError: If some documents failed; the others were still written.
+    """
+    ensure_indexes(db)
+    converted = [unified_document(doc) for doc in documents]
+    requests = [UpdateOne({"subject": doc["subject"], "date": doc["date"], "enrollment": doc["enrollment"]},
+                          {"$setOnInsert": doc}, upsert=True) for doc in converted]
+    try:
+        result = db[ATTENDANCE_COLLECTION].bulk_write(requests, ordered=False) if requests else None
+    except BulkWriteError as e:
+        if sessions:
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            written = [doc for i, doc in enumerate(converted) if i not in failed]
+            if written:
+                upsert_sessions(db, written)
+        raise
+    if sessions and converted:
+        upsert_sessions(db, converted)
+    return result
+
+def upsert_sessions(db, converted):
+    """
+    Adds unified attendance documents to their per-session documents, one upsert
+    per session in order of first appearance (see failed_session_ids).
+
+    Raises:
+        BulkWriteError: If some sessions failed; the others were still written.
+    """
+    present = {}
+    for doc in converted:
+        entry = present.setdefault(doc["session_id"], {"subject": doc["subject"], "date": doc["date"], "present": []})
+        entry["present"].append({"enrollment": doc["enrollment"], "name": doc["name"]})
+    requests = [UpdateOne({"_id": sid},
+                          {"$setOnInsert": {"subject": entry["subject"], "date": entry["date"]},
+                           "$addToSet": {"present": {"$each": entry["present"]}}},
+                          upsert=True)
+                for sid, entry in present.items()]
+    return db[SESSIONS_COLLECTION].bulk_write(requests, ordered=False)
+
+def failed_session_ids(converted, error):
+    """Maps the write errors of a BulkWriteError raised by upsert_sessions(db, converted) to session ids."""
+    order = list(dict.fromkeys(doc["session_id"] for doc in converted))
+    return {order[err["index"]] for err in error.details.get("writeErrors", [])}
+
+def attendance_between(db, subject, start, end):
+    """Returns the subject's attendance records with start <= date < end (an index range scan)."""
+    return list(db[ATTENDANCE_COLLECTION].find({"subject": subject, "date": {"$gte": start, "$lt": end}},
+                                               {"_id": 0}).sort("date", ASCENDING))
+
+def student_attendance(db, enrollment, start=None, end=None):
+    """Returns one student's attendance records across all subjects, optionally within [start, end)."""
+    query = {"enrollment": str(enrollment)}
+    if start is not None or end is not None:
+        query["date"] = {}
+        if start is not None:
+            query["date"]["$gte"] = start
+        if end is not None:
+            query["date"]["$lt"] = end
+    return list(db[ATTENDANCE_COLLECTION].find(query, {"_id": 0}).sort("date", ASCENDING))
+
+def legacy_collections(db):
+    """Names of the per-subject attendance collections in a database."""
+    return sorted(name for name in db.list_collection_names()
+                  if name not in (ATTENDANCE_COLLECTION, SESSIONS_COLLECTION) and not name.startswith("system."))
+
+def migrate_collections(db, subjects=None, sessions=False, batch_size=MIGRATION_BATCH_SIZE, status_callback=print):
+    """
+    Copies per-subject collections into the unified schema. The old collections are
+    left untouched, and re-running the migration does not create duplicates.
+
+    Returns:
+        dict: Documents copied and skipped (unparseable) per collection.
+    """
+    report = {}
+    for name in subjects or legacy_collections(db):
+        copied, skipped, started = 0, 0, time.perf_counter()
+        batch = []
+        for doc in db[name].find({}, {"_id": 0}):
+            try:
+                session_datetime(doc["date"], doc["timestamp"])
+                doc["enrollment"]
+                doc.setdefault("subject", name)
+                batch.append(doc)
+            except (KeyError, ValueError, TypeError):
+                skipped += 1
+                continue
+            if len(batch) >= batch_size:
+                upsert_unified(db, batch, sessions)
+                copied += len(batch)
+                batch = []
+        if batch:
+            upsert_unified(db, batch, sessions)
+            copied += len(batch)
+        report[name] = {"copied": copied, "skipped": skipped}
+        status_callback(f"{name}: {copied} records copied, {skipped} skipped in {time.perf_counter() - started:.1f} s")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy per-subject attendance collections into the unified schema.")
+    parser.add_argument("--uri", help="MongoDB URI (default: mongo_uri from settings).")
+    parser.add_argument("--db", default="AiAttendance", help="Database name.")
+    parser.add_argument("--subjects", nargs="+", help="Only these subject collections (default: all).")
+    parser.add_argument("--sessions", action="store_true", help="Also build one document per session.")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri or load_settings().get("mongo_uri"), serverSelectionTimeoutMS=5000)
+    try:
+        report = migrate_collections(client[args.db], args.subjects, args.sessions)
+        print(f"Migrated {sum(r['copied'] for r in report.values())} records from {len(report)} collection(s).")
+    except PyMongoError as e:
+        logging.error(f"Migration failed: {e}")
+        raise SystemExit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,230 @@
+# attendance_store.py
+
+"""
+An indexed local copy of the attendance sheets for the attendance viewer.
+
+The CSV sheets in Attendance/<subject>/ stay the source of truth. Each sheet
+is read once into a SQLite table indexed by (subject, date) and (enrollment,
+date), and remembered by its size and modification time; before a query only
+the subject's folder is listed, so new, changed and deleted sheets are picked
+up without reading the unchanged ones again. Date ranges and a student's
+history across subjects become index lookups.
+
+Usage:
+    python attendance_store.py --rebuild
+    python attendance_store.py --subject Math --from 2026-09-01 --to 2026-09-30
+    python attendance_store.py --student 101
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import argparse
+from contextlib import contextmanager
+import pandas as pd
+from attendance_journal import ATTENDANCE_DIR
+from student_index import normalize_enrollment
+
+STORE_PATH = os.path.join(ATTENDANCE_DIR, ".attendance_index.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheets (
+    path TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    sheet TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    date TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    enrollment TEXT NOT NULL,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS records_subject_date ON records (subject, date);
+CREATE INDEX IF NOT EXISTS records_enrollment_date ON records (enrollment, date);
+CREATE INDEX IF NOT EXISTS records_sheet ON records (sheet);
+CREATE INDEX IF NOT EXISTS sheets_subject ON sheets (subject);
+"""
+
+def parse_sheet_name(filename):
+    """Splits <subject>_<YYYY-MM-DD>_<HH-MM-SS>.csv into (date, timestamp), or None if it does not match."""
+    parts = os.path.splitext(os.path.basename(filename))[0].rsplit('_', 2)
+    if len(parts) != 3 or len(parts[1]) != 10:
+        return None
+    return parts[1], parts[2]
+
+class AttendanceStore:
+    """The SQLite index over Attendance/<subject>/*.csv. Every method uses its own connection."""
+    def __init__(self, path=STORE_PATH, attendance_dir=ATTENDANCE_DIR):
+        self.path = path
+        self.attendance_dir = attendance_dir
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection whose statements commit together, or not at all, and closes it."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def subjects(self):
+        """Subjects that have an attendance folder."""
+        if not os.path.isdir(self.attendance_dir):
+            return []
+        return sorted(entry.name for entry in os.scandir(self.attendance_dir)
+                      if entry.is_dir() and not entry.name.startswith("."))
+
+    def _indexed_subjects(self):
+        with self._connect() as conn:
+            return [subject for (subject,) in conn.execute("SELECT DISTINCT subject FROM sheets")]
+
+    def resolve_subject(self, subject):
+        """
+        Returns the attendance folder name matching a typed subject, ignoring case
+        (Windows folders do too), or None if there is no such folder. Records are
+        always stored under the folder name, so "math" and "Math" share them.
+        """
+        folders = self.subjects()
+        if subject in folders:
+            return subject
+        matches = [folder for folder in folders if folder.casefold() == subject.casefold()]
+        return matches[0] if matches else None
+
+    def refresh(self, subjects=None):
+        """
+        Brings the index up to date with the sheets of the given subjects (default: all).
+
+        Returns:
+            dict: Number of sheets ingested, removed and unchanged.
+        """
+        counts = {"ingested": 0, "removed": 0, "unchanged": 0}
+        if subjects is None:
+            # Indexed subjects whose folder is gone have all their sheets removed below
+            subjects = self.subjects()
+            subjects += [subject for subject in self._indexed_subjects() if subject not in subjects]
+        for subject in subjects:
+            folder = os.path.join(self.attendance_dir, subject)
+            on_disk = {}
+            if os.path.isdir(folder):
+                for entry in os.scandir(folder):
+                    if entry.is_file() and entry.name.endswith(".csv") and not entry.name.endswith(".tmp.csv"):
+                        stat = entry.stat()
+                        on_disk[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            with self._connect() as conn:
+                known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                         conn.execute("SELECT path, mtime_ns, size FROM sheets WHERE subject = ?", (subject,))}
+                removed = set(known) - set(on_disk)
+                changed = [(path, signature) for path, signature in sorted(on_disk.items()) if known.get(path) != signature]
+                counts["unchanged"] += len(on_disk) - len(changed)
+                if not removed and not changed:
+                    continue
+                # All of a subject's changes are applied in one transaction
+                for path in removed:
+                    conn.execute("DELETE FROM records WHERE sheet = ?", (path,))
+                    conn.execute("DELETE FROM sheets WHERE path = ?", (path,))
+                counts["removed"] += len(removed)
+                for path, signature in changed:
+                    rows = self._read_sheet(subject, path)
+                    conn.execute("DELETE FROM records WHERE sheet = ?", (path,))
+                    if rows is None:
+                        # Forget a sheet that became unreadable; it is read again once it changes
+                        conn.execute("DELETE FROM sheets WHERE path = ?", (path,))
+                        continue
+                    conn.executemany("INSERT INTO records (sheet, subject, date, timestamp, enrollment, name) "
+                                     "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                    conn.execute("INSERT OR REPLACE INTO sheets (path, subject, date, timestamp, mtime_ns, size) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)", (path, subject) + parse_sheet_name(path) + tuple(signature))
+                    counts["ingested"] += 1
+        return counts
+
+    def _read_sheet(self, subject, path):
+        """Reads one sheet into record rows, or None if it cannot be used."""
+        parsed = parse_sheet_name(path)
+        if parsed is None:
+            logging.warning(f"Could not parse filename: {path}. Skipping.")
+            return None
+        date, timestamp = parsed
+        try:
+            sheet = pd.read_csv(path, dtype={"Enrollment": str})
+        except Exception as e:
+            logging.warning(f"Could not read attendance sheet {path}: {e}")
+            return None
+        names = sheet["Name"] if "Name" in sheet.columns else [None] * len(sheet)
+        return [(path, subject, date, timestamp, normalize_enrollment(enrollment), name if isinstance(name, str) else None)
+                for enrollment, name in zip(sheet.get("Enrollment", []), names) if pd.notna(enrollment)]
+
+    def rebuild(self):
+        """Forgets everything and re-reads every sheet."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM records")
+            conn.execute("DELETE FROM sheets")
+        return self.refresh()
+
+    def query(self, subject=None, start=None, end=None, enrollment=None, refresh=True):
+        """
+        Returns attendance records as a DataFrame with Subject, Date, Timestamp, Enrollment
+        and Name columns, sorted by date and time.
+
+        Args:
+            subject (str): Only this subject (matched like resolve_subject); all subjects if None.
+            start (str): First date to include, YYYY-MM-DD.
+            end (str): Last date to include, YYYY-MM-DD.
+            enrollment (str): Only this student.
+            refresh (bool): Pick up new or changed sheets of the queried subject(s) first.
+        """
+        if subject is not None:
+            # A subject without a folder may still have indexed sheets until the next refresh
+            subject = self.resolve_subject(subject) or next(
+                (known for known in self._indexed_subjects() if known.casefold() == subject.casefold()), subject)
+        if refresh:
+            self.refresh(None if subject is None else [subject])
+        clauses, params = [], []
+        enrollment = normalize_enrollment(enrollment) if enrollment else None
+        for column, op, value in (("subject", "=", subject), ("enrollment", "=", enrollment),
+                                  ("date", ">=", start), ("date", "<=", end)):
+            if value:
+                clauses.append(f"{column} {op} ?")
+                params.append(str(value))
+        sql = "SELECT subject, date, timestamp, enrollment, name FROM records"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date, timestamp, enrollment"
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=["Subject", "Date", "Timestamp", "Enrollment", "Name"])
+
+def main():
+    parser = argparse.ArgumentParser(description="Query or rebuild the local attendance index.")
+    parser.add_argument("--store", default=STORE_PATH, help="Index database file.")
+    parser.add_argument("--attendance", default=ATTENDANCE_DIR, help="Folder with the per-subject attendance sheets.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-read every sheet from scratch.")
+    parser.add_argument("--subject", help="Only this subject.")
+    parser.add_argument("--student", help="Only this enrollment number.")
+    parser.add_argument("--from", dest="start", help="First date, YYYY-MM-DD.")
+    parser.add_argument("--to", dest="end", help="Last date, YYYY-MM-DD.")
+    args = parser.parse_args()
+
+    store = AttendanceStore(args.store, args.attendance)
+    start = time.perf_counter()
+    counts = store.rebuild() if args.rebuild else store.refresh()
+    print(f"Index: {counts['ingested']} sheet(s) read, {counts['removed']} removed, "
+          f"{counts['unchanged']} unchanged in {time.perf_counter() - start:.2f} s")
+    if args.subject or args.student or args.start or args.end:
+        start = time.perf_counter()
+        records = store.query(args.subject, args.start, args.end, args.student, refresh=False)
+        print(records.to_string(index=False) if not records.empty else "No records.")
+        print(f"{len(records)} record(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
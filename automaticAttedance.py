@@ -3,22 +3,24 @@
 import tkinter as tk
 import os
 import cv2
-import pandas as pd
-import datetime
 import time
 import threading
 import logging
-import numpy as np
 import mongodb_handler
+from frame_grabber import FrameGrabber
+from face_tracker import UNKNOWN_IDENTITY
+from recognition import RECOGNITION_CONFIDENCE, create_predict_fn, create_face_tracker
+import model_registry
+from student_index import get_student_index
+from subject_roster import get_subject_rosters
+from attendance_journal import (AttendanceJournal, claim_journal, find_interrupted_journals, quarantine_journal,
+                                release_journal)
 from settings import load_settings
 from utils import (apply_theme, BG_COLOR, FG_COLOR, BTN_BG, BTN_FG,
                    ACCENT_COLOR, BTN_FONT, BASE_FONT, ERROR_COLOR, SUCCESS_COLOR)
 
-# --- DNN Model Configuration ---
-PROTOTXT_PATH = "deploy.prototxt.txt"
-WEIGHTS_PATH = "res10_300x300_ssd_iter_140000.caffemodel"
-CONFIDENCE_THRESHOLD = 0.7  # Face detection confidence
-RECOGNITION_CONFIDENCE = 75 # LBPH Face recognition confidence threshold (lower is better)
+# --- Session Configuration ---
+IDLE_POLL_SECONDS = 0.005 # Pause when no camera of a multi-camera session had a new frame
 
 def subjectChoose(app):
     """Entry point function to create the attendance taker window."""
@@ -127,38 +129,148 @@ class AttendanceTakerWindow:
             self.attendance_thread.join() # Wait for the thread to finish
         self.window.destroy()
 
+def get_camera_sources(app_settings):
+    """
+    Returns the camera indices for an attendance session: the "camera_indices"
+    setting (a list or comma-separated string) if set, otherwise "camera_index".
+    """
+    sources = app_settings.get("camera_indices") or []
+    if isinstance(sources, str):
+        sources = [part.strip() for part in sources.split(",") if part.strip()]
+    sources = [int(src) if str(src).isdigit() else src for src in sources]
+    return sources or [app_settings.get("camera_index", 0)]
+
+class CameraChannel:
+    """One camera in an attendance session: its frame grabber, face tracker and preview window."""
+    def __init__(self, source, app_settings, window_name):
+        self.source = source
+        self.window_name = window_name
+        self.grabber = FrameGrabber(source, max_queue_size=app_settings.get("frame_queue_size", 2), name=f"camera-{source}")
+        self.tracker = create_face_tracker(app_settings)
+        self.frame = None
+        self.gray = None
+
+    def summary(self):
+        """Returns the capture and detection stats for the end-of-session log."""
+        return f"{self.grabber.summary()}; {self.tracker.summary()}"
+
+def open_session_journal(subject, resume_minutes, status_callback):
+    """
+    Resumes the newest interrupted session for this subject if it is recent enough,
+    or starts a new journal. Every other interrupted session for the subject is finalized.
+    """
+    resumed = None
+    for path in reversed(find_interrupted_journals(subject=subject)):
+        if not claim_journal(path):
+            continue  # Being recovered in the background, or already finalized
+        try:
+            journal = AttendanceJournal.load(path)
+        except ValueError as e:
+            logging.error(f"Could not read attendance journal {path}: {e}")
+            quarantine_journal(path)
+            continue
+        except OSError as e:
+            release_journal(path)
+            logging.error(f"Could not read attendance journal {path}: {e}")
+            continue
+        if journal.subject != subject:
+            release_journal(path)
+            continue
+        if resumed is None and time.time() - journal.last_event_at <= resume_minutes * 60:
+            status_callback(f"Resuming interrupted session ({len(journal.present)} already present).")
+            resumed = journal.resume()
+            continue
+        try:
+            save_session(journal, logging.info, finished_at=journal.last_event_at)
+        except Exception as e:
+            logging.error(f"Could not finalize attendance journal {path}: {e}", exc_info=True)
+    return resumed or AttendanceJournal.start(subject)
+
+def save_session(journal, status_callback, finished_at=None):
+    """Turns a session journal into the attendance sheet and uploads it to MongoDB."""
+    filename, attendance, date, timestamp = journal.finalize(finished_at=finished_at)
+    if filename is None:
+        status_callback("No students were recognized during the session.")
+        return
+    status_callback(f"Attendance saved to {os.path.basename(filename)}")
+    # Try to upload to MongoDB
+    mongodb_handler.upload_df_to_mongodb(attendance, journal.subject, date.replace('-',':'), timestamp, filename)
+
+def recover_interrupted_sessions(resume_minutes=None):
+    """
+    Finalizes journals left behind by sessions that crashed and are too old to resume.
+    Called in the background when the application starts.
+    """
+    if resume_minutes is None:
+        resume_minutes = load_settings().get("session_resume_minutes", 60)
+    for path in find_interrupted_journals():
+        if not claim_journal(path):
+            continue  # A session starting right now is resuming or finalizing it
+        try:
+            journal = AttendanceJournal.load(path)
+        except ValueError as e:
+            logging.error(f"Could not recover attendance journal {path}: {e}")
+            quarantine_journal(path)
+            continue
+        except OSError as e:
+            release_journal(path)
+            logging.error(f"Could not read attendance journal {path}: {e}")
+            continue
+        try:
+            if time.time() - journal.last_event_at <= resume_minutes * 60:
+                release_journal(path)
+                continue  # Still resumable by restarting the same subject
+            logging.info(f"Recovering interrupted attendance session from {path}")
+            save_session(journal, logging.info, finished_at=journal.last_event_at)
+        except Exception as e:
+            release_journal(path)
+            logging.error(f"Could not recover attendance journal {path}: {e}", exc_info=True)
+
 def FillAttendance(subject, duration_minutes, stop_event, status_callback, on_finish_callback):
     """
     The core function for taking attendance. It runs in a separate thread.
-    Opens the camera, detects and recognizes faces, and saves the attendance.
+    Opens the camera(s), detects and recognizes faces, and saves the attendance.
+
+    With several cameras configured, frames from all of them go through one
+    batched detector pass and one shared recognizer, and recognitions are
+    merged into a single deduplicated attendance list.
     """
-    cam = None
+    channels = []
+    journal = None
     try:
-        model_path = os.path.join("TrainingImageLabel", "Trainner.yml")
+        app_settings = load_settings()
+        model_path = model_registry.model_path_for(app_settings)
         details_path = os.path.join("StudentDetails", "studentdetails.csv")
         
         # Check for all required files before starting
-        required_files = [model_path, details_path, PROTOTXT_PATH, WEIGHTS_PATH]
+        required_files = [model_path, details_path]
         if not all(os.path.exists(p) for p in required_files):
             raise FileNotFoundError("Model or details file missing. Please register students and train the model first.")
             
-        recognizer = cv2.face.LBPHFaceRecognizer_create()
-        recognizer.read(model_path)
-        net = cv2.dnn.readNetFromCaffe(PROTOTXT_PATH, WEIGHTS_PATH)
-        df_students = pd.read_csv(details_path)
-        
-        app_settings = load_settings()
-        camera_index = app_settings.get("camera_index", 0)
+        detector = model_registry.get_detector(app_settings)
+        students = get_student_index(details_path)
         
-        cam = cv2.VideoCapture(camera_index)
-        if not cam.isOpened(): raise IOError(f"Cannot open webcam at index {camera_index}.")
-            
-        status_callback(f"Camera started for {duration_minutes} minute(s).")
+        camera_sources = get_camera_sources(app_settings)
+
+        # Frames are captured on background threads so a slow frame never backs up a camera buffer
+        for source in camera_sources:
+            window_name = ("Live Attendance - Press 'Q' to Stop" if len(camera_sources) == 1
+                           else f"Live Attendance - Camera {source} - Press 'Q' to Stop")
+            channel = CameraChannel(source, app_settings, window_name)
+            channels.append(channel)
+            channel.grabber.start()
+
+        predict_faces = create_predict_fn(model_path, app_settings, subject)
+        roster = get_subject_rosters().enrollments_for(subject)
+        if roster:
+            status_callback(f"Matching against the {len(roster)} student(s) on the {subject} roster.")
+
+        status_callback(f"{len(channels)} camera(s) started for {duration_minutes} minute(s).")
         
-        attendance = pd.DataFrame(columns=["Enrollment", "Name"])
-        recognized_ids = set()
+        # Every recognition is journaled to disk immediately; a crashed session is resumed or recovered
+        journal = open_session_journal(subject, app_settings.get("session_resume_minutes", 60), status_callback)
+        student_names = {}  # Confirmed track identities that matched a registered student
         
-        window_name = "Live Attendance - Press 'Q' to Stop"
         start_time = time.time()
         duration_seconds = duration_minutes * 60
         
@@ -169,88 +281,87 @@ def FillAttendance(subject, duration_minutes, stop_event, status_callback, on_fi
                 status_callback("Attendance session timed out.")
                 break
 
-            ret, im = cam.read()
-            if not ret: break
-            
-            gray = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
-            (h, w) = im.shape[:2]
-            
-            # --- Face Detection using DNN ---
-            blob = cv2.dnn.blobFromImage(cv2.resize(im, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-            net.setInput(blob)
-            detections = net.forward()
+            # With several cameras, never wait on one of them: a camera that stalls
+            # without dying must not hold up detection on the others
+            read_timeout = 0 if len(channels) > 1 else None
+            active = []
+            for channel in channels:
+                ret, im = channel.grabber.read(timeout=read_timeout)
+                if ret:
+                    channel.frame, channel.gray = im, cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+                    active.append(channel)
+                elif not channel.grabber.is_running():
+                    logging.warning(f"Camera {channel.source} stopped delivering frames.")
+            channels_alive = [c for c in channels if c.grabber.is_running()]
+            if not active and not channels_alive: break
+            if not active and read_timeout == 0:
+                time.sleep(IDLE_POLL_SECONDS)  # Nothing new from any camera; don't spin
 
-            for i in range(0, detections.shape[2]):
-                confidence = detections[0, 0, i, 2]
-                if confidence > CONFIDENCE_THRESHOLD:
-                    box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                    (startX, startY, endX, endY) = box.astype("int")
-                    
-                    # Ensure coordinates are valid
-                    (startX, startY) = (max(0, startX), max(0, startY))
-                    (endX, endY) = (min(w - 1, endX), min(h - 1, endY))
+            # --- Face Detection (every N frames, batched across cameras) and Tracking ---
+            due = [channel for channel in active if channel.tracker.prepare(channel.frame, channel.gray)]
+            if due:
+                batch_faces = detector.detect_batch([channel.frame for channel in due])
+                for channel, faces in zip(due, batch_faces):
+                    channel.tracker.apply_detections(channel.frame, channel.gray, faces)
 
-                    face_roi_gray = gray[startY:endY, startX:endX]
-                    if face_roi_gray.size == 0: continue
+            for channel in active:
+                im = channel.frame
 
-                    # --- Face Recognition ---
-                    student_id, conf = recognizer.predict(face_roi_gray)
-                    
-                    if conf < RECOGNITION_CONFIDENCE: # A match is found
-                        try:
-                            student_id_str = str(student_id)
-                            student = df_students.loc[df_students["Enrollment"].astype(str) == student_id_str]
-                            if not student.empty:
-                                name = student["Name"].values[0]
-                                display_text = f"{student_id}-{name}"
-                                # Mark attendance only once per session
-                                if student_id not in recognized_ids:
-                                    recognized_ids.add(student_id)
-                                    new_entry = pd.DataFrame([{"Enrollment": student_id, "Name": name}])
-                                    attendance = pd.concat([attendance, new_entry], ignore_index=True)
-                                    status_callback(f"Recognized: {name}")
-                                
-                                cv2.rectangle(im, (startX, startY), (endX, endY), (0, 255, 0), 2)
-                                cv2.putText(im, display_text, (startX, startY - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2, cv2.LINE_AA)
-                        except Exception as e:
-                            logging.error(f"Error processing recognized student ID {student_id}: {e}")
+                # --- Face Recognition: vote per track, then only re-verify occasionally ---
+                for track in channel.tracker.recognize(channel.gray, predict_faces, RECOGNITION_CONFIDENCE):
+                    if track.identity == UNKNOWN_IDENTITY:
+                        continue
+                    try:
+                        name = students.name_of(track.identity)
+                        if name is None:
+                            continue
+                        student_names[track.identity] = name
+                        # Mark attendance only once per session, whichever camera saw the student
+                        if journal.record(track.identity, name, track.identity_confidence):
+                            status_callback(f"Recognized: {name}")
+                    except Exception as e:
+                        logging.error(f"Error processing recognized student ID {track.identity}: {e}")
+
+                for track in channel.tracker.tracks:
+                    (startX, startY, endX, endY) = track.box
+                    if track.identity is None: # Still voting
+                        color, label_text = (0, 255, 255), "..."
+                    elif track.identity in student_names:
+                        color, label_text = (0, 255, 0), f"{track.identity}-{student_names[track.identity]}"
                     else: # Unknown person
-                        cv2.rectangle(im, (startX, startY), (endX, endY), (0, 0, 255), 2)
-                        cv2.putText(im, "Unknown", (startX, startY - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2, cv2.LINE_AA)
-            
-            # Display timer
-            remaining_time = max(0, int(duration_seconds - elapsed_time))
-            timer_text = f"Time Left: {remaining_time // 60:02}:{remaining_time % 60:02}"
-            cv2.putText(im, timer_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+                        color, label_text = (0, 0, 255), "Unknown"
+                    cv2.rectangle(im, (startX, startY), (endX, endY), color, 2)
+                    cv2.putText(im, label_text, (startX, startY - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2, cv2.LINE_AA)
 
-            cv2.imshow(window_name, im)
+                # Display timer and per-camera throughput
+                remaining_time = max(0, int(duration_seconds - elapsed_time))
+                timer_text = f"Time Left: {remaining_time // 60:02}:{remaining_time % 60:02}"
+                cv2.putText(im, timer_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+                stats = channel.grabber.stats()
+                # read() has just emptied the buffer, so show the depth it found there on average
+                stats_text = (f"FPS: {stats['processed_fps']:.1f}  Queue: {stats['mean_queue_depth']:.1f} "
+                              f"(max {stats['max_queue_depth']})  Dropped: {stats['dropped']}")
+                cv2.putText(im, stats_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
+
+                cv2.imshow(channel.window_name, im)
             
             if cv2.waitKey(1) == ord('q'): break
         
         # After the loop, save the attendance if any students were recognized
-        if not attendance.empty:
-            ts = time.time()
-            date = datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
-            timestamp = datetime.datetime.fromtimestamp(ts).strftime("%H-%M-%S")
-            
-            path = os.path.join("Attendance", subject)
-            os.makedirs(path, exist_ok=True)
-            filename = os.path.join(path, f"{subject}_{date}_{timestamp}.csv")
-            
-            attendance.to_csv(filename, index=False)
-            status_callback(f"Attendance saved to {os.path.basename(filename)}")
-            
-            # Try to upload to MongoDB
-            mongodb_handler.upload_df_to_mongodb(attendance, subject, date.replace('-',':'), timestamp, filename)
-        else:
-            status_callback("No students were recognized during the session.")
+        save_session(journal, status_callback)
+        journal = None
             
     except Exception as e:
         logging.error(f"Error in FillAttendance: {e}", exc_info=True)
         status_callback(f"Error: {e}", is_error=True)
     finally:
-        # Crucial cleanup: release camera and destroy windows
-        if cam is not None and cam.isOpened(): cam.release()
+        # Crucial cleanup: release cameras and destroy windows
+        for channel in channels:
+            channel.grabber.stop()
+            logging.info(f"Attendance camera stats - {channel.summary()}")
+        if journal is not None:
+            # Leave the journal on disk so the session can be resumed or recovered later
+            journal.close()
         cv2.destroyAllWindows()
         # Notify the UI thread that the process has finished
         if on_finish_callback: on_finish_callback()
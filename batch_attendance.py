@@ -0,0 +1,241 @@
+# batch_attendance.py
+
+"""
+Headless attendance from recorded lecture videos.
+
+Each video is split into time chunks that are processed in parallel worker
+processes, without any GUI. The recognitions of all chunks are merged into one
+attendance sheet per video, written to the usual Attendance/<subject>/ folder
+and uploaded through the normal MongoDB path.
+
+Usage:
+    python batch_attendance.py --subject Math lecture_week1.mp4 lecture_week2.mp4
+"""
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import pandas as pd
+
+import mongodb_handler
+import model_registry
+from attendance_journal import write_attendance_sheet
+from recognition import RECOGNITION_CONFIDENCE, create_predict_fn, create_face_tracker
+from face_tracker import UNKNOWN_IDENTITY
+from student_index import get_student_index, DEFAULT_DETAILS_PATH
+from settings import load_settings
+from utils import setup_logging
+
+DEFAULT_CHUNK_SECONDS = 120
+DEFAULT_SAMPLE_FPS = 5.0  # Frames analysed per second of video
+
+# Per-process state, loaded once by _init_worker
+_worker = {}
+
+def _init_worker(model_path, app_settings, subject):
+    """Loads the detector and recognizer once in each worker process."""
+    cv2.setNumThreads(1)  # Parallelism comes from the process pool
+    _worker["detector"] = model_registry.get_detector(app_settings)
+    _worker["predict"] = create_predict_fn(model_path, app_settings, subject)
+    _worker["settings"] = app_settings
+
+def process_chunk(video_path, start_frame, end_frame, frame_step):
+    """
+    Runs detection, tracking and identity voting over one frame range of a video.
+
+    Args:
+        video_path (str): The video file.
+        start_frame (int): First frame of the chunk.
+        end_frame (int): Frame at which the chunk ends (exclusive).
+        frame_step (int): Analyse every Nth frame; the others are only grabbed.
+
+    Returns:
+        tuple: (label -> {"first_frame": int, "confidence": float} for every identity
+        confirmed in the chunk, (frames checked, frames skipped) by the motion gate).
+    """
+    app_settings = _worker["settings"]
+    detector, predict_faces = _worker["detector"], _worker["predict"]
+    tracker = create_face_tracker(app_settings)
+    found = {}
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        frame_no = start_frame
+        while frame_no < end_frame:
+            if (frame_no - start_frame) % frame_step:
+                # grab() skips decoding into a Python array for frames we do not analyse
+                if not cap.grab():
+                    break
+                frame_no += 1
+                continue
+            ret, im = cap.read()
+            if not ret:
+                break
+            gray = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+            tracker.update(im, gray, detector.detect)
+            for track in tracker.recognize(gray, predict_faces, RECOGNITION_CONFIDENCE):
+                if track.identity == UNKNOWN_IDENTITY:
+                    continue
+                best = found.get(track.identity)
+                if best is None or track.identity_confidence < best["confidence"]:
+                    found[track.identity] = {
+                        "first_frame": min(frame_no, best["first_frame"]) if best else frame_no,
+                        "confidence": track.identity_confidence,
+                    }
+            frame_no += 1
+    finally:
+        cap.release()
+    gate = tracker.motion_gate
+    return found, ((gate.checked_count, gate.skipped_count) if gate else (0, 0))
+
+def plan_chunks(video_path, chunk_seconds, sample_fps):
+    """
+    Splits a video into frame ranges of roughly chunk_seconds each.
+
+    Returns:
+        tuple: (list of (start_frame, end_frame), frames per second, frame_step).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video file {video_path}.")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    frame_step = max(1, int(round(fps / sample_fps))) if sample_fps > 0 else 1
+    if total_frames <= 0:
+        # Length unknown (some containers); process the whole file as one chunk.
+        return [(0, float("inf"))], fps, frame_step
+    chunk_frames = max(frame_step, int(chunk_seconds * fps))
+    chunks = [(start, min(start + chunk_frames, total_frames)) for start in range(0, total_frames, chunk_frames)]
+    return chunks, fps, frame_step
+
+def video_session_time(video_path):
+    """Uses the video file's modification time as the lecture time for the attendance sheet."""
+    return os.path.getmtime(video_path)
+
+def process_videos(video_paths, subject, workers=None, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                   sample_fps=DEFAULT_SAMPLE_FPS, model_path=None,
+                   details_path=DEFAULT_DETAILS_PATH, upload=True):
+    """
+    Takes attendance for each video and writes one attendance sheet per video.
+
+    A video that cannot be opened, or any of whose chunks fails, is logged and
+    reported in the results without a sheet, since students seen only in the
+    missing part would be marked absent; the other videos are still processed.
+
+    Returns:
+        list: (video_path, sheet filename or None, number of students present,
+        error message or None) per video.
+    """
+    app_settings = load_settings()
+    model_path = model_path or model_registry.model_path_for(app_settings)
+    required_files = [model_path, details_path]
+    missing = [p for p in required_files if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"Required files missing: {', '.join(missing)}. Please register students and train the model first.")
+
+    model_registry.get_detector(app_settings)  # Fail here, not in every worker, if the detector cannot load
+    students = get_student_index(details_path)
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, app_settings, subject)) as pool:
+        plans = {}
+        futures = {}
+        failed = {}
+        for video_path in video_paths:
+            try:
+                chunks, fps, frame_step = plan_chunks(video_path, chunk_seconds, sample_fps)
+            except IOError as e:
+                logging.error(f"Skipping {video_path}: {e}")
+                failed[video_path] = str(e)
+                continue
+            plans[video_path] = {"fps": fps, "chunks": len(chunks), "done": 0, "found": {}, "started": time.time(),
+                                 "frames_checked": 0, "frames_skipped": 0, "errors": []}
+            logging.info(f"{os.path.basename(video_path)}: {len(chunks)} chunk(s) at {fps:.1f} fps, analysing every {frame_step} frame(s).")
+            for start, end in chunks:
+                futures[pool.submit(process_chunk, video_path, start, end, frame_step)] = video_path
+
+        for future in as_completed(futures):
+            video_path = futures[future]
+            plan = plans[video_path]
+            plan["done"] += 1
+            try:
+                found, (checked, skipped) = future.result()
+                plan["frames_checked"] += checked
+                plan["frames_skipped"] += skipped
+                for label, hit in found.items():
+                    best = plan["found"].get(label)
+                    if best is None or hit["first_frame"] < best["first_frame"]:
+                        plan["found"][label] = hit
+            except Exception as e:
+                logging.error(f"Chunk of {video_path} failed: {e}", exc_info=True)
+                plan["errors"].append(str(e))
+            logging.info(f"{os.path.basename(video_path)}: {plan['done']}/{plan['chunks']} chunk(s) done.")
+
+    for video_path in video_paths:
+        if video_path in failed:
+            results.append((video_path, None, 0, failed[video_path]))
+            continue
+        plan = plans[video_path]
+        if plan["errors"]:
+            results.append((video_path, None, 0, f"{len(plan['errors'])} of {plan['chunks']} chunk(s) failed, "
+                                                 f"no sheet written: {plan['errors'][0]}"))
+            continue
+        if plan["frames_checked"]:
+            logging.info(f"{os.path.basename(video_path)}: motion gate skipped "
+                         f"{plan['frames_skipped']}/{plan['frames_checked']} scheduled detections "
+                         f"({plan['frames_skipped'] / plan['frames_checked'] * 100:.0f}%).")
+        rows = []
+        # Order students by when they were first seen, like the live session does
+        for label, hit in sorted(plan["found"].items(), key=lambda item: item[1]["first_frame"]):
+            name = students.name_of(label)
+            if name is not None:
+                rows.append({"Enrollment": str(label), "Name": name})
+        if not rows:
+            logging.info(f"{os.path.basename(video_path)}: no students were recognized.")
+            results.append((video_path, None, 0, None))
+            continue
+
+        attendance = pd.DataFrame(rows, columns=["Enrollment", "Name"])
+        filename, date, timestamp = write_attendance_sheet(subject, attendance, video_session_time(video_path))
+        logging.info(f"{os.path.basename(video_path)}: {len(rows)} student(s) present, saved to {filename} "
+                     f"in {time.time() - plan['started']:.1f}s.")
+        if upload:
+            mongodb_handler.upload_df_to_mongodb(attendance, subject, date.replace('-', ':'), timestamp, filename)
+        results.append((video_path, filename, len(rows), None))
+    if upload:
+        # No background sync worker runs in this process, so send the queued sheets now
+        sent, remaining, _ = mongodb_handler.drain_outbox()
+        logging.info(f"Uploaded {sent} session(s) to MongoDB; {remaining} still queued.")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Take attendance from recorded lecture videos without the GUI.")
+    parser.add_argument("videos", nargs="+", help="Video file(s) to process; each produces one attendance sheet.")
+    parser.add_argument("--subject", required=True, help="Subject name used for the attendance sheets.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: number of CPUs).")
+    parser.add_argument("--chunk-seconds", type=float, default=DEFAULT_CHUNK_SECONDS, help="Length of video handled by one worker task.")
+    parser.add_argument("--sample-fps", type=float, default=DEFAULT_SAMPLE_FPS, help="Frames analysed per second of video (0 = every frame).")
+    parser.add_argument("--model", default=None, help="Trained LBPH model file or binary model directory (default: from settings).")
+    parser.add_argument("--no-upload", action="store_true", help="Only write the CSV sheets, skip MongoDB.")
+    args = parser.parse_args()
+
+    start = time.time()
+    results = process_videos(args.videos, args.subject, args.workers, args.chunk_seconds,
+                             args.sample_fps, args.model, upload=not args.no_upload)
+    for video_path, filename, count, error in results:
+        if error:
+            print(f"{video_path}: failed - {error}")
+            continue
+        print(f"{video_path}: {count} present" + (f" -> {filename}" if filename else ""))
+    print(f"Processed {len(results)} video(s) in {time.time() - start:.1f}s.")
+
+if __name__ == "__main__":
+    setup_logging()
+    main()
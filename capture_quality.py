@@ -0,0 +1,99 @@
+# capture_quality.py
+
+import cv2
+import numpy as np
+from collections import deque
+
+REJECT_REASONS = ("small", "edge", "pose", "blur", "duplicate")
+
+class SampleQualityGate:
+    """
+    Decides which detected faces are worth keeping as training samples during registration.
+
+    A face is rejected when it is too small, cut off by the frame border, turned
+    away (a detector box much narrower or wider than a frontal face), blurry, or
+    nearly identical to a sample that was already kept. The blur limit adapts to
+    the camera: a face must be at least a fraction as sharp as the typical face
+    seen so far, with a fixed floor, so a soft webcam is not rejected outright and
+    a sharp one does not accept motion-blurred frames.
+    """
+    def __init__(self, min_face_size=60, min_sharpness=25.0, relative_sharpness=0.6, aspect_range=(0.65, 1.35),
+                 duplicate_threshold=6.0, thumbnail_size=24, history=15):
+        """
+        Args:
+            min_face_size (int): Smallest accepted face side in pixels.
+            min_sharpness (float): Absolute floor for the Laplacian variance of a face.
+            relative_sharpness (float): Fraction of the running median sharpness a face must reach.
+            aspect_range (tuple): Accepted width/height ratio of the detector box (frontal faces).
+            duplicate_threshold (float): Mean grey-level difference to every kept sample's thumbnail
+                below which a face counts as a duplicate.
+            thumbnail_size (int): Side of the thumbnails compared for duplicates.
+            history (int): Number of recent faces the running sharpness median is taken over.
+        """
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.relative_sharpness = relative_sharpness
+        self.aspect_range = aspect_range
+        self.duplicate_threshold = duplicate_threshold
+        self.thumbnail_size = thumbnail_size
+        self._sharpness = deque(maxlen=history)
+        self._kept = []  # Thumbnails of accepted samples, as float32
+        self.accepted_count = 0
+        self.rejected = {reason: 0 for reason in REJECT_REASONS}
+
+    def check(self, gray, box, face):
+        """
+        Judges one detected face.
+
+        Args:
+            gray (np.ndarray): The grayscale frame.
+            box (tuple): The detector box (startX, startY, endX, endY).
+            face (np.ndarray): The preprocessed face crop that would be saved.
+
+        Returns:
+            str: None if the sample is accepted, otherwise the rejection reason.
+        """
+        reason = self._reason(gray, box, face)
+        if reason is None:
+            self.accepted_count += 1
+        else:
+            self.rejected[reason] += 1
+        return reason
+
+    def _reason(self, gray, box, face):
+        (startX, startY, endX, endY) = box[:4]
+        w, h = endX - startX, endY - startY
+        if min(w, h) < self.min_face_size:
+            return "small"
+        frame_h, frame_w = gray.shape[:2]
+        if startX <= 0 or startY <= 0 or endX >= frame_w - 1 or endY >= frame_h - 1:
+            return "edge"
+        if not self.aspect_range[0] <= w / float(h) <= self.aspect_range[1]:
+            return "pose"
+
+        # Variance of the Laplacian: low when the face has no crisp edges
+        sharpness = cv2.Laplacian(face, cv2.CV_64F).var()
+        self._sharpness.append(sharpness)
+        if sharpness < max(self.min_sharpness, self.relative_sharpness * float(np.median(self._sharpness))):
+            return "blur"
+
+        thumb = cv2.resize(face, (self.thumbnail_size, self.thumbnail_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+        thumb -= thumb.mean()  # Compare structure, not overall brightness
+        for kept in self._kept:
+            if np.abs(thumb - kept).mean() < self.duplicate_threshold:
+                return "duplicate"
+        self._kept.append(thumb)
+        return None
+
+    def summary(self):
+        """Returns a one-line summary of accepted and rejected faces."""
+        rejected = ", ".join(f"{count} {reason}" for reason, count in self.rejected.items() if count)
+        return f"{self.accepted_count} samples kept, rejected: {rejected or 'none'}"
+
+def create_quality_gate(app_settings):
+    """Builds the registration SampleQualityGate configured in settings."""
+    return SampleQualityGate(
+        min_face_size=app_settings.get("capture_min_face_size", 60),
+        min_sharpness=app_settings.get("capture_min_sharpness", 25.0),
+        duplicate_threshold=app_settings.get("capture_duplicate_threshold", 6.0),
+    )
@@ -0,0 +1,359 @@
+# face_detector.py
+
+"""
+Interchangeable face detector backends.
+
+Every backend returns, per frame, a list of (startX, startY, endX, endY, confidence)
+boxes clipped to the frame, so the capture and attendance code does not care
+which one is in use. The backend is chosen with the "detector_backend" setting:
+
+    ssd      res10 Caffe SSD (default), input size set by "detector_input_size"
+    haar     OpenCV Haar cascade; very cheap, lower recall on side and low-light faces
+    onnx     An UltraFace-style ONNX model loaded with cv2.dnn.readNetFromONNX
+    cascade  Haar proposes candidate regions, the SSD verifies each one
+
+Run this module directly to benchmark the backends on a local image set:
+    python face_detector.py --images TestFaces --backends ssd,haar,cascade
+"""
+
+import os
+import csv
+import time
+import logging
+import argparse
+import threading
+import numpy as np
+import cv2
+
+# --- DNN Model Configuration ---
+PROTOTXT_PATH = "deploy.prototxt.txt"
+WEIGHTS_PATH = "res10_300x300_ssd_iter_140000.caffemodel"
+ONNX_MODEL_PATH = "version-RFB-320.onnx"
+HAAR_CASCADE_FILE = "haarcascade_frontalface_default.xml"
+CONFIDENCE_THRESHOLD = 0.7  # Face detection confidence
+
+BACKENDS = ("ssd", "haar", "onnx", "cascade")
+
+def clip_box(startX, startY, endX, endY, w, h):
+    """Clips a box to a w x h frame. Returns None if nothing of it is left."""
+    (startX, startY) = (max(0, int(startX)), max(0, int(startY)))
+    (endX, endY) = (min(w - 1, int(endX)), min(h - 1, int(endY)))
+    if endX > startX and endY > startY:
+        return startX, startY, endX, endY
+    return None
+
+def default_haar_cascade_path():
+    """Looks for the frontal face cascade next to the app first, then in the OpenCV package."""
+    if os.path.exists(HAAR_CASCADE_FILE):
+        return HAAR_CASCADE_FILE
+    data_dir = cv2.data.haarcascades if hasattr(cv2, "data") else ""
+    return os.path.join(data_dir, HAAR_CASCADE_FILE)
+
+class FaceDetector:
+    """Base class for detector backends."""
+    name = "base"
+
+    def detect(self, frame):
+        """Returns the faces in one BGR frame as (startX, startY, endX, endY, confidence) tuples."""
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """Returns one list of faces per BGR frame. Backends that can batch override this."""
+        return [self.detect(frame) for frame in frames]
+
+    def model_files(self):
+        """Files the backend was loaded from; a change to any of them means it must be reloaded."""
+        return []
+
+class SSDDetector(FaceDetector):
+    """The res10 Caffe SSD. Smaller input sizes are faster but miss small faces."""
+    name = "ssd"
+
+    def __init__(self, prototxt_path=PROTOTXT_PATH, weights_path=WEIGHTS_PATH, input_size=300,
+                 confidence=CONFIDENCE_THRESHOLD):
+        if not os.path.exists(prototxt_path) or not os.path.exists(weights_path):
+            raise FileNotFoundError("DNN model files (prototxt/caffemodel) not found.")
+        self.prototxt_path = prototxt_path
+        self.weights_path = weights_path
+        self.input_size = int(input_size)
+        self.confidence = confidence
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, weights_path)
+        # cv2.dnn networks are not safe to run from two threads at once
+        self._lock = threading.Lock()
+
+    def detect_batch(self, frames):
+        """Runs the SSD on several frames in a single forward pass."""
+        if not frames:
+            return []
+        size = (self.input_size, self.input_size)
+        blob = cv2.dnn.blobFromImages([cv2.resize(im, size) for im in frames], 1.0, size, (104.0, 177.0, 123.0))
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+
+        faces = [[] for _ in frames]
+        for i in range(0, detections.shape[2]):
+            # Column 0 holds the index of the frame in the batch the detection belongs to
+            image_id = int(detections[0, 0, i, 0])
+            confidence = detections[0, 0, i, 2]
+            if confidence > self.confidence and 0 <= image_id < len(frames):
+                (h, w) = frames[image_id].shape[:2]
+                box = clip_box(*(detections[0, 0, i, 3:7] * np.array([w, h, w, h])), w, h)
+                if box is not None:
+                    faces[image_id].append(box + (float(confidence),))
+        return faces
+
+    def model_files(self):
+        return [self.prototxt_path, self.weights_path]
+
+class HaarDetector(FaceDetector):
+    """
+    OpenCV's Viola-Jones cascade. It has no real confidence score, so every
+    detection reports 1.0. Frames are shrunk to detect_width before scanning.
+    """
+    name = "haar"
+
+    def __init__(self, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=30, detect_width=320):
+        cascade_path = cascade_path or default_haar_cascade_path()
+        if not os.path.exists(cascade_path):
+            raise FileNotFoundError(f"Haar cascade file {cascade_path} not found.")
+        self.cascade_path = cascade_path
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise IOError(f"Could not load Haar cascade {cascade_path}.")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.detect_width = detect_width
+
+    def detect(self, frame):
+        (h, w) = frame.shape[:2]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        scale = min(1.0, self.detect_width / float(w)) if self.detect_width else 1.0
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        gray = cv2.equalizeHist(gray)
+        min_size = max(1, int(self.min_size * scale))
+        boxes = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                              minSize=(min_size, min_size))
+        faces = []
+        for (x, y, bw, bh) in boxes:
+            box = clip_box(x / scale, y / scale, (x + bw) / scale, (y + bh) / scale, w, h)
+            if box is not None:
+                faces.append(box + (1.0,))
+        return faces
+
+    def model_files(self):
+        return [self.cascade_path]
+
+class ONNXDetector(FaceDetector):
+    """
+    An ONNX face detector with UltraFace's output layout ("scores" N x 2 and
+    "boxes" N x 4 in normalized corner form), e.g. version-RFB-320.onnx.
+    """
+    name = "onnx"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, input_size=(320, 240), confidence=CONFIDENCE_THRESHOLD,
+                 nms_threshold=0.3):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX detector model {model_path} not found.")
+        self.model_path = model_path
+        self.input_size = tuple(input_size)
+        self.confidence = confidence
+        self.nms_threshold = nms_threshold
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+        self._lock = threading.Lock()
+
+    def detect(self, frame):
+        (h, w) = frame.shape[:2]
+        blob = cv2.dnn.blobFromImage(frame, 1.0 / 128, self.input_size, (127, 127, 127), swapRB=True)
+        with self._lock:
+            self.net.setInput(blob)
+            scores, boxes = self.net.forward(["scores", "boxes"])
+        scores, boxes = scores.reshape(-1, 2)[:, 1], boxes.reshape(-1, 4)
+        keep = np.flatnonzero(scores > self.confidence)
+        if keep.size == 0:
+            return []
+        pixel_boxes = boxes[keep] * np.array([w, h, w, h])
+        rects = [[float(x1), float(y1), float(x2 - x1), float(y2 - y1)] for x1, y1, x2, y2 in pixel_boxes]
+        faces = []
+        for i in np.array(cv2.dnn.NMSBoxes(rects, scores[keep].tolist(), self.confidence, self.nms_threshold)).ravel():
+            box = clip_box(*pixel_boxes[i], w, h)
+            if box is not None:
+                faces.append(box + (float(scores[keep][i]),))
+        return faces
+
+    def model_files(self):
+        return [self.model_path]
+
+class CascadeDetector(FaceDetector):
+    """
+    Two-stage detection: a cheap proposer finds candidate regions and the SSD
+    only looks at padded crops around them. Frames without a proposal cost
+    just the proposer, at the price of inheriting the proposer's misses.
+    """
+    name = "cascade"
+
+    def __init__(self, proposer, verifier, padding=0.5):
+        """
+        Args:
+            proposer (FaceDetector): Fast, high-recall detector (normally HaarDetector).
+            verifier (FaceDetector): Accurate detector run on the proposed crops (normally SSDDetector).
+            padding (float): Context added around each proposal, as a fraction of its size.
+        """
+        self.proposer = proposer
+        self.verifier = verifier
+        self.padding = padding
+
+    def detect_batch(self, frames):
+        crops, origins = [], []
+        for frame_id, frame in enumerate(frames):
+            (h, w) = frame.shape[:2]
+            for (startX, startY, endX, endY, _) in self.proposer.detect(frame):
+                pad_x, pad_y = int((endX - startX) * self.padding), int((endY - startY) * self.padding)
+                box = clip_box(startX - pad_x, startY - pad_y, endX + pad_x, endY + pad_y, w, h)
+                if box is not None:
+                    crops.append(frame[box[1]:box[3], box[0]:box[2]])
+                    origins.append((frame_id, box[0], box[1]))
+
+        faces = [[] for _ in frames]
+        if not crops:
+            return faces
+        # All crops of all frames go through the verifier in one batch
+        for (frame_id, offset_x, offset_y), crop_faces in zip(origins, self.verifier.detect_batch(crops)):
+            for (startX, startY, endX, endY, confidence) in crop_faces:
+                faces[frame_id].append((startX + offset_x, startY + offset_y, endX + offset_x, endY + offset_y, confidence))
+        return faces
+
+    def model_files(self):
+        return self.proposer.model_files() + self.verifier.model_files()
+
+def create_detector(backend="ssd", input_size=300, confidence=CONFIDENCE_THRESHOLD,
+                    onnx_model_path=ONNX_MODEL_PATH, haar_cascade_path=None):
+    """Builds the named detector backend."""
+    if backend == "ssd":
+        return SSDDetector(input_size=input_size, confidence=confidence)
+    if backend == "haar":
+        return HaarDetector(haar_cascade_path)
+    if backend == "onnx":
+        return ONNXDetector(onnx_model_path, confidence=confidence)
+    if backend == "cascade":
+        return CascadeDetector(HaarDetector(haar_cascade_path, min_neighbors=3),
+                               SSDDetector(input_size=input_size, confidence=confidence))
+    raise ValueError(f"Unknown detector backend '{backend}'. Choose one of: {', '.join(BACKENDS)}.")
+
+def detector_options(app_settings):
+    """Extracts create_detector() keyword arguments from the application settings."""
+    return {
+        "backend": app_settings.get("detector_backend", "ssd"),
+        "input_size": int(app_settings.get("detector_input_size", 300)),
+        "confidence": float(app_settings.get("detection_confidence", CONFIDENCE_THRESHOLD)),
+        "onnx_model_path": app_settings.get("detector_onnx_model", ONNX_MODEL_PATH),
+        "haar_cascade_path": app_settings.get("haar_cascade_path") or None,
+    }
+
+def _box_iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def load_annotations(path):
+    """
+    Reads ground-truth faces from a CSV with columns image,startX,startY,endX,endY
+    (one row per face; image is relative to the image directory).
+    """
+    annotations = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            box = tuple(int(float(row[k])) for k in ("startX", "startY", "endX", "endY"))
+            annotations.setdefault(row["image"], []).append(box)
+    return annotations
+
+def benchmark(detectors, image_dir, annotations=None, iou_threshold=0.5, repeats=1):
+    """
+    Measures latency and recall of each detector on a directory of images.
+
+    Without annotations every image is assumed to contain one face and recall is
+    the fraction of images in which at least one face was found.
+
+    Timings, recall and faces_found (faces per pass over the images) are all
+    averaged over the repeats.
+
+    Returns:
+        list: One dict per detector with ms_per_image, recall, faces_found and images.
+    """
+    names = sorted(f for f in os.listdir(image_dir) if f.lower().endswith((".jpg", ".jpeg", ".png")))
+    if annotations is not None:
+        names = [n for n in names if n in annotations]
+    images = [(n, cv2.imread(os.path.join(image_dir, n))) for n in names]
+    images = [(n, im) for n, im in images if im is not None]
+
+    results = []
+    if not images:
+        return results
+    for label, detector in detectors:
+        detector.detect(images[0][1])  # Exclude one-off initialisation from the timing
+        hits, expected, found, elapsed = 0, 0, 0, 0.0
+        for name, im in images:
+            # Every repeat is scored, so recall and face counts cover the same runs as the timings
+            for _ in range(repeats):
+                start = time.perf_counter()
+                faces = detector.detect(im)
+                elapsed += time.perf_counter() - start
+                found += len(faces)
+                if annotations is None:
+                    expected += 1
+                    hits += 1 if faces else 0
+                else:
+                    unmatched = list(faces)
+                    for truth in annotations[name]:
+                        expected += 1
+                        match = next((f for f in unmatched if _box_iou(f[:4], truth) >= iou_threshold), None)
+                        if match is not None:
+                            hits += 1
+                            unmatched.remove(match)
+        results.append({
+            "backend": label,
+            "images": len(images),
+            "ms_per_image": elapsed * 1000 / (len(images) * repeats),
+            "recall": hits / expected if expected else 0.0,
+            "faces_found": found / repeats,
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends on a local image set.")
+    parser.add_argument("--images", required=True, help="Directory of test images.")
+    parser.add_argument("--annotations", help="CSV of ground-truth faces (image,startX,startY,endX,endY). "
+                                              "Without it every image is assumed to hold one face.")
+    parser.add_argument("--backends", default="ssd,haar,cascade", help=f"Comma-separated backends from: {', '.join(BACKENDS)}.")
+    parser.add_argument("--input-sizes", default="300", help="Comma-separated SSD input sizes to compare, e.g. 160,224,300.")
+    parser.add_argument("--onnx-model", default=ONNX_MODEL_PATH, help="ONNX detector model for the onnx backend.")
+    parser.add_argument("--repeats", type=int, default=1, help="Times each image is detected, for steadier timings.")
+    args = parser.parse_args()
+
+    detectors = []
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        sizes = [int(s) for s in args.input_sizes.split(",")] if backend in ("ssd", "cascade") else [300]
+        for size in sizes:
+            label = f"{backend}@{size}" if backend in ("ssd", "cascade") else backend
+            try:
+                detectors.append((label, create_detector(backend, input_size=size, onnx_model_path=args.onnx_model)))
+            except (FileNotFoundError, IOError, ValueError) as e:
+                print(f"Skipping {label}: {e}")
+    if not detectors:
+        parser.error("No detector backend could be loaded.")
+
+    annotations = load_annotations(args.annotations) if args.annotations else None
+    results = benchmark(detectors, args.images, annotations, repeats=args.repeats)
+    if not results:
+        parser.error(f"No readable images found in {args.images}")
+    print(f"{'backend':<14}{'ms/image':>10}{'recall':>9}{'faces':>8}")
+    for r in results:
+        print(f"{r['backend']:<14}{r['ms_per_image']:>10.2f}{r['recall'] * 100:>8.1f}%{r['faces_found']:>8.1f}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
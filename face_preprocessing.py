@@ -0,0 +1,271 @@
+# face_preprocessing.py
+
+"""
+The one place where face crops are prepared for the LBPH recognizer.
+
+Registration, training and live attendance all pass faces through the same
+FacePreprocessor, so a face is padded, cut out, optionally levelled on the
+eyes and resized to a fixed square before its LBP histogram is computed. The
+cost of one prediction then no longer depends on how close someone sits to
+the camera, and training and inference see identically prepared crops.
+
+Every image folder keeps a .preprocessing.json marker naming the images that
+were saved already prepared, and with which settings. Unmarked images are
+raw detector crops from before this existed; training squares and sizes them
+like live crops but adds no margin, and only marked images skip the alignment.
+
+Usage (normalizes training images captured before this existed, in place):
+    python face_preprocessing.py --images TrainingImage --size 100
+"""
+
+import os
+import cv2
+import json
+import math
+import argparse
+import logging
+import numpy as np
+
+EYE_CASCADE_FILE = "haarcascade_eye.xml"
+MAX_ALIGNMENT_ANGLE = 25.0  # Eye pairs tilted more than this are treated as false detections
+PREPARED_MARKER = ".preprocessing.json"  # Per image folder: {image name: signature it was prepared with}
+
+def default_eye_cascade_path():
+    """Looks for the eye cascade next to the app first, then in the OpenCV package."""
+    if os.path.exists(EYE_CASCADE_FILE):
+        return EYE_CASCADE_FILE
+    data_dir = cv2.data.haarcascades if hasattr(cv2, "data") else ""
+    return os.path.join(data_dir, EYE_CASCADE_FILE)
+
+class FacePreprocessor:
+    """Turns detector boxes, or already cropped faces, into fixed-size grayscale faces."""
+    def __init__(self, size=0, padding=0.0, align=False, eye_cascade_path=None):
+        """
+        Args:
+            size (int): Side of the square output face in pixels. 0 keeps the crop's own size.
+            padding (float): Fraction of the box size added around each side before cropping.
+            align (bool): Rotate faces so the eyes are level (needs the OpenCV eye cascade).
+            eye_cascade_path (str): Eye cascade XML; defaults to the one shipped with OpenCV.
+        """
+        self.size = max(0, int(size))
+        self.padding = max(0.0, float(padding))
+        self.eye_cascade = None
+        if align:
+            eye_cascade_path = eye_cascade_path or default_eye_cascade_path()
+            cascade = cv2.CascadeClassifier(eye_cascade_path) if os.path.exists(eye_cascade_path) else None
+            if cascade is None or cascade.empty():
+                logging.warning(f"Eye cascade {eye_cascade_path} not available; faces will not be aligned.")
+            else:
+                self.eye_cascade = cascade
+
+    def signature(self):
+        """The settings a face is prepared with, as recorded in the prepared-image markers."""
+        return {"size": self.size, "padding": self.padding, "aligned": self.eye_cascade is not None}
+
+    def crop(self, gray, box):
+        """
+        Cuts a face out of a grayscale frame and normalizes it.
+
+        The box is grown by the padding and squared around its centre so the face
+        is not stretched by the resize. Parts that fall outside the frame are filled
+        by repeating the edge pixels, which keeps faces at the border usable.
+
+        Args:
+            gray (np.ndarray): The grayscale frame.
+            box (tuple): (startX, startY, endX, endY) from the detector or a tracker.
+
+        Returns:
+            np.ndarray: The prepared face, or None if the box is empty.
+        """
+        (startX, startY, endX, endY) = [int(v) for v in box[:4]]
+        w, h = endX - startX, endY - startY
+        if w <= 0 or h <= 0:
+            return None
+        if self.size:
+            side = int(round(max(w, h) * (1.0 + 2.0 * self.padding)))
+            cx, cy = startX + w // 2, startY + h // 2
+            startX, startY = cx - side // 2, cy - side // 2
+            endX, endY = startX + side, startY + side
+        else:
+            pad_x, pad_y = int(round(w * self.padding)), int(round(h * self.padding))
+            startX, startY, endX, endY = startX - pad_x, startY - pad_y, endX + pad_x, endY + pad_y
+
+        frame_h, frame_w = gray.shape[:2]
+        face = gray[max(0, startY):min(frame_h, endY), max(0, startX):min(frame_w, endX)]
+        if face.size == 0:
+            return None
+        outside = (max(0, -startY), max(0, endY - frame_h), max(0, -startX), max(0, endX - frame_w))
+        if any(outside):
+            face = cv2.copyMakeBorder(face, *outside, cv2.BORDER_REPLICATE)
+        return self.normalize(face)
+
+    def normalize(self, face):
+        """Aligns (if enabled) and resizes an already cropped grayscale face."""
+        if face is None or face.size == 0:
+            return None
+        if self.eye_cascade is not None:
+            face = self.align(face)
+        return self.resize(face)
+
+    def resize(self, face):
+        """Resizes a face to the fixed output size, if one is set."""
+        if self.size and face.shape[:2] != (self.size, self.size):
+            # INTER_AREA for shrinking avoids aliasing that would leak into the LBP codes
+            interpolation = cv2.INTER_AREA if face.shape[0] > self.size else cv2.INTER_LINEAR
+            face = cv2.resize(face, (self.size, self.size), interpolation=interpolation)
+        return face
+
+    def prepare_saved(self, face, signature=None):
+        """
+        Prepares a stored training face for the recognizer.
+
+        Args:
+            face (np.ndarray): The grayscale training image.
+            signature (dict): What the image was prepared with when it was saved, or
+                None for a raw detector crop saved before preprocessing existed.
+
+        Returns:
+            np.ndarray: The face squared and sized like a live crop.
+        """
+        if face is None or face.size == 0:
+            return None
+        if signature is None:
+            # A legacy crop is the bare detector box. The margin crop() adds around a live box
+            # lies outside it, and faking it by repeating edge pixels would put smeared borders
+            # into the LBP histograms that live crops never have. So the margin is skipped, and
+            # for a fixed size the largest centred square is kept, so the face is not stretched.
+            if self.size:
+                h, w = face.shape[:2]
+                side = min(h, w)
+                top, left = (h - side) // 2, (w - side) // 2
+                face = face[top:top + side, left:left + side]
+            return self.normalize(face)
+        # Already padded, squared and possibly aligned; aligning again would rotate it twice
+        if self.eye_cascade is not None and not signature.get("aligned"):
+            face = self.align(face)
+        return self.resize(face)
+
+    def align(self, face):
+        """Rotates a face so the line between the eyes is horizontal. Faces without a clear eye pair are returned unchanged."""
+        h, w = face.shape[:2]
+        upper = face[:h * 3 // 5]  # Eyes sit in the upper part of the face; searching there avoids nostril hits
+        eyes = self.eye_cascade.detectMultiScale(upper, scaleFactor=1.1, minNeighbors=5,
+                                                 minSize=(max(1, w // 10), max(1, h // 10)))
+        if len(eyes) < 2:
+            return face
+        # The two largest candidates, left to right
+        eyes = sorted(sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2], key=lambda e: e[0])
+        (x1, y1, w1, h1), (x2, y2, w2, h2) = eyes
+        left = (x1 + w1 / 2.0, y1 + h1 / 2.0)
+        right = (x2 + w2 / 2.0, y2 + h2 / 2.0)
+        angle = math.degrees(math.atan2(right[1] - left[1], right[0] - left[0]))
+        if abs(angle) > MAX_ALIGNMENT_ANGLE or right[0] - left[0] < w / 8.0:
+            return face
+        centre = ((left[0] + right[0]) / 2.0, (left[1] + right[1]) / 2.0)
+        rotation = cv2.getRotationMatrix2D(centre, angle, 1.0)
+        return cv2.warpAffine(face, rotation, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def create_preprocessor(app_settings):
+    """Builds the FacePreprocessor configured in settings."""
+    return FacePreprocessor(
+        size=app_settings.get("face_size", 0),
+        padding=app_settings.get("face_padding", 0.0),
+        align=app_settings.get("face_alignment", False),
+    )
+
+def load_prepared(folder):
+    """Returns {image name: signature} for the images in folder that were saved already prepared."""
+    try:
+        with open(os.path.join(folder, PREPARED_MARKER), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"Ignoring unreadable marker in {folder}: {e}")
+        return {}
+
+def mark_prepared(folder, names, signature):
+    """Records that the given images in folder were saved prepared with signature."""
+    prepared = load_prepared(folder)
+    prepared.update({name: signature for name in names})
+    path = os.path.join(folder, PREPARED_MARKER)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(prepared, f, indent=4)
+    os.replace(tmp_path, path)
+
+def normalize_training_images(train_path, preprocessor, dry_run=False):
+    """
+    Rewrites every training image below train_path in the prepared form, using
+    the same square geometry as live crops, and marks it so later runs and
+    training leave it alone. Each file is replaced atomically, so an
+    interrupted run leaves only whole images.
+
+    Returns:
+        dict: Counts of images normalized, already normalized and unreadable, and the
+        average pixel count per face before and after.
+    """
+    report = {"normalized": 0, "unchanged": 0, "failed": 0, "pixels_before": 0, "pixels_after": 0}
+    signature = preprocessor.signature()
+    for dirpath, dirnames, filenames in os.walk(train_path):
+        dirnames.sort()
+        prepared = load_prepared(dirpath)
+        for name in sorted(filenames):
+            if not name.lower().endswith(('.png', '.jpg', '.jpeg')):
+                continue
+            path = os.path.join(dirpath, name)
+            if prepared.get(name) == signature:
+                report["unchanged"] += 1
+                continue
+            face = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            if face is None:
+                logging.warning(f"Skipping unreadable training image {path}")
+                report["failed"] += 1
+                continue
+            normalized = preprocessor.prepare_saved(face, prepared.get(name))
+            report["pixels_before"] += face.size
+            report["pixels_after"] += normalized.size
+            report["normalized"] += 1
+            if dry_run:
+                continue
+            root, ext = os.path.splitext(path)
+            tmp_path = f"{root}.tmp{ext}"
+            if not cv2.imwrite(tmp_path, normalized):
+                raise IOError(f"Could not write {tmp_path}.")
+            os.replace(tmp_path, path)
+            # Marked straight away: cutting an already prepared image again would pad it twice
+            mark_prepared(dirpath, [name], signature)
+    if report["normalized"]:
+        report["pixels_before"] //= report["normalized"]
+        report["pixels_after"] //= report["normalized"]
+    return report
+
+def main():
+    from settings import load_settings
+    app_settings = load_settings()
+    parser = argparse.ArgumentParser(description="Normalize existing training images to the configured fixed face size.")
+    parser.add_argument("--images", default="TrainingImage", help="Root folder of the training images.")
+    parser.add_argument("--size", type=int, default=app_settings.get("face_size", 0),
+                        help="Output side in pixels (default: face_size setting).")
+    parser.add_argument("--align", action="store_true", default=app_settings.get("face_alignment", False),
+                        help="Also level the eyes (default: face_alignment setting).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.images):
+        parser.error(f"{args.images} is not a directory.")
+    if args.size <= 0:
+        parser.error("--size must be positive to normalize images.")
+    report = normalize_training_images(args.images, FacePreprocessor(args.size, app_settings.get("face_padding", 0.0), args.align), args.dry_run)
+    verb = "Would normalize" if args.dry_run else "Normalized"
+    print(f"{verb} {report['normalized']} image(s); {report['unchanged']} already prepared, "
+          f"{report['failed']} unreadable.")
+    if report["normalized"]:
+        print(f"Average pixels per rewritten face: {report['pixels_before']} -> {report['pixels_after']}")
+    if report["normalized"] and not args.dry_run:
+        print("Retrain the model (Rebuild Full Model) so it matches the normalized images, "
+              f"and set face_size to {args.size} so live crops match them too.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,328 @@
+# face_tracker.py
+
+import logging
+from collections import Counter, deque
+import cv2
+
+# OpenCV tracker factories in order of preference for each tracker type.
+# MOSSE is only exposed through the legacy module of opencv-contrib builds.
+_TRACKER_FACTORIES = {
+    "mosse": ["legacy.TrackerMOSSE_create"],
+    "kcf": ["TrackerKCF_create", "legacy.TrackerKCF_create"],
+    "csrt": ["TrackerCSRT_create", "legacy.TrackerCSRT_create"],
+}
+TEMPLATE_MATCH_THRESHOLD = 0.5  # Minimum normalized correlation for the template-matching fallback
+UNKNOWN_IDENTITY = -1  # Identity assigned to a track whose votes agree it is not a registered student
+
+def iou(box_a, box_b):
+    """Returns the intersection-over-union of two (startX, startY, endX, endY) boxes."""
+    inter_w = min(box_a[2], box_b[2]) - max(box_a[0], box_b[0])
+    inter_h = min(box_a[3], box_b[3]) - max(box_a[1], box_b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    area_a = (box_a[2] - box_a[0]) * (box_a[3] - box_a[1])
+    area_b = (box_b[2] - box_b[0]) * (box_b[3] - box_b[1])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+def create_cv_tracker(tracker_type):
+    """
+    Creates an OpenCV single-object tracker of the given type.
+    Returns None if the type is unknown or not available in this OpenCV build.
+    """
+    for factory_name in _TRACKER_FACTORIES.get(tracker_type, []):
+        owner = cv2
+        for part in factory_name.split("."):
+            owner = getattr(owner, part, None)
+            if owner is None:
+                break
+        if owner is not None:
+            return owner()
+    return None
+
+class Track:
+    """
+    A single face followed across frames.
+
+    Each track collects recognition votes until enough of them agree on an
+    identity. Once confirmed, the track only needs an occasional prediction
+    to re-verify that identity.
+    """
+    def __init__(self, track_id, box, frame, gray, tracker_type, vote_window=5):
+        self.track_id = track_id
+        self.tracker_type = tracker_type
+        self.box = box
+        self.misses = 0  # Consecutive detection rounds in which this track was not matched
+        self.age = 0     # Frames since the track was created
+        self._cv_tracker = None
+        self._template = None
+
+        self.votes = deque(maxlen=vote_window)  # (label, confidence); label is UNKNOWN_IDENTITY for no match
+        self.identity = None  # Confirmed label, UNKNOWN_IDENTITY, or None while still voting
+        self.identity_confidence = None  # Mean LBPH distance of the winning votes
+        self.last_prediction_frame = None
+        self.reset(box, frame, gray)
+
+    def needs_prediction(self, frame_count, reverify_every_n_frames):
+        """Returns True if this track should be passed to the recognizer on this frame."""
+        if self.identity is None or self.last_prediction_frame is None:
+            return True
+        return frame_count - self.last_prediction_frame >= reverify_every_n_frames
+
+    def add_vote(self, label, confidence, frame_count, min_agreement):
+        """
+        Records one recognition result and decides the identity once enough votes agree.
+
+        Returns:
+            bool: True if this vote confirmed a new identity for the track.
+        """
+        self.last_prediction_frame = frame_count
+        if self.identity is not None:
+            # Re-verification: a disagreeing prediction sends the track back to voting.
+            if label != self.identity:
+                logging.info(f"Track {self.track_id}: re-verification disagreed ({label} != {self.identity}), re-voting.")
+                self.identity = None
+                self.identity_confidence = None
+                self.votes.clear()
+                self.votes.append((label, confidence))
+            return False
+
+        self.votes.append((label, confidence))
+        if len(self.votes) < self.votes.maxlen:
+            return False
+        winner, count = Counter(l for l, _ in self.votes).most_common(1)[0]
+        if count / len(self.votes) < min_agreement:
+            return False
+        self.identity = winner
+        winning = [c for l, c in self.votes if l == winner]
+        self.identity_confidence = sum(winning) / len(winning)
+        return True
+
+    def reset(self, box, frame, gray):
+        """Re-anchors the track on a fresh detection box."""
+        self.box = box
+        self.misses = 0
+        (startX, startY, endX, endY) = box
+        self._cv_tracker = create_cv_tracker(self.tracker_type) if self.tracker_type != "none" else None
+        if self._cv_tracker is not None:
+            try:
+                self._cv_tracker.init(frame, (int(startX), int(startY), int(endX - startX), int(endY - startY)))
+            except cv2.error as e:
+                logging.warning(f"Could not initialise {self.tracker_type} tracker, using template matching: {e}")
+                self._cv_tracker = None
+        self._template = gray[startY:endY, startX:endX].copy() if self._cv_tracker is None else None
+
+    def follow(self, frame, gray):
+        """
+        Moves the track to its position in the new frame without running the detector.
+        Returns False if the face could not be followed.
+        """
+        self.age += 1
+        if self.tracker_type == "none":
+            return True  # Boxes are simply held until the next detection
+        (h, w) = gray.shape[:2]
+        if self._cv_tracker is not None:
+            ok, rect = self._cv_tracker.update(frame)
+            if not ok:
+                return False
+            (x, y, rw, rh) = [int(v) for v in rect]
+            new_box = (max(0, x), max(0, y), min(w - 1, x + rw), min(h - 1, y + rh))
+        else:
+            new_box = self._follow_template(gray)
+            if new_box is None:
+                return False
+        if new_box[2] <= new_box[0] or new_box[3] <= new_box[1]:
+            return False
+        self.box = new_box
+        return True
+
+    def _follow_template(self, gray):
+        """Fallback tracker: searches for the last face patch in a window around the old box."""
+        if self._template is None or self._template.size == 0:
+            return None
+        (startX, startY, endX, endY) = self.box
+        (h, w) = gray.shape[:2]
+        box_w, box_h = endX - startX, endY - startY
+        sx0, sy0 = max(0, startX - box_w // 2), max(0, startY - box_h // 2)
+        sx1, sy1 = min(w, endX + box_w // 2), min(h, endY + box_h // 2)
+        search = gray[sy0:sy1, sx0:sx1]
+        th, tw = self._template.shape[:2]
+        if search.shape[0] < th or search.shape[1] < tw:
+            return None
+        result = cv2.matchTemplate(search, self._template, cv2.TM_CCOEFF_NORMED)
+        _, max_val, _, max_loc = cv2.minMaxLoc(result)
+        if max_val < TEMPLATE_MATCH_THRESHOLD:
+            return None
+        x, y = sx0 + max_loc[0], sy0 + max_loc[1]
+        return (x, y, min(w - 1, x + tw), min(h - 1, y + th))
+
+class FaceTracker:
+    """
+    Runs the face detector only every N frames (or when a track is lost) and
+    follows faces with a lightweight tracker in between.
+
+    Detections are associated with existing tracks by greedy IoU matching, new
+    detections start new tracks and tracks unmatched for several detection
+    rounds are dropped.
+    """
+    def __init__(self, detect_every_n_frames=5, tracker_type="kcf", iou_threshold=0.3, max_misses=2,
+                 identity_votes=5, min_agreement=0.6, reverify_every_n_frames=150, motion_gate=None,
+                 preprocessor=None):
+        """
+        Args:
+            detect_every_n_frames (int): Run the detector on every Nth frame. 1 disables tracking.
+            tracker_type (str): "kcf", "mosse", "csrt" or "none" (hold boxes between detections).
+            iou_threshold (float): Minimum IoU to associate a detection with an existing track.
+            max_misses (int): Detection rounds a track may go unmatched before it is removed.
+            identity_votes (int): Number of recent predictions considered when voting on a track's identity.
+            min_agreement (float): Fraction of those votes that must agree to confirm an identity.
+            reverify_every_n_frames (int): Frames between predictions once a track's identity is confirmed.
+            motion_gate (MotionGate): Optional scene-change test; scheduled detections are skipped on static frames.
+            preprocessor (FacePreprocessor): Prepares face crops for the recognizer; raw box slices if None.
+        """
+        self.detect_every_n_frames = max(1, int(detect_every_n_frames))
+        self.tracker_type = tracker_type
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.identity_votes = max(1, int(identity_votes))
+        self.min_agreement = min_agreement
+        self.reverify_every_n_frames = max(1, int(reverify_every_n_frames))
+        self.motion_gate = motion_gate
+        self.preprocessor = preprocessor
+        self.tracks = []
+        self._next_id = 1
+        self.frame_count = 0
+        self.detection_count = 0
+        self.prediction_count = 0
+        self._frames_since_detection = 0
+
+    def update(self, frame, gray, detect_fn):
+        """
+        Advances all tracks to the given frame.
+
+        Args:
+            frame (np.ndarray): The BGR frame.
+            gray (np.ndarray): The same frame in grayscale.
+            detect_fn (callable): Called with the BGR frame when detection is due;
+                must return a list of (startX, startY, endX, endY, confidence).
+
+        Returns:
+            list[Track]: The active tracks for this frame.
+        """
+        if self.prepare(frame, gray):
+            self.apply_detections(frame, gray, detect_fn(frame))
+        return self.tracks
+
+    def prepare(self, frame, gray):
+        """
+        First half of update(): follows the tracks into the new frame unless detection
+        is scheduled. Lets several trackers share one batched detector call.
+
+        Returns:
+            bool: True if detections for this frame must be passed to apply_detections().
+        """
+        self.frame_count += 1
+        if self.motion_gate is not None:
+            self.motion_gate.advance()  # The refresh counts frames, not scheduled detections
+        detection_due = (not self.tracks
+                         or self.detect_every_n_frames == 1
+                         or self._frames_since_detection + 1 >= self.detect_every_n_frames)
+        if detection_due and self.motion_gate is not None and not self.motion_gate.should_detect(gray):
+            # Nothing moved since the last detection; keep following the existing tracks.
+            detection_due = False
+
+        if not detection_due:
+            lost = [track for track in self.tracks if not track.follow(frame, gray)]
+            if lost:
+                # A face slipped away from its tracker; re-detect now rather than wait.
+                detection_due = True
+
+        if not detection_due:
+            self._frames_since_detection += 1
+        return detection_due
+
+    def apply_detections(self, frame, gray, detections):
+        """Associates fresh detections, (startX, startY, endX, endY, confidence), with existing tracks."""
+        self.detection_count += 1
+        self._frames_since_detection = 0
+        if self.motion_gate is not None:
+            self.motion_gate.mark_detected(gray)
+        detections = [tuple(int(v) for v in det[:4]) for det in detections]
+
+        # Greedy IoU association, best pairs first
+        pairs = []
+        for t_idx, track in enumerate(self.tracks):
+            for d_idx, box in enumerate(detections):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, t_idx, d_idx))
+        pairs.sort(reverse=True)
+
+        matched_tracks, matched_dets = set(), set()
+        for _, t_idx, d_idx in pairs:
+            if t_idx in matched_tracks or d_idx in matched_dets:
+                continue
+            matched_tracks.add(t_idx)
+            matched_dets.add(d_idx)
+            self.tracks[t_idx].reset(detections[d_idx], frame, gray)
+
+        survivors = []
+        for t_idx, track in enumerate(self.tracks):
+            if t_idx not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+
+        for d_idx, box in enumerate(detections):
+            if d_idx not in matched_dets:
+                survivors.append(Track(self._next_id, box, frame, gray, self.tracker_type, self.identity_votes))
+                self._next_id += 1
+        self.tracks = survivors
+
+    def recognize(self, gray, predict_fn, recognition_threshold):
+        """
+        Runs the recognizer on the tracks that still need a vote or are due for re-verification.
+
+        Args:
+            gray (np.ndarray): The current frame in grayscale.
+            predict_fn (callable): Called with a list of grayscale face ROIs; must return
+                a list of (label, confidence) pairs, one per ROI.
+            recognition_threshold (float): LBPH distance below which a prediction counts as a match.
+
+        Returns:
+            list[Track]: Tracks whose identity was confirmed on this frame.
+        """
+        pending, rois = [], []
+        for track in self.tracks:
+            if not track.needs_prediction(self.frame_count, self.reverify_every_n_frames):
+                continue
+            if self.preprocessor is not None:
+                roi = self.preprocessor.crop(gray, track.box)
+            else:
+                (startX, startY, endX, endY) = track.box
+                roi = gray[startY:endY, startX:endX]
+            if roi is None or roi.size == 0:
+                continue
+            pending.append(track)
+            rois.append(roi)
+
+        confirmed = []
+        if not rois:
+            return confirmed
+        self.prediction_count += len(rois)
+        for track, (label, conf) in zip(pending, predict_fn(rois)):
+            vote = label if conf < recognition_threshold else UNKNOWN_IDENTITY
+            if track.add_vote(vote, conf, self.frame_count, self.min_agreement):
+                confirmed.append(track)
+        return confirmed
+
+    def summary(self):
+        """Returns a one-line summary of how often the detector and recognizer actually ran."""
+        ratio = (self.detection_count / self.frame_count * 100) if self.frame_count else 0.0
+        summary = (f"detector ran on {self.detection_count}/{self.frame_count} frames ({ratio:.0f}%), "
+                   f"{self.prediction_count} recognizer predictions for {self._next_id - 1} tracks")
+        if self.motion_gate is not None:
+            summary += f", {self.motion_gate.summary()}"
+        return summary
@@ -0,0 +1,153 @@
+# frame_grabber.py
+
+import threading
+import time
+import logging
+from collections import deque
+import cv2
+
+class FrameGrabber:
+    """
+    Reads frames from a camera on a dedicated background thread.
+
+    Frames are kept in a small bounded buffer. read() hands the consumer the
+    most recent frame and discards the older ones still buffered, so a slow
+    consumer never processes a frame that has been waiting in the queue.
+
+    Usage:
+        with FrameGrabber(camera_index) as grabber:
+            ret, frame = grabber.read()
+    """
+    def __init__(self, source, max_queue_size=2, read_timeout=2.0, name=None):
+        """
+        Args:
+            source (int | str): Camera index or video source passed to cv2.VideoCapture.
+            max_queue_size (int): Maximum number of frames buffered before the oldest is dropped.
+            read_timeout (float): Seconds read() waits for a new frame before giving up.
+            name (str): Optional name used in log messages and stats.
+        """
+        self.source = source
+        self.max_queue_size = max(1, int(max_queue_size))
+        self.read_timeout = read_timeout
+        self.name = name or f"camera-{source}"
+
+        self._frames = deque(maxlen=self.max_queue_size)
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._cam = None
+
+        self.captured_count = 0
+        self.dropped_count = 0
+        self.processed_count = 0
+        self.max_queue_depth = 0
+        self._queue_depth_total = 0  # Sum of buffer depths seen by read(), for the average
+        self._start_time = None
+        self._stop_time = None
+
+    def start(self):
+        """Opens the camera and starts the capture thread."""
+        self._cam = cv2.VideoCapture(self.source)
+        if not self._cam.isOpened():
+            self._cam.release()
+            self._cam = None
+            raise IOError(f"Cannot open webcam at index {self.source}. Check settings.")
+
+        self._stop_event.clear()
+        self._start_time = time.time()
+        self._thread = threading.Thread(target=self._capture_loop, name=f"FrameGrabber-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        """Continuously grabs frames until stopped or the camera fails."""
+        while not self._stop_event.is_set():
+            ret, frame = self._cam.read()
+            if not ret:
+                logging.warning(f"{self.name}: failed to grab frame, stopping capture thread.")
+                break
+            with self._condition:
+                if len(self._frames) == self.max_queue_size:
+                    # deque(maxlen) silently evicts the oldest frame; count it.
+                    self.dropped_count += 1
+                self._frames.append(frame)
+                self.captured_count += 1
+                self._condition.notify()
+        with self._condition:
+            self._stop_event.set()
+            self._condition.notify_all()
+
+    def read(self, timeout=None):
+        """
+        Returns the most recent buffered frame, waiting for one if the buffer is empty.
+        Older frames still in the buffer are discarded and counted as dropped.
+
+        Returns:
+            tuple: (True, frame) on success, (False, None) if the grabber stopped
+            or no frame arrived within the timeout. Mirrors cv2.VideoCapture.read().
+        """
+        timeout = self.read_timeout if timeout is None else timeout
+        with self._condition:
+            if not self._frames and not self._stop_event.is_set():
+                self._condition.wait_for(lambda: self._frames or self._stop_event.is_set(), timeout=timeout)
+            if not self._frames:
+                return False, None
+            self._queue_depth_total += len(self._frames)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._frames))
+            self.processed_count += 1
+            frame = self._frames.pop()
+            self.dropped_count += len(self._frames)
+            self._frames.clear()
+            return True, frame
+
+    def queue_depth(self):
+        """Returns the number of frames currently waiting in the buffer."""
+        with self._condition:
+            return len(self._frames)
+
+    def is_running(self):
+        """Returns True while the capture thread is delivering frames."""
+        return self._thread is not None and not self._stop_event.is_set()
+
+    def stop(self):
+        """Stops the capture thread and releases the camera."""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        if self._cam is not None:
+            self._cam.release()
+            self._cam = None
+        if self._stop_time is None and self._start_time is not None:
+            self._stop_time = time.time()
+
+    def stats(self):
+        """Returns a dictionary of capture counters for end-of-session reporting."""
+        end = self._stop_time or time.time()
+        elapsed = (end - self._start_time) if self._start_time else 0.0
+        return {
+            "name": self.name,
+            "captured": self.captured_count,
+            "processed": self.processed_count,
+            "dropped": self.dropped_count,
+            "elapsed_seconds": elapsed,
+            "capture_fps": self.captured_count / elapsed if elapsed > 0 else 0.0,
+            "processed_fps": self.processed_count / elapsed if elapsed > 0 else 0.0,
+            "mean_queue_depth": self._queue_depth_total / self.processed_count if self.processed_count else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def summary(self):
+        """Returns a one-line, human readable summary of the capture counters."""
+        s = self.stats()
+        return (f"{s['name']}: processed {s['processed']} of {s['captured']} frames, "
+                f"dropped {s['dropped']} ({s['processed_fps']:.1f} fps processed, "
+                f"queue depth avg {s['mean_queue_depth']:.1f} / max {s['max_queue_depth']})")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
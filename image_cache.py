@@ -0,0 +1,82 @@
+# image_cache.py
+
+import os
+import logging
+import numpy as np
+
+IMAGE_CACHE_DIR = os.path.join("TrainingImageLabel", "image_cache")
+
+class FolderImageCache:
+    """
+    Decoded grayscale training images of one folder, stored as a single .npz.
+
+    Every entry is keyed by file name and validated against the file's mtime
+    and size, so an unchanged folder is loaded with one read instead of one
+    JPEG decode per image, and a folder with a few new images only needs those
+    decoded. Faces have different sizes, so their pixels are stored
+    concatenated with a shape per entry.
+    """
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.entries = {}  # file name -> (mtime_ns, size, student_id, face)
+        self.dirty = False
+
+    @classmethod
+    def for_folder(cls, folder, root, cache_dir=IMAGE_CACHE_DIR):
+        """Returns the (not yet loaded) cache for a folder below the training root."""
+        relative = os.path.relpath(folder, root)
+        key = "_root" if relative == "." else relative.replace(os.sep, "__")
+        return cls(os.path.join(cache_dir, f"{key}.npz"))
+
+    def load(self):
+        """Reads the cache file if present. A damaged file is ignored and rebuilt."""
+        if not os.path.exists(self.cache_path):
+            return self
+        try:
+            with np.load(self.cache_path) as data:
+                # Indexing an NpzFile re-reads the member, so pull each array out once
+                names, mtimes, sizes, ids, shapes, pixels = (data[k] for k in ("names", "mtimes", "sizes", "ids", "shapes", "pixels"))
+            offsets = np.concatenate(([0], np.cumsum(shapes.prod(axis=1))))
+            for i, name in enumerate(names.tolist()):
+                face = pixels[offsets[i]:offsets[i + 1]].reshape(shapes[i])
+                self.entries[name] = (int(mtimes[i]), int(sizes[i]), int(ids[i]), face)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable image cache {self.cache_path}: {e}")
+            self.entries = {}
+        return self
+
+    def get(self, name, stat):
+        """Returns (student_id, face) if the cached entry matches the file's stat, else None."""
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+            return None
+        return entry[2], entry[3]
+
+    def put(self, name, stat, student_id, face):
+        self.entries[name] = (stat.st_mtime_ns, stat.st_size, student_id, face)
+        self.dirty = True
+
+    def retain(self, names):
+        """Drops entries for files that no longer exist."""
+        stale = set(self.entries) - set(names)
+        for name in stale:
+            del self.entries[name]
+        self.dirty = self.dirty or bool(stale)
+
+    def save(self):
+        """Writes the cache if anything changed, replacing the old file atomically."""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        names = sorted(self.entries)
+        faces = [self.entries[n][3] for n in names]
+        tmp_path = self.cache_path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp_path,
+                 names=np.array(names, dtype=str),
+                 mtimes=np.array([self.entries[n][0] for n in names], dtype=np.int64),
+                 sizes=np.array([self.entries[n][1] for n in names], dtype=np.int64),
+                 ids=np.array([self.entries[n][2] for n in names], dtype=np.int64),
+                 shapes=np.array([f.shape for f in faces], dtype=np.int64).reshape(-1, 2),
+                 pixels=np.concatenate([f.ravel() for f in faces]) if faces else np.zeros(0, np.uint8))
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
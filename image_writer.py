@@ -0,0 +1,73 @@
+# image_writer.py
+
+import queue
+import logging
+import threading
+import cv2
+
+def write_image(path, image):
+    """Encodes and writes one image, raising if OpenCV could not write it."""
+    if not cv2.imwrite(path, image):
+        raise IOError(f"Could not write {path}.")
+
+class AsyncImageWriter:
+    """
+    Encodes and writes images on a background thread so a capture loop never
+    waits for JPEG encoding or the disk.
+
+    Submitted images wait in a bounded queue; submit() only blocks if the disk
+    falls that far behind. close() waits for everything to be written.
+
+    Usage:
+        with AsyncImageWriter() as writer:
+            writer.submit(path, face)
+    """
+    def __init__(self, write_fn=write_image, max_pending=64, name="ImageWriter"):
+        """
+        Args:
+            write_fn (callable): Called as write_fn(key, image) on the writer thread.
+            max_pending (int): Images that may wait to be written before submit() blocks.
+            name (str): Thread name used in log messages.
+        """
+        self.write_fn = write_fn
+        self.name = name
+        self._queue = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._thread = None
+        self.written_count = 0
+        self.errors = []  # (key, error message) for images that could not be written
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_loop, name=self.name, daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, key, image):
+        """Queues an image for writing. The caller must not modify the image afterwards."""
+        self._queue.put((key, image))
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            key, image = item
+            try:
+                self.write_fn(key, image)
+                self.written_count += 1
+            except Exception as e:
+                logging.error(f"{self.name}: failed to write {key}: {e}")
+                self.errors.append((key, str(e)))
+
+    def close(self):
+        """Waits until every submitted image is written and stops the thread."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
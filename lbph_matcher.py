@@ -0,0 +1,661 @@
+# lbph_matcher.py
+
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import argparse
+import numpy as np
+import cv2
+from PIL import Image
+
+DEFAULT_CHUNK_SAMPLES = 4096  # Training histograms scored per block, bounds temporary memory
+BLOCK_ELEMENTS = 1 << 21  # Gathered (query bin x sample) values per block; keeps the temporaries cache-sized
+BINARY_MODEL_SUFFIX = ".lbph"  # Binary models are directories of versions: v<n>/{histograms.npy, labels.npy, meta.json}
+BINARY_CURRENT_FILE = "CURRENT"  # Names the version directory holding a binary model's live files
+BINARY_FORMAT_VERSION = 1
+STALE_SAVE_SECONDS = 3600  # A binary model's unfinished version directory older than this is left over from a crashed save
+_TINY = 1e-30  # Weight of padding bins in batched chi-square blocks; far below any real bin value
+
+def is_binary_model(path):
+    """Returns True if path names a binary (directory) model rather than a cv2.face YAML file."""
+    return path.endswith(BINARY_MODEL_SUFFIX) or os.path.isdir(path)
+
+def binary_model_path(yml_path):
+    """Returns the binary model path that sits next to a YAML model, e.g. Trainner.yml -> Trainner.lbph."""
+    return os.path.splitext(yml_path)[0] + BINARY_MODEL_SUFFIX
+
+def binary_model_files(path):
+    """
+    Returns the directory holding a binary model's current histograms.npy,
+    labels.npy and meta.json: the version named by its CURRENT file, or the
+    model directory itself for models saved before versioning.
+    """
+    try:
+        with open(os.path.join(path, BINARY_CURRENT_FILE), "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+def model_exists(path):
+    """Returns True if a trained, non-empty model file or complete binary model exists at path."""
+    if is_binary_model(path):
+        return os.path.exists(os.path.join(binary_model_files(path), "meta.json"))
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+def model_signature_files(path):
+    """Files whose modification marks a new version of the model at path."""
+    if not is_binary_model(path):
+        return [path]
+    current = os.path.join(path, BINARY_CURRENT_FILE)
+    return [current] if os.path.exists(current) else [os.path.join(path, "meta.json")]
+
+def elbp(gray, radius=1, neighbors=8):
+    """
+    Computes the extended (circular) local binary pattern image of a grayscale face.
+    This mirrors OpenCV's LBPHFaceRecognizer implementation, including its bilinear
+    interpolation of the sampling points, so histograms are directly comparable.
+    """
+    src = np.asarray(gray, dtype=np.float32)
+    rows, cols = src.shape[:2]
+    out_h, out_w = rows - 2 * radius, cols - 2 * radius
+    dst = np.zeros((max(out_h, 0), max(out_w, 0)), dtype=np.int64)
+    if out_h <= 0 or out_w <= 0:
+        return dst
+
+    center = src[radius:rows - radius, radius:cols - radius]
+    eps = np.finfo(np.float32).eps
+    for n in range(neighbors):
+        x = np.float32(radius * np.cos(2.0 * np.pi * n / float(neighbors)))
+        y = np.float32(-radius * np.sin(2.0 * np.pi * n / float(neighbors)))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        ty, tx = np.float32(y - fy), np.float32(x - fx)
+        w1 = np.float32((1 - tx) * (1 - ty))
+        w2 = np.float32(tx * (1 - ty))
+        w3 = np.float32((1 - tx) * ty)
+        w4 = np.float32(tx * ty)
+
+        def shifted(dy, dx):
+            return src[radius + dy:rows - radius + dy, radius + dx:cols - radius + dx]
+
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        dst += (((t > center) | (np.abs(t - center) < eps)).astype(np.int64) << n)
+    return dst
+
+def spatial_histogram(lbp, num_patterns, grid_x=8, grid_y=8):
+    """
+    Splits an LBP image into a grid and concatenates the normalized histogram of each cell.
+    Returns a float32 vector of length grid_x * grid_y * num_patterns.
+    """
+    result = np.zeros((grid_x * grid_y, num_patterns), dtype=np.float32)
+    if lbp.size == 0:
+        return result.ravel()
+    width, height = lbp.shape[1] // grid_x, lbp.shape[0] // grid_y
+    row = 0
+    for i in range(grid_y):
+        for j in range(grid_x):
+            cell = lbp[i * height:(i + 1) * height, j * width:(j + 1) * width]
+            if cell.size:
+                result[row] = np.bincount(cell.ravel(), minlength=num_patterns)[:num_patterns] / cell.size
+            row += 1
+    return result.ravel()
+
+def compute_lbph_histogram(gray, radius=1, neighbors=8, grid_x=8, grid_y=8):
+    """Computes the LBPH descriptor of a grayscale face exactly as cv2.face does for predict()."""
+    return spatial_histogram(elbp(gray, radius, neighbors), 2 ** neighbors, grid_x, grid_y)
+
+class LBPHModel:
+    """
+    The contents of a trained LBPH model: its parameters plus every training
+    histogram stacked into one (samples x features) float32 matrix.
+
+    Models load from cv2.face YAML files or from the binary directory format
+    (see save_binary), which is memory-mapped instead of parsed.
+    """
+    def __init__(self, histograms, labels, radius=1, neighbors=8, grid_x=8, grid_y=8, threshold=np.finfo(np.float64).max):
+        # asarray, not a copy: a memory-mapped matrix must stay memory-mapped
+        self.histograms = np.asarray(histograms, dtype=np.float32)
+        self.labels = np.asarray(labels, dtype=np.int32).ravel()
+        self.radius = int(radius)
+        self.neighbors = int(neighbors)
+        self.grid_x = int(grid_x)
+        self.grid_y = int(grid_y)
+        self.threshold = float(threshold)
+
+    @classmethod
+    def from_recognizer(cls, recognizer):
+        """Builds a model from a trained cv2.face.LBPHFaceRecognizer."""
+        histograms = recognizer.getHistograms()
+        labels = recognizer.getLabels()
+        matrix = np.vstack([np.asarray(h, dtype=np.float32).reshape(1, -1) for h in histograms]) if len(histograms) else np.zeros((0, 0), np.float32)
+        return cls(matrix, labels, recognizer.getRadius(), recognizer.getNeighbors(),
+                   recognizer.getGridX(), recognizer.getGridY(), recognizer.getThreshold())
+
+    @classmethod
+    def from_file(cls, path, mmap=True):
+        """Loads a binary model directory, or a model saved by LBPHFaceRecognizer.save() (e.g. Trainner.yml)."""
+        if is_binary_model(path):
+            return cls.from_binary(path, mmap)
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(path)
+        return cls.from_recognizer(recognizer)
+
+    @classmethod
+    def from_binary(cls, path, mmap=True):
+        """
+        Loads a binary model directory. With mmap the histogram matrix is mapped
+        read-only rather than read, so loading is near-instant and every process
+        using the model shares the same pages of the OS file cache.
+        """
+        try:
+            version_dir = binary_model_files(path)
+            with open(os.path.join(version_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            # A save replaced the version we were pointed at and removed it; follow CURRENT again
+            version_dir = binary_model_files(path)
+            with open(os.path.join(version_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta.get("format") != "lbph-binary" or meta.get("version", 0) > BINARY_FORMAT_VERSION:
+            raise ValueError(f"{path} is not a supported binary LBPH model.")
+        histograms = np.load(os.path.join(version_dir, "histograms.npy"), mmap_mode="r" if mmap else None)
+        labels = np.load(os.path.join(version_dir, "labels.npy"))
+        if histograms.shape[0] != meta["samples"] or labels.shape[0] != meta["samples"]:
+            raise ValueError(f"Binary model {path} is incomplete (expected {meta['samples']} samples).")
+        return cls(histograms, labels, meta["radius"], meta["neighbors"], meta["grid_x"], meta["grid_y"], meta["threshold"])
+
+    def histogram(self, gray):
+        """Computes the descriptor of a query face using this model's parameters."""
+        return compute_lbph_histogram(gray, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def without_labels(self, labels):
+        """Returns a copy of the model with every sample of the given labels removed."""
+        keep = ~np.isin(self.labels, np.asarray(list(labels), dtype=np.int32))
+        return LBPHModel(self.histograms[keep], self.labels[keep], self.radius, self.neighbors,
+                         self.grid_x, self.grid_y, self.threshold)
+
+    def only_labels(self, labels):
+        """Returns a copy of the model restricted to the samples of the given labels."""
+        keep = np.isin(self.labels, np.asarray(list(labels), dtype=np.int32))
+        return LBPHModel(self.histograms[keep], self.labels[keep], self.radius, self.neighbors,
+                         self.grid_x, self.grid_y, self.threshold)
+
+    def with_samples(self, histograms, labels):
+        """Returns a copy of the model with extra training histograms appended."""
+        histograms = np.asarray(histograms, dtype=np.float32).reshape(len(labels), -1)
+        if not len(self.labels):
+            combined = histograms
+        else:
+            combined = np.concatenate([self.histograms, histograms])
+        return LBPHModel(combined, np.concatenate([self.labels, np.asarray(labels, dtype=np.int32).ravel()]),
+                         self.radius, self.neighbors, self.grid_x, self.grid_y, self.threshold)
+
+    def save(self, path):
+        """Writes the model as a binary directory or as cv2.face YAML, depending on the path."""
+        if is_binary_model(path):
+            self.save_binary(path)
+        else:
+            self.save_yml(path)
+
+    def save_binary(self, path):
+        """
+        Writes the model as a new version directory of histograms.npy, labels.npy
+        and meta.json inside path, then points path/CURRENT at it.
+
+        The histogram matrix is stored column-major, i.e. features-major like the
+        matcher scores it, so a memory-mapped copy can be used without transposing
+        it in memory. Files of a published version are never replaced: the three
+        files always come from the same save, and a process that still has the
+        previous version memory-mapped keeps reading it undisturbed (on Windows a
+        mapped file cannot be replaced at all). Only the small CURRENT file is
+        swapped, atomically. Older versions are removed once nothing maps them.
+        """
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            "format": "lbph-binary", "version": BINARY_FORMAT_VERSION,
+            "samples": int(self.labels.shape[0]),
+            "features": int(self.histograms.shape[1]) if self.histograms.ndim == 2 else 0,
+            "radius": self.radius, "neighbors": self.neighbors,
+            "grid_x": self.grid_x, "grid_y": self.grid_y, "threshold": self.threshold,
+        }
+        version = f"v{time.time_ns()}"
+        tmp_dir = os.path.join(path, f".{version}.tmp")
+        os.makedirs(tmp_dir)
+        for name, array in (("histograms.npy", np.asfortranarray(self.histograms)), ("labels.npy", self.labels)):
+            with open(os.path.join(tmp_dir, name), "wb") as f:
+                np.save(f, array)
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=4)
+        os.rename(tmp_dir, os.path.join(path, version))
+
+        tmp_path = os.path.join(path, f".{BINARY_CURRENT_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(path, BINARY_CURRENT_FILE))
+        remove_old_versions(path, version)
+
+    def save_yml(self, path):
+        """
+        Writes the model in the same YAML layout as LBPHFaceRecognizer.write(), so
+        cv2.face can read it back. The file is replaced atomically.
+        """
+        base, ext = os.path.splitext(path)
+        tmp_path = f"{base}.tmp{ext}"  # FileStorage picks the format from the extension
+        fs = cv2.FileStorage(tmp_path, cv2.FILE_STORAGE_WRITE)
+        try:
+            fs.startWriteStruct("opencv_lbphfaces", cv2.FileNode_MAP)
+            fs.write("threshold", self.threshold)
+            fs.write("radius", self.radius)
+            fs.write("neighbors", self.neighbors)
+            fs.write("grid_x", self.grid_x)
+            fs.write("grid_y", self.grid_y)
+            fs.startWriteStruct("histograms", cv2.FileNode_SEQ)
+            for row in self.histograms:
+                fs.write("", row.reshape(1, -1))
+            fs.endWriteStruct()
+            fs.write("labels", self.labels.reshape(-1, 1))
+            fs.endWriteStruct()
+        finally:
+            fs.release()
+        os.replace(tmp_path, path)
+
+def remove_old_versions(path, current):
+    """
+    Deletes the versions of a binary model other than current, including the
+    files of a model saved before versioning. A version that is still mapped
+    (Windows refuses to delete it) is left for a later save to remove.
+    Versions newer than current may belong to a save in another process that
+    has not switched CURRENT yet, so only older ones are removed; unfinished
+    .v<n>.tmp directories are removed once they are clearly abandoned.
+    """
+    for entry in os.scandir(path):
+        if entry.name in (current, BINARY_CURRENT_FILE):
+            continue
+        try:
+            if entry.is_dir() and re.fullmatch(r"v\d+", entry.name):
+                # A newer version is another process's save that has not switched CURRENT yet
+                if int(entry.name[1:]) < int(current[1:]):
+                    shutil.rmtree(entry.path)
+            elif (entry.is_dir() and re.fullmatch(r"\.v\d+\.tmp", entry.name)
+                  and time.time() - entry.stat().st_mtime > STALE_SAVE_SECONDS):
+                shutil.rmtree(entry.path)
+            elif entry.name in ("histograms.npy", "labels.npy", "meta.json"):
+                os.remove(entry.path)
+        except OSError as e:
+            logging.info(f"Keeping old model version {entry.path} for now: {e}")
+
+def chi_square_distances(query, histograms_t, sample_sums=None, columns=None, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """
+    Computes OpenCV's HISTCMP_CHISQR_ALT distance, 2 * sum((q - h)^2 / (q + h)),
+    between one query histogram and many training histograms at once.
+
+    Returns:
+        np.ndarray: float64 distances, one per (selected) sample.
+    """
+    return chi_square_distance_matrix(query[None, :], histograms_t, sample_sums, columns, chunk_samples)[0]
+
+def chi_square_distance_matrix(queries, histograms_t, sample_sums=None, columns=None, chunk_samples=DEFAULT_CHUNK_SAMPLES):
+    """
+    Computes the HISTCMP_CHISQR_ALT distance between every query histogram and
+    every training histogram in one pass over the training matrix.
+
+    Uses the identity (q - h)^2 / (q + h) = q + h - 4qh / (q + h), so only the
+    bins where a query is non-zero have to be visited. LBP histograms are sparse,
+    and with the training matrix stored features-major those bins are rows, so
+    each block gathers every query's own non-zero rows at once (padded to the
+    longest list with near-zero-weight bins) and scores them in one array operation.
+
+    Args:
+        queries (np.ndarray): The query histograms, shape (queries x features).
+        histograms_t (np.ndarray): Training histograms stored as (features x samples).
+        sample_sums (np.ndarray): Optional precomputed column sums of histograms_t.
+        columns (np.ndarray): Optional subset of sample indices to score, either shared
+            (selected,) or one row per query (queries x selected).
+        chunk_samples (int): Most samples scored per block; blocks are further limited to
+            BLOCK_ELEMENTS gathered values, so temporary memory does not grow with the batch.
+
+    Returns:
+        np.ndarray: float64 distances, shape (queries x selected samples).
+    """
+    if sample_sums is None:
+        sample_sums = histograms_t.sum(axis=0, dtype=np.float64)
+    if columns is not None:
+        sample_sums = sample_sums[columns]
+    queries = np.asarray(queries, dtype=np.float32)
+    bins = [np.flatnonzero(query) for query in queries]
+    width = max(1, max(len(b) for b in bins))
+    rows = np.zeros((len(bins), width), dtype=np.intp)
+    # Padding bins get a weight so small that they add nothing, but keep q + h > 0
+    q = np.full((len(bins), width, 1), _TINY, dtype=np.float32)
+    for i, b in enumerate(bins):
+        rows[i, :len(b)] = b
+        q[i, :len(b), 0] = queries[i, b]
+    chunk = max(1, min(chunk_samples, BLOCK_ELEMENTS // (len(bins) * width)))
+    overlap = np.empty((len(bins), sample_sums.shape[-1]), dtype=np.float64)
+    for start in range(0, overlap.shape[1], chunk):
+        if columns is None:
+            block = histograms_t[rows, start:start + chunk]  # (queries, bins, samples)
+        else:
+            selected = columns[..., start:start + chunk]
+            block = histograms_t[rows[:, :, None], selected[None, None, :] if selected.ndim == 1 else selected[:, None, :]]
+        block = block.astype(np.float32, copy=False)
+        numerator = block * q
+        block = block + q
+        numerator /= block
+        overlap[:, start:start + chunk] = numerator.sum(axis=1, dtype=np.float64)
+    sample_sums = sample_sums if sample_sums.ndim == 2 else sample_sums[None, :]
+    return 2.0 * (queries.sum(axis=1, dtype=np.float64)[:, None] + sample_sums - 4.0 * overlap)
+
+STORAGE_TYPES = ("float32", "float16", "uint16", "uint8", "sparse")
+SPARSE_BLOCK_ENTRIES = 1 << 22  # Stored entries gathered per block by the sparse scorer
+
+class SparseHistograms:
+    """
+    Features-major training histograms in CSR form: row f lists the samples
+    whose histogram has a non-zero value in bin f. LBP histograms are mostly
+    zeros, so only the occupied bins are kept, as uint16 counts.
+    """
+    def __init__(self, dense_t, dtype=np.uint16):
+        self.shape = dense_t.shape
+        rows, cols = np.nonzero(dense_t)
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=self.shape[0])))).astype(np.int64)
+        self.indices = cols.astype(np.int32)
+        self.data = dense_t[rows, cols].astype(dtype)
+
+    @property
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def column_sums(self):
+        return np.bincount(self.indices, weights=self.data, minlength=self.shape[1])
+
+def quantize_histograms(histograms_t, storage):
+    """
+    Converts a features-major float32 histogram matrix to a compact storage type.
+
+    LBPH bins are normalized counts in [0, 1]. The integer types store them as
+    value / scale, rounded, with scale chosen so the largest bin in the model
+    maps to the top of the integer range. float16 keeps the values as they are.
+
+    Returns:
+        tuple: (stored matrix or SparseHistograms, scale) with histograms_t ~= stored * scale.
+    """
+    if storage == "float32":
+        return histograms_t, 1.0
+    if storage == "float16":
+        return histograms_t.astype(np.float16), 1.0
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown histogram storage '{storage}'. Choose one of: {', '.join(STORAGE_TYPES)}.")
+    dtype = np.uint8 if storage == "uint8" else np.uint16
+    peak = float(histograms_t.max()) if histograms_t.size else 0.0
+    scale = (peak / np.iinfo(dtype).max) if peak > 0 else 1.0
+    quantized = np.rint(histograms_t / np.float32(scale)).astype(dtype)
+    if storage == "sparse":
+        return SparseHistograms(quantized, dtype), scale
+    return quantized, scale
+
+def chi_square_distances_sparse(query, histograms, sample_sums, columns=None, block_entries=SPARSE_BLOCK_ENTRIES):
+    """chi_square_distances() for SparseHistograms."""
+    return chi_square_distance_matrix_sparse(query[None, :], histograms, sample_sums, columns, block_entries)[0]
+
+def chi_square_distance_matrix_sparse(queries, histograms, sample_sums, columns=None, block_entries=SPARSE_BLOCK_ENTRIES):
+    """
+    chi_square_distance_matrix() for SparseHistograms. Bins missing from the CSR
+    are zero and contribute nothing to the overlap term, so only the stored
+    entries of the queries' non-zero bins are visited.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    count, samples = queries.shape[0], histograms.shape[1]
+    # Every query's non-zero bins, one after the other, tagged with the query they belong to
+    query_ids, nz = np.nonzero(queries)
+    starts, lengths = histograms.indptr[nz], np.diff(histograms.indptr)[nz]
+    overlap = np.zeros(count * samples, dtype=np.float64)
+    first = 0
+    while first < nz.shape[0]:
+        # Take as many query bins as fit in one block of gathered entries
+        last = first + max(1, int(np.searchsorted(np.cumsum(lengths[first:]), block_entries)))
+        block_lengths = lengths[first:last]
+        total = int(block_lengths.sum())
+        if total:
+            # Positions of every stored entry of the selected rows, without a Python loop
+            offsets = np.repeat(starts[first:last] - np.concatenate(([0], np.cumsum(block_lengths)[:-1])), block_lengths)
+            positions = offsets + np.arange(total)
+            h = histograms.data[positions].astype(np.float32)
+            q = np.repeat(queries[query_ids[first:last], nz[first:last]], block_lengths)
+            targets = np.repeat(query_ids[first:last] * samples, block_lengths) + histograms.indices[positions]
+            overlap += np.bincount(targets, weights=h * q / (h + q), minlength=count * samples)
+        first = last
+    overlap = overlap.reshape(count, samples)
+    if columns is not None:
+        overlap = overlap[:, columns] if columns.ndim == 1 else np.take_along_axis(overlap, columns, axis=1)
+        sample_sums = sample_sums[columns]
+    sample_sums = sample_sums if sample_sums.ndim == 2 else sample_sums[None, :]
+    return 2.0 * (queries.sum(axis=1, dtype=np.float64)[:, None] + sample_sums - 4.0 * overlap)
+
+class LBPHMatcher:
+    """
+    A drop-in replacement for LBPHFaceRecognizer.predict that scores query faces
+    against all training histograms with vectorized NumPy operations instead of
+    a per-sample loop.
+
+    With prefilter_labels > 0, each query is first compared against one mean
+    histogram per student and only the samples of the closest students are
+    scored exactly. This is much faster for large rosters but approximate.
+
+    storage selects how the training histograms are held in memory (see
+    quantize_histograms): "float32" as trained, or the smaller "float16",
+    "uint16", "uint8" or "sparse" representations. Distances are computed in
+    the stored units and scaled back, so confidences stay comparable.
+    """
+    def __init__(self, model, prefilter_labels=0, chunk_samples=DEFAULT_CHUNK_SAMPLES, storage="float32"):
+        self.model = model
+        self.prefilter_labels = int(prefilter_labels)
+        self.chunk_samples = chunk_samples
+        self.storage = storage
+        # Features-major view: the non-zero bins of a query select contiguous rows.
+        # Binary models are stored that way already, so this is not a copy for them.
+        histograms_t = np.ascontiguousarray(model.histograms.T)
+        self._histograms_t, self._scale = quantize_histograms(histograms_t, storage)
+        if isinstance(self._histograms_t, SparseHistograms):
+            self._sample_sums = self._histograms_t.column_sums()
+        else:
+            self._sample_sums = self._histograms_t.sum(axis=0, dtype=np.float64)
+
+        self._label_columns = {}
+        for column, label in enumerate(model.labels):
+            self._label_columns.setdefault(int(label), []).append(column)
+        self._label_columns = {label: np.asarray(cols) for label, cols in self._label_columns.items()}
+
+        self._centroid_labels = np.asarray(list(self._label_columns.keys()), dtype=np.int32)
+        self._centroids_t = None
+        if 0 < self.prefilter_labels < len(self._centroid_labels):
+            # Centroids are small, so they stay float32, in the same units as the stored histograms
+            self._centroids_t = np.ascontiguousarray(np.stack(
+                [histograms_t[:, cols].mean(axis=1) for cols in self._label_columns.values()], axis=1) / self._scale,
+                dtype=np.float32)
+        # Keep only the labels and parameters: the row-major matrix is not needed once transposed,
+        # and holding it would keep a second full copy of every histogram alive
+        self.model = LBPHModel(np.zeros((0, histograms_t.shape[0]), np.float32), model.labels, model.radius,
+                                   model.neighbors, model.grid_x, model.grid_y, model.threshold)
+
+    def memory_bytes(self):
+        """Returns the size of the training histograms as held by this matcher."""
+        return int(self._histograms_t.nbytes)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Loads a trained model file and wraps it in a matcher."""
+        return cls(LBPHModel.from_file(path), **kwargs)
+
+    def _candidate_columns(self, queries):
+        """
+        Returns, per query, the training samples of the students whose mean histogram is
+        closest to it, as a (queries x candidates) array padded with each row's first
+        candidate, plus a mask of the real (non-padding) entries.
+        """
+        coarse = chi_square_distance_matrix(queries, self._centroids_t, chunk_samples=self.chunk_samples)
+        nearest = np.argpartition(coarse, self.prefilter_labels - 1, axis=1)[:, :self.prefilter_labels]
+        per_query = [np.concatenate([self._label_columns[int(label)] for label in self._centroid_labels[row]])
+                     for row in nearest]
+        width = max(len(candidates) for candidates in per_query)
+        columns = np.empty((len(per_query), width), dtype=np.intp)
+        for i, candidates in enumerate(per_query):
+            columns[i, :len(candidates)] = candidates
+            columns[i, len(candidates):] = candidates[0]
+        mask = np.arange(width)[None, :] < np.asarray([len(c) for c in per_query])[:, None]
+        return columns, mask
+
+    def predict_histograms(self, queries):
+        """Returns one (label, distance) pair per precomputed query histogram, scored in one batch."""
+        no_match = (-1, float(np.finfo(np.float64).max))
+        if len(queries) == 0:
+            return []
+        if self._histograms_t.shape[1] == 0:
+            return [no_match] * len(queries)
+        queries = np.stack(queries).astype(np.float32, copy=False)
+        # chi-square scales linearly: d(q, s*H) = s * d(q/s, H), so score in stored units
+        queries = queries / np.float32(self._scale) if self._scale != 1.0 else queries
+        columns, mask = self._candidate_columns(queries) if self._centroids_t is not None else (None, None)
+        if isinstance(self._histograms_t, SparseHistograms):
+            distances = chi_square_distance_matrix_sparse(queries, self._histograms_t, self._sample_sums, columns)
+        else:
+            distances = chi_square_distance_matrix(queries, self._histograms_t, self._sample_sums, columns,
+                                                   self.chunk_samples)
+        distances *= self._scale
+        if mask is not None:
+            distances[~mask] = np.inf
+        rows = np.arange(len(queries))
+        best = np.argmin(distances, axis=1)
+        best_distances = distances[rows, best]
+        labels = self.model.labels[best] if columns is None else self.model.labels[columns[rows, best]]
+        return [(int(label), float(distance)) if distance < self.model.threshold else no_match
+                for label, distance in zip(labels, best_distances)]
+
+    def predict_histogram(self, query):
+        """Returns (label, distance) for a precomputed query histogram."""
+        return self.predict_histograms([query])[0]
+
+    def predict(self, gray):
+        """Same contract as LBPHFaceRecognizer.predict: returns (label, confidence), lower is better."""
+        return self.predict_histogram(self.model.histogram(gray))
+
+    def predict_batch(self, grays):
+        """Predicts a list of grayscale faces with one batched distance computation, one (label, confidence) pair per face."""
+        return self.predict_histograms([self.model.histogram(gray) for gray in grays])
+
+def load_gray(path):
+    """Loads an image file as a uint8 grayscale array."""
+    return np.array(Image.open(path).convert('L'), 'uint8')
+
+def compare_with_opencv(model_path, image_paths, prefilter_labels=0):
+    """
+    Runs cv2.face and LBPHMatcher on the same model and images and reports
+    per-face latency and how often both return the same label.
+    """
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    start = time.perf_counter()
+    recognizer.read(model_path)
+    load_seconds = time.perf_counter() - start
+    matcher = LBPHMatcher(LBPHModel.from_recognizer(recognizer), prefilter_labels=prefilter_labels)
+
+    faces = [load_gray(p) for p in image_paths]
+    cv_results, np_results = [], []
+
+    start = time.perf_counter()
+    for face in faces:
+        cv_results.append(recognizer.predict(face))
+    cv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    np_results = matcher.predict_batch(faces)
+    np_seconds = time.perf_counter() - start
+
+    agree = sum(1 for a, b in zip(cv_results, np_results) if a[0] == b[0])
+    conf_diffs = [abs(a[1] - b[1]) for a, b in zip(cv_results, np_results) if a[0] == b[0]]
+    count = max(1, len(faces))
+    return {
+        "faces": len(faces),
+        "training_samples": int(matcher.model.labels.shape[0]),
+        "model_load_ms": load_seconds * 1000,
+        "opencv_ms_per_face": cv_seconds * 1000 / count,
+        "numpy_ms_per_face": np_seconds * 1000 / count,
+        "label_agreement": agree / count,
+        "max_confidence_diff": max(conf_diffs) if conf_diffs else 0.0,
+    }
+
+def compare_storage(model_path, image_paths, storages=STORAGE_TYPES, prefilter_labels=0):
+    """
+    Scores the same queries with each histogram storage type and compares them
+    with the float32 matcher.
+
+    Returns:
+        list: One dict per storage type with memory_mb, ms_per_face, label_agreement
+        and max_confidence_diff (absolute, in LBPH confidence units) against float32.
+    """
+    model = LBPHModel.from_file(model_path, mmap=False)
+    faces = [load_gray(p) for p in image_paths]
+    # Histograms are computed once; every matcher scores the same queries
+    queries = [model.histogram(face) for face in faces]
+    reference = None
+    results = []
+    for storage in ("float32",) + tuple(s for s in storages if s != "float32"):
+        matcher = LBPHMatcher(model, prefilter_labels=prefilter_labels, storage=storage)
+        start = time.perf_counter()
+        predictions = [matcher.predict_histogram(q) for q in queries]
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = predictions
+        agree = [(a, b) for a, b in zip(reference, predictions) if a[0] == b[0]]
+        results.append({
+            "storage": storage,
+            "memory_mb": matcher.memory_bytes() / 1e6,
+            "ms_per_face": seconds * 1000 / max(1, len(queries)),
+            "label_agreement": len(agree) / max(1, len(queries)),
+            "max_confidence_diff": max((abs(a[1] - b[1]) for a, b in agree), default=0.0),
+        })
+    return results
+
+def find_images(path, limit):
+    """Collects up to `limit` training images below a directory."""
+    image_paths = [os.path.join(dirpath, f)
+                   for dirpath, dirnames, filenames in os.walk(path)
+                   for f in sorted(filenames) if f.endswith(('.jpg', '.png'))]
+    return image_paths[:limit] if limit else image_paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the NumPy LBPH matcher against cv2.face on the same model.")
+    parser.add_argument("--model", default=os.path.join("TrainingImageLabel", "Trainner.yml"), help="Trained LBPH model file.")
+    parser.add_argument("--images", default="TrainingImage", help="Directory of face images to query with.")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum number of query images (0 for all).")
+    parser.add_argument("--prefilter", type=int, default=0, help="Score only the N closest students exactly (0 disables).")
+    parser.add_argument("--storage", nargs="*", choices=STORAGE_TYPES,
+                        help="Instead of comparing with cv2.face, report memory and agreement of these histogram storage types.")
+    args = parser.parse_args()
+
+    image_paths = find_images(args.images, args.limit)
+    if not image_paths:
+        parser.error(f"No images found under {args.images}")
+    if args.storage is not None:
+        results = compare_storage(args.model, image_paths, args.storage or STORAGE_TYPES, args.prefilter)
+        baseline = results[0]["memory_mb"]
+        print(f"Queried {len(image_paths)} faces; agreement and confidence differences are relative to float32")
+        print(f"{'storage':<9}{'memory MB':>11}{'saved':>8}{'ms/face':>9}{'agreement':>11}{'max conf diff':>15}")
+        for r in results:
+            saved = (1 - r["memory_mb"] / baseline) * 100 if baseline else 0.0
+            print(f"{r['storage']:<9}{r['memory_mb']:>11.1f}{saved:>7.0f}%{r['ms_per_face']:>9.2f}"
+                  f"{r['label_agreement'] * 100:>10.1f}%{r['max_confidence_diff']:>15.4f}")
+        return
+    report = compare_with_opencv(args.model, image_paths, args.prefilter)
+    print(f"Queried {report['faces']} faces against {report['training_samples']} training samples")
+    print(f"  model load (cv2.face.read): {report['model_load_ms']:.1f} ms")
+    print(f"  cv2.face predict:          {report['opencv_ms_per_face']:.2f} ms/face")
+    print(f"  LBPHMatcher predict:       {report['numpy_ms_per_face']:.2f} ms/face")
+    print(f"  label agreement:           {report['label_agreement'] * 100:.1f}%")
+    print(f"  max confidence difference: {report['max_confidence_diff']:.4f}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
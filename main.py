@@ -15,6 +15,7 @@ import takeImage
 import trainImage
 import automaticAttedance
 import mongodb_handler
+import model_registry
 import settings
 from utils import (setup_logging, apply_theme, BG_COLOR, FG_COLOR, BTN_BG,
                    BTN_FG, ACCENT_COLOR, TITLE_FONT, BTN_FONT, BASE_FONT, ERROR_COLOR)
@@ -61,6 +62,20 @@ class AiAttendanceApp:
 
         self.create_widgets()
 
+        # Load the face models in the background so the first capture or session starts immediately
+        self.warm_up_models()
+
+        # Finalize attendance sessions that were interrupted by a crash
+        threading.Thread(target=automaticAttedance.recover_interrupted_sessions, daemon=True).start()
+
+        # Upload finished sessions in the background whenever MongoDB is reachable
+        mongodb_handler.start_sync_worker()
+
+    def warm_up_models(self):
+        """Loads and warms up the detector and recognizer on a background thread."""
+        app_settings = settings.load_settings()
+        model_registry.warm_up_async(app_settings, model_registry.model_path_for(app_settings, trainimagelabel_path))
+
     def speak(self, text):
         """
         Uses the text-to-speech engine to speak the given text in a separate thread.
@@ -181,6 +196,7 @@ class RegisterStudentWindow:
         # A thread-safe queue to receive messages from worker threads
         self.queue = queue.Queue()
         self.is_capture_successful = False
+        self.captured_enrollment = None # Student whose images were just captured, for incremental training
 
         apply_theme(self.window)
         self.window.geometry("780x520")
@@ -225,7 +241,10 @@ class RegisterStudentWindow:
         self.btn_capture.pack(side=tk.LEFT, expand=True, padx=10)
 
         self.btn_train = tk.Button(btn_frame, text="2. Train Model", command=self.train_threaded, font=BTN_FONT, bg=BTN_BG, fg=BTN_FG, relief=tk.FLAT, padx=15, pady=10, state=tk.DISABLED)
-        self.btn_train.pack(side=tk.RIGHT, expand=True, padx=10)
+        self.btn_train.pack(side=tk.LEFT, expand=True, padx=10)
+
+        self.btn_rebuild = tk.Button(btn_frame, text="Rebuild Full Model", command=self.rebuild_threaded, font=BTN_FONT, bg=BTN_BG, fg=BTN_FG, relief=tk.FLAT, padx=15, pady=10)
+        self.btn_rebuild.pack(side=tk.RIGHT, expand=True, padx=10)
         
         self.status_label = tk.Label(self.window, text="", font=BASE_FONT, bg=BG_COLOR, fg=FG_COLOR, wraplength=700)
         self.status_label.pack(pady=10)
@@ -256,6 +275,7 @@ class RegisterStudentWindow:
                 self.toggle_buttons(tk.NORMAL) # Re-enable buttons
                 if message.get("success"):
                     self.set_status("Model training successful! You can now take attendance.")
+                    self.app.warm_up_models() # Preload the retrained model before the next session
                 else:
                     self.set_status("Model training failed. Please check the logs for details.", is_error=True)
 
@@ -279,6 +299,7 @@ class RegisterStudentWindow:
         # Disable buttons and reset state
         self.toggle_buttons(tk.DISABLED)
         self.is_capture_successful = False
+        self.captured_enrollment = enrollment
         self.progress_capture['value'] = 0
         self.progress_train['value'] = 0
 
@@ -291,23 +312,42 @@ class RegisterStudentWindow:
 
     def train_threaded(self):
         """
-        Starts the model training process in a separate thread.
+        Adds the just-captured student to the model in a separate thread. Only
+        that student's images are read, so this stays fast as the roster grows.
         """
         self.toggle_buttons(tk.DISABLED)
         self.progress_train['value'] = 0
         
         # Start the training process in a daemon thread
+        threading.Thread(
+            target=trainImage.UpdateStudent, 
+            args=(trainimage_path, self.model_path(), self.captured_enrollment, self.queue), 
+            daemon=True
+        ).start()
+
+    def rebuild_threaded(self):
+        """
+        Retrains the model from every student's images in a separate thread.
+        """
+        self.toggle_buttons(tk.DISABLED)
+        self.progress_train['value'] = 0
+        
         threading.Thread(
             target=trainImage.TrainImage, 
-            args=(trainimage_path, trainimagelabel_path, self.queue), 
+            args=(trainimage_path, self.model_path(), self.queue), 
             daemon=True
         ).start()
 
+    def model_path(self):
+        """Returns the model file (or binary model directory) for the configured model format."""
+        return model_registry.model_path_for(settings.load_settings(), trainimagelabel_path)
+
     def toggle_buttons(self, state):
         """
         Enables or disables the main action buttons in the window.
         """
         self.btn_capture.config(state=state)
+        self.btn_rebuild.config(state=state)
         # The train button should only be enabled if capture was successful
         if state == tk.NORMAL and self.is_capture_successful:
             self.btn_train.config(state=tk.NORMAL)
@@ -326,4 +366,6 @@ class RegisterStudentWindow:
 if __name__ == "__main__":
     root = tk.Tk()
     app = AiAttendanceApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    mongodb_handler.stop_sync_worker()
+    mongodb_handler.get_mongo_connection().close()
\ No newline at end of file
@@ -0,0 +1,68 @@
+# model_convert.py
+
+"""
+Converts trained LBPH models between the cv2.face YAML format and the binary,
+memory-mappable directory format. The output format follows the destination:
+a path ending in .lbph becomes a binary model, anything else a YAML file.
+
+Usage:
+    python model_convert.py TrainingImageLabel/Trainner.yml TrainingImageLabel/Trainner.lbph
+    python model_convert.py TrainingImageLabel/Trainner.lbph TrainingImageLabel/Trainner.yml
+"""
+
+import os
+import time
+import argparse
+import logging
+from lbph_matcher import LBPHModel, binary_model_files, binary_model_path, is_binary_model
+
+def _size_on_disk(path):
+    """Bytes of a YAML model, or of the current version's files of a binary model."""
+    if os.path.isdir(path):
+        version_dir = binary_model_files(path)
+        return sum(entry.stat().st_size for entry in os.scandir(version_dir) if entry.is_file())
+    return os.path.getsize(path)
+
+def convert_model(source, destination):
+    """
+    Converts one model file to the format implied by the destination path.
+
+    Returns:
+        dict: Sample count, file sizes and load times of both formats.
+    """
+    start = time.perf_counter()
+    model = LBPHModel.from_file(source, mmap=False)
+    source_load = time.perf_counter() - start
+    model.save(destination)
+
+    start = time.perf_counter()
+    LBPHModel.from_file(destination)
+    destination_load = time.perf_counter() - start
+    return {
+        "samples": int(model.labels.shape[0]),
+        "source_bytes": _size_on_disk(source),
+        "destination_bytes": _size_on_disk(destination),
+        "source_load_ms": source_load * 1000,
+        "destination_load_ms": destination_load * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an LBPH model between .yml and the binary .lbph format.")
+    parser.add_argument("source", help="Existing model (.yml file or .lbph directory).")
+    parser.add_argument("destination", nargs="?", help="Output path (default: the other format next to the source).")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.source) or (not is_binary_model(args.source) and os.path.getsize(args.source) == 0):
+        parser.error(f"{args.source} does not contain a trained model.")
+    destination = args.destination
+    if destination is None:
+        destination = (os.path.splitext(args.source)[0] + ".yml" if is_binary_model(args.source)
+                       else binary_model_path(args.source))
+    report = convert_model(args.source, destination)
+    print(f"Converted {report['samples']} samples: {args.source} -> {destination}")
+    print(f"  size: {report['source_bytes'] / 1e6:.1f} MB -> {report['destination_bytes'] / 1e6:.1f} MB")
+    print(f"  load: {report['source_load_ms']:.0f} ms -> {report['destination_load_ms']:.0f} ms")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
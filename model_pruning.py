@@ -0,0 +1,154 @@
+# model_pruning.py
+
+"""
+Keeps only k representative training samples per student.
+
+Registration captures dozens of nearly identical frames, and every one of them
+costs memory and a distance computation on each prediction. This clusters each
+student's LBPH histograms into k groups and keeps the medoid of each group, so
+the variety of poses and lighting is preserved while the duplicates are dropped.
+
+Usage (prunes an existing model, no recapture needed):
+    python model_pruning.py --model TrainingImageLabel/Trainner.yml --k 10
+"""
+
+import os
+import time
+import argparse
+import logging
+import numpy as np
+from lbph_matcher import LBPHModel, LBPHMatcher, find_images, load_gray, model_exists
+from face_preprocessing import create_preprocessor, load_prepared
+
+KMEANS_ITERATIONS = 15
+
+def representative_indices(histograms, k, seed=0):
+    """
+    Picks k representative rows of a (samples x features) histogram matrix.
+
+    Runs k-means on square-rooted histograms (Euclidean distance there is the
+    Hellinger distance, a cheap stand-in for chi-square) and returns, for each
+    cluster, the index of the real sample nearest its centre.
+
+    Returns:
+        np.ndarray: Sorted indices of the kept samples (all of them if there are k or fewer).
+    """
+    n = histograms.shape[0]
+    if k <= 0 or n <= k:
+        return np.arange(n)
+    points = np.sqrt(np.asarray(histograms, dtype=np.float32))
+    norms = (points * points).sum(axis=1)
+
+    def squared_distances(centres):
+        return np.maximum(norms[:, None] - 2.0 * points @ centres.T + (centres * centres).sum(axis=1)[None, :], 0.0)
+
+    # k-means++ seeding, deterministic for a given seed
+    rng = np.random.default_rng(seed)
+    chosen = [int(rng.integers(n))]
+    closest = squared_distances(points[chosen]).ravel()
+    for _ in range(1, k):
+        total = closest.sum()
+        pick = int(rng.choice(n, p=closest / total)) if total > 0 else int(rng.integers(n))
+        chosen.append(pick)
+        closest = np.minimum(closest, squared_distances(points[[pick]]).ravel())
+    centres = points[chosen].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = squared_distances(centres).argmin(axis=1)
+        moved = False
+        for c in range(k):
+            members = points[assignment == c]
+            if len(members):
+                centre = members.mean(axis=0)
+                moved = moved or not np.allclose(centre, centres[c])
+                centres[c] = centre
+        if not moved:
+            break
+
+    # Medoids: the real sample closest to each centre, so kept histograms are genuine faces
+    distances = squared_distances(centres)
+    assignment = distances.argmin(axis=1)
+    kept = set()
+    for c in range(k):
+        members = np.flatnonzero(assignment == c)
+        if len(members):
+            kept.add(int(members[np.argmin(distances[members, c])]))
+    return np.array(sorted(kept))
+
+def prune_model(model, k):
+    """Returns a copy of the model with at most k representative samples per label."""
+    if k <= 0:
+        return model
+    keep = []
+    for label in np.unique(model.labels):
+        rows = np.flatnonzero(model.labels == label)
+        keep.extend(rows[representative_indices(model.histograms[rows], k, seed=int(label))])
+    keep = np.array(sorted(keep), dtype=np.int64)
+    return LBPHModel(model.histograms[keep], model.labels[keep], model.radius, model.neighbors,
+                     model.grid_x, model.grid_y, model.threshold)
+
+def select_representative_faces(faces, ids, k, model_parameters=None):
+    """
+    Picks at most k representative faces per student before they are added to a
+    model, using the same clustering as prune_model.
+
+    Args:
+        faces (list): Grayscale face images.
+        ids (list): Student ID per face.
+        k (int): Samples to keep per student (0 keeps everything).
+        model_parameters (LBPHModel): Supplies the LBPH radius/neighbors/grid; defaults are used if None.
+    """
+    if k <= 0:
+        return faces, ids
+    params = model_parameters or LBPHModel(np.zeros((0, 0), np.float32), [])
+    histograms = np.stack([params.histogram(face) for face in faces])
+    ids_array = np.asarray(ids)
+    keep = []
+    for label in np.unique(ids_array):
+        rows = np.flatnonzero(ids_array == label)
+        keep.extend(rows[representative_indices(histograms[rows], k, seed=int(label))])
+    keep.sort()
+    return [faces[i] for i in keep], [ids[i] for i in keep]
+
+def _measure(model, queries):
+    """Returns (histogram MB, predict ms per face, predictions) for a model."""
+    matcher = LBPHMatcher(model)
+    start = time.perf_counter()
+    predictions = [matcher.predict_histogram(q) for q in queries]
+    return matcher.memory_bytes() / 1e6, (time.perf_counter() - start) * 1000 / max(1, len(queries)), predictions
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep only k representative samples per student in a trained LBPH model.")
+    parser.add_argument("--model", default=os.path.join("TrainingImageLabel", "Trainner.yml"), help="Trained model (.yml or .lbph).")
+    parser.add_argument("--k", type=int, required=True, help="Samples to keep per student.")
+    parser.add_argument("--output", help="Where to write the pruned model (default: overwrite --model).")
+    parser.add_argument("--images", default="TrainingImage", help="Face images used to time predictions before and after.")
+    parser.add_argument("--limit", type=int, default=100, help="Maximum number of timing queries.")
+    args = parser.parse_args()
+
+    if not model_exists(args.model):
+        parser.error(f"{args.model} does not contain a trained model.")
+    model = LBPHModel.from_file(args.model, mmap=False)
+    pruned = prune_model(model, args.k)
+
+    # Query faces go through the same preparation as training and live crops
+    from settings import load_settings
+    preprocessor = create_preprocessor(load_settings())
+    queries = []
+    for path in find_images(args.images, args.limit):
+        signature = load_prepared(os.path.dirname(path)).get(os.path.basename(path))
+        queries.append(model.histogram(preprocessor.prepare_saved(load_gray(path), signature)))
+    before_mb, before_ms, before = _measure(model, queries)
+    after_mb, after_ms, after = _measure(pruned, queries)
+    pruned.save(args.output or args.model)
+
+    print(f"Samples:   {model.labels.shape[0]} -> {pruned.labels.shape[0]} ({len(np.unique(model.labels))} students)")
+    print(f"Memory:    {before_mb:.1f} MB -> {after_mb:.1f} MB")
+    if queries:
+        agreement = sum(1 for a, b in zip(before, after) if a[0] == b[0]) / len(queries)
+        print(f"Predict:   {before_ms:.2f} ms/face -> {after_ms:.2f} ms/face over {len(queries)} faces")
+        print(f"Agreement: {agreement * 100:.1f}% of predictions unchanged")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,165 @@
+# model_registry.py
+
+import os
+import time
+import logging
+import threading
+import numpy as np
+import cv2
+from lbph_matcher import (LBPHMatcher, LBPHModel, binary_model_path, is_binary_model,
+                          model_exists, model_signature_files)
+from face_detector import create_detector, detector_options
+from subject_roster import get_subject_rosters, DEFAULT_ROSTER_PATH
+
+DEFAULT_MODEL_PATH = os.path.join("TrainingImageLabel", "Trainner.yml")
+
+def model_path_for(app_settings, yml_path=DEFAULT_MODEL_PATH):
+    """Returns the trained model path for the "model_format" setting ("yml" or "binary")."""
+    if app_settings.get("model_format", "yml") == "binary":
+        return binary_model_path(yml_path)
+    return yml_path
+
+def uses_matcher(model_path, app_settings):
+    """
+    True if predictions go through LBPHMatcher: the numpy backend, any binary
+    model (cv2.face cannot read those) or a compact histogram storage type.
+    """
+    return (is_binary_model(model_path) or app_settings.get("recognizer_backend", "opencv") == "numpy"
+            or app_settings.get("recognizer_storage", "float32") != "float32")
+
+_cache = {}  # key -> (file signature, loaded object)
+_cache_lock = threading.RLock()
+
+def _signature(*paths):
+    """Returns the (mtime, size) of each file, used to notice when a model changes on disk."""
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+def _get_cached(key, paths, loader):
+    """Returns the cached object for key, reloading it if any of its files changed."""
+    with _cache_lock:
+        signature = _signature(*paths)
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        start = time.perf_counter()
+        obj = loader()
+        logging.info(f"Loaded {key[0]} from {', '.join(paths)} in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        _cache[key] = (signature, obj)
+        return obj
+
+def get_detector(app_settings):
+    """Returns the shared face detector for the backend selected in settings, loading it on first use."""
+    options = detector_options(app_settings)
+    key = ("detector",) + tuple(sorted(options.items()))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            try:
+                if _signature(*cached[1].model_files()) == cached[0]:
+                    return cached[1]
+            except OSError:
+                pass
+        start = time.perf_counter()
+        detector = create_detector(**options)
+        logging.info(f"Loaded {options['backend']} face detector in {(time.perf_counter() - start) * 1000:.0f} ms.")
+        _cache[key] = (_signature(*detector.model_files()), detector)
+        return detector
+
+def get_recognizer(model_path=DEFAULT_MODEL_PATH):
+    """Returns the shared trained LBPH recognizer, reloading it when the model file changes."""
+    if is_binary_model(model_path):
+        raise ValueError(f"cv2.face cannot read the binary model {model_path}; use the numpy recognizer backend.")
+    def load():
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(model_path)
+        return recognizer
+    return _get_cached(("recognizer", model_path), [model_path], load)
+
+def get_matcher(model_path=DEFAULT_MODEL_PATH, prefilter_labels=0, storage="float32"):
+    """
+    Returns the shared vectorized LBPHMatcher for a model. Binary models are
+    memory-mapped; YAML models are read into a temporary recognizer, so the
+    matcher's own features-major matrix is the only copy that stays in memory.
+    """
+    def load():
+        model = LBPHModel.from_file(model_path)
+        matcher = LBPHMatcher(model, prefilter_labels=prefilter_labels, storage=storage)
+        logging.info(f"Recognizer histograms held as {storage}: {matcher.memory_bytes() / 1e6:.1f} MB.")
+        return matcher
+    return _get_cached(("matcher", model_path, prefilter_labels, storage), model_signature_files(model_path), load)
+
+def get_matcher_for(model_path, app_settings):
+    """Returns the shared LBPHMatcher configured by the recognizer settings."""
+    return get_matcher(model_path, app_settings.get("recognizer_prefilter", 0),
+                       app_settings.get("recognizer_storage", "float32"))
+
+def get_subject_matcher(model_path, app_settings, subject, roster_path=DEFAULT_ROSTER_PATH):
+    """
+    Returns an LBPHMatcher over only the students on a subject's roster, or None
+    if the subject has no roster. The shard is rebuilt automatically whenever the
+    model or the roster file changes.
+    """
+    labels = get_subject_rosters(roster_path).labels_for(subject)
+    if labels is None:
+        return None
+    storage = app_settings.get("recognizer_storage", "float32")
+    prefilter_labels = app_settings.get("recognizer_prefilter", 0)
+
+    def load():
+        model = LBPHModel.from_file(model_path)
+        shard = model.only_labels(labels)
+        trained = len(set(shard.labels.tolist()))
+        logging.info(f"Built {subject} model shard: {trained} of {len(labels)} roster students trained, "
+                     f"{shard.labels.shape[0]} of {model.labels.shape[0]} samples.")
+        if trained < len(labels):
+            logging.warning(f"{len(labels) - trained} student(s) on the {subject} roster have no training images.")
+        return LBPHMatcher(shard, prefilter_labels=prefilter_labels, storage=storage)
+    return _get_cached(("subject matcher", model_path, subject, prefilter_labels, storage),
+                       model_signature_files(model_path) + [roster_path], load)
+
+def invalidate():
+    """Drops every cached model so the next request reloads from disk."""
+    with _cache_lock:
+        _cache.clear()
+
+def evict(model_path):
+    """
+    Drops the cached recognizer and matchers of one model, e.g. before it is saved
+    again, so this process no longer holds its memory-mapped files.
+    """
+    with _cache_lock:
+        for key in [key for key in _cache if len(key) > 1 and key[1] == model_path]:
+            del _cache[key]
+
+def warm_up(app_settings, model_path=DEFAULT_MODEL_PATH):
+    """
+    Loads the detector and recognizer and runs one dummy inference through each,
+    so the first real session does not pay for model loading and lazy initialisation.
+    """
+    try:
+        get_detector(app_settings).detect(np.zeros((480, 640, 3), dtype=np.uint8))
+    except Exception as e:
+        logging.warning(f"Face detector warm-up skipped: {e}")
+
+    try:
+        if not model_exists(model_path):
+            logging.info("Recognizer warm-up skipped: no trained model yet.")
+            return
+        dummy_face = np.full((100, 100), 128, dtype=np.uint8)
+        if uses_matcher(model_path, app_settings):
+            get_matcher_for(model_path, app_settings).predict(dummy_face)
+        else:
+            get_recognizer(model_path).predict(dummy_face)
+    except Exception as e:
+        logging.warning(f"Recognizer warm-up skipped: {e}")
+
+def warm_up_async(app_settings, model_path=DEFAULT_MODEL_PATH):
+    """Runs warm_up() on a background daemon thread and returns the thread."""
+    thread = threading.Thread(target=warm_up, args=(app_settings, model_path),
+                              name="ModelWarmUp", daemon=True)
+    thread.start()
+    return thread
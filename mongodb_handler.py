@@ -1,11 +1,17 @@
 # mongodb_handler.py
 
 import os
+import time
 import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, ConfigurationError
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, ConfigurationError, DuplicateKeyError, PyMongoError
 from settings import load_settings
+from sync_outbox import SyncOutbox, SyncWorker, OUTBOX_DB
+from attendance_schema import upsert_unified, upsert_sessions, unified_document, failed_session_ids
 from utils import setup_logging
 
 # Call setup_logging at the start
@@ -13,24 +19,134 @@ setup_logging()
 
 DB_NAME = "AiAttendance"
 OFFLINE_LOG_FILE = "offline_sync_log.txt"
+ATTENDANCE_KEY_FIELDS = ("enrollment", "subject", "date", "timestamp")  # Identifies one attendance record
+SYNC_BATCH_SIZE = 1000  # Documents per bulk_write when syncing the offline backlog
+SYNC_WORKERS = 4  # Threads reading pending sheets and writing batches
+SYNC_SESSIONS_PER_PASS = 200  # Queued sessions read from the outbox per upload round
+SYNC_POLL_SECONDS = 30.0  # Longest pause of the background sync worker between checks
 
-def get_mongo_client():
-    """Establishes connection to MongoDB using URI from settings."""
-    settings = load_settings()
-    mongo_uri = settings.get("mongo_uri")
+URI_PLACEHOLDER = "YOUR_MONGODB_CONNECTION_STRING_HERE"
+HEALTH_CHECK_INTERVAL = 30.0  # Seconds a successful check or operation vouches for the connection
+INITIAL_BACKOFF = 2.0  # Seconds before the first reconnect attempt after a failure
+MAX_BACKOFF = 120.0  # Upper bound for the reconnect backoff
 
-    if not mongo_uri or mongo_uri == "YOUR_MONGODB_CONNECTION_STRING_HERE":
-        logging.warning("MongoDB URI not configured in settings.")
-        return None, "MongoDB URI not configured. Please set it in Settings."
+class MongoConnection:
+    """
+    One long-lived, pooled MongoClient shared by every upload and sync in the process.
 
-    try:
-        client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        # The ismaster command is cheap and does not require auth.
-        client.admin.command('ismaster')
-        return client, None
-    except (ConnectionFailure, ConfigurationError) as e:
-        logging.error(f"MongoDB connection failed: {e}")
-        return None, f"MongoDB connection failed: {e}"
+    The client is created lazily on first use (connect=False, so creating it does
+    no network I/O) and keeps its connection pool, so repeated uploads do not pay
+    a new TCP/TLS handshake each. A ping is only sent if nothing has succeeded for
+    HEALTH_CHECK_INTERVAL seconds. After a failure, further attempts are refused
+    immediately until an exponentially growing backoff has passed, instead of
+    every caller waiting for its own server selection timeout. The client is
+    recreated when the mongo_uri setting changes.
+    """
+    def __init__(self, settings_loader=load_settings, client_factory=MongoClient, server_timeout_ms=5000):
+        """
+        Args:
+            settings_loader (callable): Returns the app settings; read on every get() to notice URI changes.
+            client_factory (callable): Builds the client from a URI and keyword options (MongoClient,
+                or a stand-in for tests).
+            server_timeout_ms (int): Server selection timeout for pings and operations.
+        """
+        self.settings_loader = settings_loader
+        self.client_factory = client_factory
+        self.server_timeout_ms = server_timeout_ms
+        self._lock = threading.RLock()
+        self._client = None
+        self._uri = None
+        self._last_ok = 0.0
+        self._retry_at = 0.0
+        self._backoff = INITIAL_BACKOFF
+        self.consecutive_failures = 0
+        self.last_error = None
+        self.clients_created = 0
+
+    def get(self):
+        """
+        Returns the shared client, connecting or re-checking it if needed.
+
+        Returns:
+            tuple: (client, None) or (None, error message). The client must not be closed by the caller.
+        """
+        mongo_uri = self.settings_loader().get("mongo_uri")
+        if not mongo_uri or mongo_uri == URI_PLACEHOLDER:
+            logging.warning("MongoDB URI not configured in settings.")
+            return None, "MongoDB URI not configured. Please set it in Settings."
+
+        with self._lock:
+            if mongo_uri != self._uri:
+                self._replace_client(mongo_uri)
+            now = time.monotonic()
+            if now - self._last_ok < HEALTH_CHECK_INTERVAL:
+                return self._client, None
+            if now < self._retry_at:
+                return None, f"MongoDB connection failed ({self.last_error}); next attempt in {self._retry_at - now:.0f} s."
+            try:
+                if self._client is None:
+                    self._client = self.client_factory(mongo_uri, serverSelectionTimeoutMS=self.server_timeout_ms,
+                                                       connect=False)
+                    self.clients_created += 1
+                # The ping command is cheap and does not require auth.
+                self._client.admin.command('ping')
+            except (PyMongoError, ConfigurationError) as e:
+                logging.error(f"MongoDB connection failed: {e}")
+                self.mark_failed(e)
+                return None, f"MongoDB connection failed: {e}"
+            self.mark_ok()
+            return self._client, None
+
+    def _replace_client(self, mongo_uri):
+        """Drops the client for an old URI; the next get() builds one for the new URI."""
+        if self._client is not None:
+            logging.info("MongoDB URI changed; reconnecting.")
+            self._client.close()
+        self._client = None
+        self._uri = mongo_uri
+        self._last_ok = 0.0
+        self._retry_at = 0.0
+        self._backoff = INITIAL_BACKOFF
+        self.consecutive_failures = 0
+
+    def mark_ok(self):
+        """Records a successful operation, which also postpones the next ping."""
+        with self._lock:
+            self._last_ok = time.monotonic()
+            self._backoff = INITIAL_BACKOFF
+            self.consecutive_failures = 0
+            self.last_error = None
+
+    def mark_failed(self, error):
+        """Records a failed connection or operation and schedules the next attempt."""
+        with self._lock:
+            self._last_ok = 0.0
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(MAX_BACKOFF, self._backoff * 2)
+
+    def seconds_until_retry(self):
+        """Returns how long get() will keep refusing after a failure, or 0."""
+        with self._lock:
+            return max(0.0, self._retry_at - time.monotonic()) if self._last_ok == 0.0 else 0.0
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+            self._uri = None
+
+_connection = MongoConnection()
+
+def get_mongo_connection():
+    """Returns the process-wide MongoConnection."""
+    return _connection
+
+def get_mongo_client():
+    """Returns the shared MongoDB client for the URI in settings, as (client, error message)."""
+    return _connection.get()
 
 def log_failed_upload(csv_file_path):
     """Logs the path of a CSV file that failed to upload."""
@@ -41,95 +157,353 @@ def log_failed_upload(csv_file_path):
     except Exception as e:
         logging.error(f"Could not write to offline log file: {e}", exc_info=True)
 
-def upload_df_to_mongodb(df, subject, date, timestamp, csv_file_path):
-    """Uploads attendance DataFrame to MongoDB."""
-    client, error_message = get_mongo_client()
-    if not client:
-        log_failed_upload(csv_file_path)
-        return False
+def attendance_documents(df, subject, date, timestamp):
+    """Turns an attendance sheet into one document per present student."""
+    return [
+        {
+            "enrollment": str(rec.get("Enrollment")),
+            "name": rec.get("Name"),
+            "subject": subject,
+            "date": date,
+            "timestamp": timestamp,
+            "status": "Present"
+        } for rec in df.to_dict('records')
+    ]
 
+_indexed_collections = set()
+_indexed_lock = threading.Lock()
+
+def ensure_attendance_index(collection):
+    """
+    Creates the unique (enrollment, subject, date, timestamp) index once per collection,
+    which backs the upsert lookups and rules out duplicates from concurrent syncs.
+    Collections that already hold duplicates keep working without it.
+    """
+    key = (collection.database.name, collection.name)
+    with _indexed_lock:
+        if key in _indexed_collections:
+            return
     try:
-        db = client[DB_NAME]
-        collection = db[subject]
-        
-        records = df.to_dict('records')
-        documents = [
-            {
-                "enrollment": str(rec.get("Enrollment")),
-                "name": rec.get("Name"),
-                "subject": subject,
-                "date": date,
-                "timestamp": timestamp,
-                "status": "Present"
-            } for rec in records
-        ]
-
-        if documents:
-            collection.insert_many(documents)
-            logging.info(f"Successfully uploaded {len(documents)} records for {subject}.")
-        client.close()
-        return True
+        collection.create_index(list(ATTENDANCE_KEY_FIELDS), unique=True, name="attendance_key")
+    except DuplicateKeyError as e:
+        # Existing duplicates: the index cannot be built, so don't try again on every batch
+        logging.warning(f"Could not create the unique attendance index on {collection.name}: {e}")
+    except PyMongoError as e:
+        logging.warning(f"Could not create the unique attendance index on {collection.name}: {e}")
+        return  # Possibly transient; the next write tries again
+    with _indexed_lock:
+        _indexed_collections.add(key)
+
+def upsert_attendance(db, subject, documents, schema=None, sessions=False):
+    """
+    Writes attendance documents to the subject's collection with one unordered bulk_write.
+    Each document is an upsert keyed on (enrollment, subject, date, timestamp), so uploading
+    the same sheet twice leaves a single copy. With the "unified" schema the documents go to
+    the shared attendance collection instead (see attendance_schema.upsert_unified).
+
+    Returns:
+        BulkWriteResult: The pymongo result.
+
+    Raises:
+        BulkWriteError: If some documents failed; the others were still written.
+    """
+    if schema is None:
+        schema = load_settings().get("mongo_schema", "per_subject")
+    if schema == "unified":
+        return upsert_unified(db, documents, sessions)
+    collection = db[subject]
+    ensure_attendance_index(collection)
+    requests = [UpdateOne({field: doc[field] for field in ATTENDANCE_KEY_FIELDS}, {"$setOnInsert": doc}, upsert=True)
+                for doc in documents]
+    return collection.bulk_write(requests, ordered=False)
+
+def upload_df_to_mongodb(df, subject, date, timestamp, csv_file_path):
+    """
+    Queues an attendance sheet for upload and returns without any network I/O.
 
+    The documents go into the local SQLite outbox in one transaction; the
+    background sync worker (or drain_outbox) uploads them when MongoDB is
+    reachable. Returns True once the session is safely queued.
+    """
+    try:
+        documents = attendance_documents(df, subject, date, timestamp)
+        session_id = os.path.splitext(os.path.basename(csv_file_path))[0]
+        get_outbox().enqueue(session_id, subject, documents, csv_file_path)
     except Exception as e:
-        logging.error(f"Error during MongoDB upload: {e}", exc_info=True)
+        logging.error(f"Could not queue {csv_file_path} for upload: {e}", exc_info=True)
         log_failed_upload(csv_file_path)
-        if client: client.close()
         return False
+    logging.info(f"Queued {len(documents)} records for {subject} for upload.")
+    if _worker is not None:
+        _worker.wake()
+    return True
+
+def parse_sheet_filename(file_path):
+    """
+    Splits Attendance/<subject>/<subject>_<YYYY-MM-DD>_<HH-MM-SS>.csv into the
+    (subject, date, timestamp) values the live upload stores.
+    """
+    subject, date, timestamp = os.path.basename(file_path)[:-len(".csv")].rsplit('_', 2)
+    return subject, date.replace('-', ':'), timestamp
+
+def read_pending_file(file_path):
+    """Reads one pending attendance sheet. Returns (subject, documents)."""
+    subject, date, timestamp = parse_sheet_filename(file_path)
+    return subject, attendance_documents(pd.read_csv(file_path), subject, date, timestamp)
+
+_outbox = None
+_outbox_lock = threading.Lock()
+_drain_lock = threading.RLock()  # One drain at a time, so the worker and the Sync button never send the same rows
+_worker = None
+
+def get_outbox():
+    """Returns the process-wide SyncOutbox, creating its database on first use."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = SyncOutbox(OUTBOX_DB)
+        return _outbox
+
+def import_offline_log(outbox=None, log_file=None, workers=SYNC_WORKERS):
+    """
+    Moves the sheets listed in the old offline sync log into the outbox. Sheets
+    that cannot be read stay in the log. Returns the number of sheets queued.
+    """
+    outbox = outbox or get_outbox()
+    log_file = log_file or OFFLINE_LOG_FILE
+    if not os.path.exists(log_file):
+        return 0
+    with open(log_file, 'r') as f:
+        pending_files = list(dict.fromkeys(line.strip() for line in f if line.strip()))  # Unique, in logged order
 
-def sync_pending_files(status_callback):
-    """Reads the log file and tries to sync pending attendance CSVs."""
-    client, error_message = get_mongo_client()
-    if not client:
-        status_callback(error_message)
-        return
-
-    if not os.path.exists(OFFLINE_LOG_FILE):
-        status_callback("No pending files to sync.")
-        client.close()
-        return
-
-    with open(OFFLINE_LOG_FILE, 'r') as f:
-        pending_files = list(set([line.strip() for line in f if line.strip()])) # Use set to get unique files
-
-    if not pending_files:
-        status_callback("Sync log is empty. All clear!")
-        client.close()
-        return
-
-    successful_syncs = []
-    failed_syncs = []
-    total = len(pending_files)
-    status_callback(f"Starting sync for {total} file(s)...")
-
-    for idx, file_path in enumerate(pending_files):
-        if not os.path.exists(file_path):
-            logging.warning(f"File not found, removing from log: {file_path}")
-            successful_syncs.append(file_path)
-            continue
+    existing = [p for p in pending_files if os.path.exists(p)]
+    for file_path in set(pending_files) - set(existing):
+        logging.warning(f"File not found, removing from log: {file_path}")
+    failed, queued = [], 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for file_path, result in zip(existing, pool.map(_read_or_error, existing)):
+            if isinstance(result, Exception):
+                logging.error(f"Failed to process {file_path}: {result}")
+                failed.append(file_path)
+                continue
+            subject, documents = result
+            outbox.enqueue(os.path.splitext(os.path.basename(file_path))[0], subject, documents, file_path)
+            queued += 1
 
+    # Rewrite the log file with only the files that could not be queued
+    tmp_path = log_file + ".tmp"
+    with open(tmp_path, 'w') as f:
+        for file_path in failed:
+            f.write(file_path + "\n")
+    os.replace(tmp_path, log_file)
+    return queued
+
+def drain_outbox(status_callback=None, client=None, outbox=None, batch_size=SYNC_BATCH_SIZE,
+                 workers=SYNC_WORKERS, retry_waiting=False):
+    """
+    Uploads the queued sessions whose retry time has come.
+
+    Sessions are grouped by subject and written in batches of upserts (see
+    upsert_attendance), several batches at a time over the shared client, so
+    re-sending a session that partly arrived before leaves no duplicates. Sent
+    sessions leave the outbox; failed ones are scheduled for a later retry.
+    Only one drain runs at a time; a second caller waits for the first.
+
+    Args:
+        status_callback (callable): Receives per-batch throughput messages and connection errors.
+        client: A MongoClient-like object to use instead of the shared client
+            (for a local mongod or an in-process stand-in).
+        outbox (SyncOutbox): Defaults to the process-wide outbox.
+        batch_size (int): Documents per bulk_write.
+        workers (int): Threads writing batches.
+        retry_waiting (bool): Also send sessions whose retry time has not come yet.
+
+    Returns:
+        tuple: (sessions sent, sessions still queued, seconds to wait before retrying if
+        MongoDB is unreachable, else None).
+    """
+    with _drain_lock:
+        return _drain(status_callback or logging.info, client, outbox or get_outbox(), batch_size, workers, retry_waiting)
+
+def _drain(status_callback, client, outbox, batch_size, workers, retry_waiting):
+    """drain_outbox() for a caller that holds _drain_lock."""
+    if not outbox.due(limit=1, include_waiting=retry_waiting):
+        return 0, outbox.pending_count(), None  # Nothing to send, so no reason to touch the network
+    connection = None
+    if client is None:
+        client, error_message = get_mongo_client()
+        if not client:
+            status_callback(error_message)
+            # Connection failures have their own backoff; anything else (no URI yet) is rechecked at the poll interval
+            return 0, outbox.pending_count(), _connection.seconds_until_retry() or SYNC_POLL_SECONDS
+        connection = _connection
+
+    sent = 0
+    db = client[DB_NAME]
+    app_settings = load_settings()
+    schema = (app_settings.get("mongo_schema", "per_subject"), app_settings.get("mongo_session_documents", False))
+    while True:
+        # Sessions are pulled in bounded chunks, so a long backlog never sits in memory at once
+        sessions = outbox.due(limit=SYNC_SESSIONS_PER_PASS, include_waiting=retry_waiting)
+        if not sessions:
+            break
+        by_subject = {}  # subject -> list of (document, row id)
+        for row_id, subject, documents in sessions:
+            by_subject.setdefault(subject, []).extend((doc, row_id) for doc in documents)
+        batches = [(subject, entries[i:i + batch_size])
+                   for subject, entries in by_subject.items()
+                   for i in range(0, len(entries), batch_size)]
+
+        failed_rows, last_error = set(), None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_write_batch, db, subject, entries, schema): (subject, entries) for subject, entries in batches}
+            for future in as_completed(futures):
+                subject, entries = futures[future]
+                failed, error, seconds = future.result()
+                failed_rows.update(failed)
+                if error is None:
+                    status_callback(f"Uploaded {len(entries)} records for {subject} in {seconds:.2f} s "
+                                    f"({len(entries) / max(seconds, 1e-6):.0f} records/s)")
+                else:
+                    last_error = error
+                    if not isinstance(error, PyMongoError):
+                        # A bad document or a bug, not the server: the rows back off on their own,
+                        # but the shared client must not be put into connection backoff for it
+                        logging.error(f"Sync batch for {subject} ({len(entries)} records) failed with a data error: "
+                                      f"{error!r}", exc_info=error)
+                        continue
+                    logging.error(f"Sync batch for {subject} ({len(entries)} records) did not go through: {error}")
+                    if connection is not None and not isinstance(error, BulkWriteError):
+                        connection.mark_failed(error)
+
+        # Sessions without documents (nobody present) count as sent
+        done = [row_id for row_id, _, _ in sessions if row_id not in failed_rows]
+        outbox.mark_sent(done)
+        sent += len(done)
+        if failed_rows:
+            outbox.mark_failed(failed_rows, last_error)
+            break  # Leave the rest for the next pass instead of hammering a failing server
+        if connection is not None:
+            connection.mark_ok()
+
+    return sent, outbox.pending_count(), None
+
+def start_sync_worker(poll_interval=SYNC_POLL_SECONDS):
+    """
+    Starts the background worker that uploads queued sessions whenever MongoDB is
+    reachable. Sheets still listed in the old offline log are moved into the outbox first.
+    """
+    global _worker
+    if _worker is not None:
+        return _worker
+    outbox = get_outbox()
+
+    def drain():
+        with _drain_lock:
+            if not drain.imported:
+                import_offline_log(outbox)
+                drain.imported = True
+            sent, remaining, retry_after = drain_outbox(outbox=outbox)
+        if sent:
+            logging.info(f"Background sync uploaded {sent} session(s); {remaining} still queued.")
+        return retry_after
+    drain.imported = False
+
+    _worker = SyncWorker(outbox, drain, poll_interval).start()
+    return _worker
+
+def stop_sync_worker():
+    global _worker
+    if _worker is not None:
+        _worker.stop()
+        _worker = None
+
+def sync_pending_files(status_callback, client=None, log_file=None, batch_size=SYNC_BATCH_SIZE, workers=SYNC_WORKERS):
+    """
+    Uploads everything that is waiting right now, ignoring retry delays; used by the
+    "Sync Pending Records" button. Old offline log entries are queued first.
+
+    The last message passed to status_callback always ends the sync: "No pending
+    files", "Sync complete ..." or the connection error.
+    """
+    started = time.perf_counter()
+    outbox = get_outbox()
+    with _drain_lock:
+        queued = import_offline_log(outbox, log_file, workers)
+        if queued:
+            status_callback(f"Queued {queued} file(s) from the offline log.")
+        pending = outbox.pending_count()
+        if not pending:
+            status_callback("No pending files to sync.")
+            return
+        status_callback(f"Starting sync for {pending} session(s)...")
+        sent, remaining, retry_after = drain_outbox(status_callback, client=client, outbox=outbox,
+                                                    batch_size=batch_size, workers=workers, retry_waiting=True)
+    if retry_after is None:  # Otherwise the connection error was the final message
+        status_callback(f"Sync complete. Synced: {sent}, Remaining: {remaining} "
+                        f"({time.perf_counter() - started:.1f} s).")
+
+def _read_or_error(file_path):
+    try:
+        return read_pending_file(file_path)
+    except Exception as e:
+        return e
+
+def _write_batch(db, subject, entries, schema):
+    """
+    Writes one sync batch. With session documents enabled, the records are written
+    first and then every record that went through is added to its session document,
+    so an error in either write is traced back to the outbox rows it belongs to.
+
+    Returns:
+        tuple: (sources with a failed document, error or None, seconds).
+    """
+    start = time.perf_counter()
+    schema_name, sessions = schema
+    failed, error = set(), None
+    try:
+        upsert_attendance(db, subject, [doc for doc, _ in entries], schema_name, sessions=False)
+    except BulkWriteError as e:
+        if e.details.get("writeConcernErrors"):
+            # Not acknowledged at the requested write concern: keep the whole batch queued
+            return {source for _, source in entries}, e, time.perf_counter() - start
+        # Unordered: everything but the reported documents was written
+        failed, error = {err["index"] for err in e.details.get("writeErrors", [])}, e
+    except Exception as e:
+        return {source for _, source in entries}, e, time.perf_counter() - start
+
+    if schema_name == "unified" and sessions:
+        written = [i for i in range(len(entries)) if i not in failed]
+        converted = [unified_document(entries[i][0]) for i in written]
         try:
-            filename = os.path.basename(file_path)
-            parts = filename.replace('.csv', '').split('_')
-            subject, date, timestamp = parts[0], parts[1], parts[2].replace('-', ':')
-            
-            df = pd.read_csv(file_path)
-            status_callback(f"Syncing {idx+1}/{total}: {filename}")
-
-            if upload_df_to_mongodb(df, subject, date, timestamp, file_path):
-                successful_syncs.append(file_path)
+            if converted:
+                upsert_sessions(db, converted)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                failed.update(written)
             else:
-                # upload_df already logs the failure, so we just add it to the list
-                failed_syncs.append(file_path)
+                failed_ids = failed_session_ids(converted, e)
+                failed.update(i for i, doc in zip(written, converted) if doc["session_id"] in failed_ids)
+            error = e
         except Exception as e:
-            logging.error(f"Failed to process or upload {file_path}: {e}", exc_info=True)
-            failed_syncs.append(file_path)
-    
-    # Rewrite the log file with only the files that failed to sync again
-    with open(OFFLINE_LOG_FILE, 'w') as f:
-        for file_path in failed_syncs:
-            f.write(file_path + "\n")
-            
-    synced_count = len(successful_syncs)
-    remaining_count = len(failed_syncs)
-    status_callback(f"Sync complete. Synced: {synced_count}, Remaining: {remaining_count}.")
-    client.close()
+            failed.update(written)
+            error = e
+    return {entries[i][1] for i in failed}, error, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload the queued attendance sessions and the offline sync log.")
+    parser.add_argument("--uri", help="MongoDB URI to sync to instead of the one in settings (e.g. a local mongod).")
+    parser.add_argument("--log", default=OFFLINE_LOG_FILE, help="Offline sync log listing the pending sheets.")
+    parser.add_argument("--batch-size", type=int, default=SYNC_BATCH_SIZE, help="Documents per bulk write.")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS, help="Threads reading sheets and writing batches.")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, serverSelectionTimeoutMS=5000) if args.uri else None
+    try:
+        sync_pending_files(print, client=client, log_file=args.log, batch_size=args.batch_size, workers=args.workers)
+    finally:
+        if client is not None:
+            client.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# motion_gate.py
+
+import cv2
+import numpy as np
+
+class MotionGate:
+    """
+    A cheap scene-change test used to skip the face detector on static frames.
+
+    Frames are shrunk to a small thumbnail and compared with the thumbnail of
+    the frame on which the detector last ran. Detection is allowed only when a
+    meaningful fraction of pixels changed, or when a periodic refresh is due so
+    that slow changes are never missed entirely.
+    """
+    def __init__(self, change_fraction=0.01, pixel_threshold=20, downscale_width=64, refresh_every_n_frames=60):
+        """
+        Args:
+            change_fraction (float): Fraction of thumbnail pixels that must change to count as motion.
+            pixel_threshold (int): Grey-level difference above which a thumbnail pixel counts as changed.
+            downscale_width (int): Width of the thumbnail the comparison runs on.
+            refresh_every_n_frames (int): Allow detection once this many frames have passed since the
+                last one regardless of motion, counting every frame passed to advance().
+        """
+        self.change_fraction = change_fraction
+        self.pixel_threshold = pixel_threshold
+        self.downscale_width = downscale_width
+        self.refresh_every_n_frames = refresh_every_n_frames
+        self._reference = None
+        self._frames_since_reference = 0
+        self.checked_count = 0
+        self.skipped_count = 0
+
+    def _thumbnail(self, gray):
+        (h, w) = gray.shape[:2]
+        height = max(1, int(h * self.downscale_width / w))
+        thumb = cv2.resize(gray, (self.downscale_width, height), interpolation=cv2.INTER_AREA)
+        # A light blur keeps sensor noise from registering as motion
+        return cv2.GaussianBlur(thumb, (3, 3), 0)
+
+    def advance(self):
+        """Counts one frame seen by the caller, whether or not a detection is scheduled on it."""
+        self._frames_since_reference += 1
+
+    def should_detect(self, gray):
+        """
+        Returns True if the scene changed enough since the last detection (or a
+        refresh is due). Call mark_detected() when the detector actually runs.
+        """
+        self.checked_count += 1
+        if self._reference is None or self._frames_since_reference >= self.refresh_every_n_frames:
+            return True
+        thumb = self._thumbnail(gray)
+        if thumb.shape != self._reference.shape:
+            return True
+        changed = np.count_nonzero(cv2.absdiff(thumb, self._reference) > self.pixel_threshold)
+        if changed >= self.change_fraction * thumb.size:
+            return True
+        self.skipped_count += 1
+        return False
+
+    def mark_detected(self, gray):
+        """Makes this frame the reference that later frames are compared against."""
+        self._reference = self._thumbnail(gray)
+        self._frames_since_reference = 0
+
+    def skip_ratio(self):
+        """Fraction of checked frames on which detection was skipped."""
+        return self.skipped_count / self.checked_count if self.checked_count else 0.0
+
+    def summary(self):
+        """Returns a one-line summary for tuning the thresholds."""
+        return f"motion gate skipped {self.skipped_count}/{self.checked_count} scheduled detections ({self.skip_ratio() * 100:.0f}%)"
@@ -0,0 +1,53 @@
+# recognition.py
+
+"""
+Face recognition setup shared by the live attendance window and the headless
+batch CLI. Nothing here imports tkinter, so batch workers can load it on
+servers without a display.
+"""
+
+from face_tracker import FaceTracker
+from face_preprocessing import create_preprocessor
+from motion_gate import MotionGate
+import model_registry
+
+# --- Recognition Configuration ---
+RECOGNITION_CONFIDENCE = 75 # LBPH Face recognition confidence threshold (lower is better)
+
+def create_predict_fn(model_path, app_settings, subject=None):
+    """
+    Returns a function mapping a list of grayscale face ROIs to (label, confidence)
+    pairs, using the recognizer backend selected in settings. The trained model
+    comes from the shared model registry, so it is only read from disk once.
+
+    If the subject has a roster, faces are only matched against the students on
+    it, through a per-subject shard of the model.
+    """
+    if subject is not None:
+        shard = model_registry.get_subject_matcher(model_path, app_settings, subject)
+        if shard is not None:
+            return shard.predict_batch
+    if model_registry.uses_matcher(model_path, app_settings):
+        # Vectorized matcher over the same trained histograms, same (label, confidence) contract
+        matcher = model_registry.get_matcher_for(model_path, app_settings)
+        return matcher.predict_batch
+    recognizer = model_registry.get_recognizer(model_path)
+    return lambda rois: [recognizer.predict(roi) for roi in rois]
+
+def create_face_tracker(app_settings):
+    """Builds a FaceTracker (with the optional motion gate) configured from settings."""
+    motion_gate = None
+    if app_settings.get("motion_gate", True):
+        motion_gate = MotionGate(
+            change_fraction=app_settings.get("motion_change_fraction", 0.01),
+            pixel_threshold=app_settings.get("motion_pixel_threshold", 20),
+            refresh_every_n_frames=app_settings.get("motion_refresh_frames", 60),
+        )
+    return FaceTracker(
+        detect_every_n_frames=app_settings.get("detect_every_n_frames", 5),
+        tracker_type=app_settings.get("tracker_type", "kcf"),
+        identity_votes=app_settings.get("identity_votes", 5),
+        reverify_every_n_frames=app_settings.get("reverify_every_n_frames", 150),
+        motion_gate=motion_gate,
+        preprocessor=create_preprocessor(app_settings),
+    )
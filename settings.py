@@ -10,7 +10,38 @@ from utils import apply_theme, BG_COLOR, FG_COLOR, BTN_BG, BTN_FG, BTN_FONT, BAS
 SETTINGS_FILE = "settings.json"
 DEFAULT_SETTINGS = {
     "camera_index": 0,
-    "mongo_uri": "YOUR_MONGODB_CONNECTION_STRING_HERE"
+    "camera_indices": "",  # Comma-separated cameras for multi-camera attendance (empty = camera_index only)
+    "mongo_uri": "YOUR_MONGODB_CONNECTION_STRING_HERE",
+    "mongo_schema": "per_subject",  # "per_subject" (one collection per subject) or "unified" (one indexed attendance collection)
+    "mongo_session_documents": False,  # unified schema only: also keep one document per session with its present list
+    "frame_queue_size": 2,  # Frames buffered by the capture thread before the oldest is dropped
+    "detector_backend": "ssd",  # Face detector: ssd, haar, onnx or cascade (haar proposes, ssd verifies)
+    "detector_input_size": 300,  # SSD input resolution; smaller is faster but misses small faces
+    "detection_confidence": 0.7,  # Minimum face detection confidence (ssd/onnx)
+    "detector_onnx_model": "version-RFB-320.onnx",  # Model file for the onnx backend
+    "haar_cascade_path": "",  # Haar cascade XML (empty = frontal face cascade shipped with OpenCV)
+    "face_size": 0,  # Square face side in pixels for training and recognition (0 = detector box size); run face_preprocessing.py and retrain after changing it
+    "face_padding": 0.0,  # Extra margin around the detector box, as a fraction of its size
+    "face_alignment": False,  # Level the eyes before recognition (needs OpenCV's haarcascade_eye.xml)
+    "capture_min_face_size": 60,  # Registration: faces smaller than this (pixels) are not saved
+    "capture_min_sharpness": 25.0,  # Registration: Laplacian variance floor below which a face counts as blurred
+    "capture_duplicate_threshold": 6.0,  # Registration: mean grey-level difference below which a face repeats a kept one
+    "capture_timeout_seconds": 30,  # Registration stops after this long even if fewer samples were kept
+    "training_store": "folders",  # Where registration saves samples: "folders" (one JPEG each) or "packed" (one file per student)
+    "detect_every_n_frames": 5,  # Run the face detector every N frames and track faces in between (1 = every frame)
+    "tracker_type": "kcf",  # Tracker used between detections: kcf, mosse, csrt or none
+    "motion_gate": True,  # Skip scheduled detections while the scene is static
+    "motion_change_fraction": 0.01,  # Fraction of thumbnail pixels that must change to count as motion
+    "motion_pixel_threshold": 20,  # Grey-level difference for a thumbnail pixel to count as changed
+    "motion_refresh_frames": 60,  # Detect anyway after this many frames without motion
+    "identity_votes": 5,  # Predictions voted on before a tracked face's identity is confirmed
+    "reverify_every_n_frames": 150,  # Frames between re-verification predictions for a confirmed face
+    "recognizer_backend": "opencv",  # "opencv" (cv2.face) or "numpy" (vectorized LBPHMatcher)
+    "recognizer_prefilter": 0,  # numpy backend only: score just the N closest students exactly (0 = all)
+    "recognizer_storage": "float32",  # Histogram storage: float32, float16, uint16, uint8 or sparse (smaller, numpy matcher)
+    "samples_per_student": 0,  # Representative training samples kept per student (0 = keep every captured image)
+    "model_format": "yml",  # "yml" (cv2.face Trainner.yml) or "binary" (memory-mapped Trainner.lbph, numpy matcher)
+    "session_resume_minutes": 60  # An interrupted session restarted within this window continues its journal
 }
 
 def load_settings():
@@ -50,7 +81,7 @@ class SettingsWindow:
         self.window = window
         self.app = app
         self.window.title("Settings")
-        self.window.geometry("680x400")
+        self.window.geometry("680x450")
         apply_theme(self.window)
         self.window.resizable(False, False)
         
@@ -73,12 +104,20 @@ class SettingsWindow:
                                          textvariable=self.camera_index_var, validate='key', validatecommand=vcmd)
         self.txt_camera_index.grid(row=0, column=1, sticky="ew", pady=10)
 
+        # Additional cameras for multi-camera attendance
+        tk.Label(main_frame, text="Attendance Cameras:", font=BTN_FONT, bg=BG_COLOR, fg=FG_COLOR).grid(row=1, column=0, sticky="w", pady=10)
+        self.camera_indices_var = tk.StringVar(value=str(self.settings.get("camera_indices", "")))
+        vcmd_list = (self.window.register(self.validate_index_list), '%P')
+        self.txt_camera_indices = tk.Entry(main_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT,
+                                           textvariable=self.camera_indices_var, validate='key', validatecommand=vcmd_list)
+        self.txt_camera_indices.grid(row=1, column=1, sticky="ew", pady=10)
+
         # MongoDB URI
-        tk.Label(main_frame, text="MongoDB URI:", font=BTN_FONT, bg=BG_COLOR, fg=FG_COLOR).grid(row=1, column=0, sticky="w", pady=10)
+        tk.Label(main_frame, text="MongoDB URI:", font=BTN_FONT, bg=BG_COLOR, fg=FG_COLOR).grid(row=2, column=0, sticky="w", pady=10)
         self.mongo_uri_var = tk.StringVar(value=self.settings.get("mongo_uri", ""))
         self.txt_mongo_uri = tk.Entry(main_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT, 
                                       textvariable=self.mongo_uri_var, width=50)
-        self.txt_mongo_uri.grid(row=1, column=1, sticky="ew", pady=10)
+        self.txt_mongo_uri.grid(row=2, column=1, sticky="ew", pady=10)
         
         main_frame.grid_columnconfigure(1, weight=1)
 
@@ -88,6 +127,10 @@ class SettingsWindow:
         """Validation function to ensure only digits are entered in the entry field."""
         return value_if_allowed.isdigit() or value_if_allowed == ""
 
+    def validate_index_list(self, value_if_allowed):
+        """Validation function allowing a comma-separated list of camera indices, e.g. "0,1,2"."""
+        return all(part.strip().isdigit() or part.strip() == "" for part in value_if_allowed.split(","))
+
     def save_and_close(self):
         """Saves the current settings and closes the window."""
         try:
@@ -95,6 +138,7 @@ class SettingsWindow:
             mongo_uri = self.mongo_uri_var.get().strip()
             
             self.settings["camera_index"] = camera_index
+            self.settings["camera_indices"] = ",".join(p.strip() for p in self.camera_indices_var.get().split(",") if p.strip())
             self.settings["mongo_uri"] = mongo_uri
 
             if not mongo_uri or mongo_uri == DEFAULT_SETTINGS["mongo_uri"]:
@@ -2,11 +2,10 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import pandas as pd
-from glob import glob
-import os
 import logging
 import datetime
+from attendance_store import AttendanceStore
+from student_index import get_student_index
 from utils import (apply_theme, BG_COLOR, FG_COLOR, BTN_BG, BTN_FG,
                    ACCENT_COLOR, BTN_FONT, BASE_FONT)
 
@@ -18,10 +17,11 @@ class ViewAttendanceWindow:
         self.window = window
         self.app = app
         self.window.title("View Attendance")
-        self.window.geometry("800x600")
+        self.window.geometry("1000x600")
         apply_theme(self.window)
         
         self.df = None # To store the currently displayed dataframe for export
+        self.store = AttendanceStore()
         self.create_widgets()
         
     def create_widgets(self):
@@ -34,10 +34,18 @@ class ViewAttendanceWindow:
         self.txt_subject = tk.Entry(controls_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT)
         self.txt_subject.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
         
-        # Date Filter
+        # Date Filter (a single date, or a range with the "to" field)
         tk.Label(controls_frame, text="Date (YYYY-MM-DD):", font=BASE_FONT, bg=BG_COLOR, fg=FG_COLOR).pack(side=tk.LEFT, padx=(10, 5))
-        self.txt_date = tk.Entry(controls_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT, width=15)
+        self.txt_date = tk.Entry(controls_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT, width=11)
         self.txt_date.pack(side=tk.LEFT, padx=5)
+        tk.Label(controls_frame, text="to", font=BASE_FONT, bg=BG_COLOR, fg=FG_COLOR).pack(side=tk.LEFT)
+        self.txt_date_to = tk.Entry(controls_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT, width=11)
+        self.txt_date_to.pack(side=tk.LEFT, padx=5)
+
+        # Student Filter
+        tk.Label(controls_frame, text="Enrollment:", font=BASE_FONT, bg=BG_COLOR, fg=FG_COLOR).pack(side=tk.LEFT, padx=(10, 5))
+        self.txt_enrollment = tk.Entry(controls_frame, font=BASE_FONT, bg=BTN_BG, fg=FG_COLOR, relief=tk.FLAT, width=8)
+        self.txt_enrollment.pack(side=tk.LEFT, padx=5)
         
         # Buttons
         self.btn_show = tk.Button(controls_frame, text="Show", command=self.show_attendance, font=BASE_FONT, bg=BTN_BG, fg=BTN_FG, relief=tk.FLAT)
@@ -65,54 +73,51 @@ class ViewAttendanceWindow:
     def show_attendance(self):
         subject = self.txt_subject.get().strip()
         filter_date = self.txt_date.get().strip()
+        filter_date_to = self.txt_date_to.get().strip()
+        enrollment = self.txt_enrollment.get().strip()
 
-        if not subject:
-            messagebox.showerror("Error", "Please enter a subject name.", parent=self.window)
+        if not subject and not enrollment:
+            messagebox.showerror("Error", "Please enter a subject name or an enrollment number.", parent=self.window)
             return
 
-        attendance_folder = f"Attendance/{subject}"
-        if not os.path.exists(attendance_folder):
-            messagebox.showinfo("Not Found", f"No records found for subject '{subject}'.", parent=self.window)
-            return
+        for value in (filter_date, filter_date_to):
+            if value:
+                try:
+                    datetime.datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    messagebox.showerror("Error", f"'{value}' is not a date in YYYY-MM-DD format.", parent=self.window)
+                    return
+
+        if subject:
+            folder = self.store.resolve_subject(subject)
+            if folder is None:
+                messagebox.showinfo("Not Found", f"No records found for subject '{subject}'.", parent=self.window)
+                return
+            subject = folder
 
         try:
-            csv_files = glob(os.path.join(attendance_folder, "*.csv"))
-            if not csv_files:
-                messagebox.showinfo("Not Found", f"No attendance sheets found for '{subject}'.", parent=self.window)
-                return
+            # A single date unless the "to" field makes it a range
+            merged_df = self.store.query(subject=subject or None, start=filter_date or None,
+                                         end=(filter_date_to or filter_date) or None, enrollment=enrollment or None)
 
-            all_dfs = []
-            for f in csv_files:
-                try:
-                    # Extract date from filename: Subject_YYYY-MM-DD_HH-MM-SS.csv
-                    date_part = os.path.basename(f).split('_')[1]
-                    # Filter by date if provided
-                    if filter_date and date_part != filter_date:
-                        continue
-                    
-                    df_file = pd.read_csv(f)
-                    df_file['Date'] = date_part # Add date column
-                    df_file['Timestamp'] = os.path.basename(f).split('_')[2].replace('.csv', '')
-                    all_dfs.append(df_file)
-                except IndexError:
-                    logging.warning(f"Could not parse filename: {f}. Skipping.")
-                    continue
-
-            if not all_dfs:
-                messagebox.showinfo("No Records", f"No records found for the specified date.", parent=self.window)
+            if merged_df.empty:
+                messagebox.showinfo("No Records", f"No records found for the specified filters.", parent=self.window)
                 self.clear_treeview()
                 return
 
-            merged_df = pd.concat(all_dfs, ignore_index=True)
-            # Reorder columns for better display
-            cols = ['Date', 'Timestamp', 'Enrollment', 'Name']
+            # Resolve missing names from the shared roster index
+            students = get_student_index()
+            merged_df['Name'] = [name if isinstance(name, str) and name else students.name_of(enrollment, "")
+                                 for enrollment, name in zip(merged_df['Enrollment'], merged_df['Name'])]
+            # Reorder columns for better display; the subject is only shown when it varies
+            cols = (['Subject'] if not subject else []) + ['Date', 'Timestamp', 'Enrollment', 'Name']
             merged_df = merged_df[cols].drop_duplicates().sort_values(by=['Date', 'Timestamp', 'Name'])
             
             self.df = merged_df # Store for export
             self.display_in_treeview(merged_df, subject)
 
         except Exception as e:
-            logging.error(f"Error reading files for {subject}: {e}", exc_info=True)
+            logging.error(f"Error reading attendance for {subject or enrollment}: {e}", exc_info=True)
             messagebox.showerror("Error", f"An error occurred: {e}", parent=self.window)
 
     def display_in_treeview(self, df, subject_name):
@@ -148,7 +153,7 @@ class ViewAttendanceWindow:
                 defaultextension=".csv",
                 filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
                 title="Save Attendance As",
-                initialfile=f"attendance_{self.txt_subject.get().strip()}.csv"
+                initialfile=f"attendance_{self.txt_subject.get().strip() or self.txt_enrollment.get().strip()}.csv"
             )
             if file_path:
                 self.df.to_csv(file_path, index=False)
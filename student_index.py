@@ -0,0 +1,132 @@
+# student_index.py
+
+import os
+import csv
+import logging
+import threading
+
+DEFAULT_DETAILS_PATH = os.path.join("StudentDetails", "studentdetails.csv")
+
+def normalize_enrollment(enrollment):
+    """Returns the canonical string key for an enrollment number (e.g. 12, "12", "12.0" -> "12")."""
+    key = str(enrollment).strip()
+    if key.endswith(".0") and key[:-2].isdigit():
+        key = key[:-2]
+    return key
+
+class StudentIndex:
+    """
+    An in-memory index of the student roster, keyed by enrollment number.
+
+    The roster CSV is read once; lookups are dictionary hits instead of a scan
+    of the whole DataFrame column. Enrollments that appear more than once are
+    reported in `duplicates`; the last row for an enrollment wins, matching the
+    append-only way registration writes the file.
+    """
+    def __init__(self, path=DEFAULT_DETAILS_PATH):
+        self.path = path
+        self.records = {}     # enrollment -> {"Enrollment": str, "Name": str}
+        self.duplicates = {}  # enrollment -> every name seen for it, in file order
+        self._lock = threading.Lock()
+        self._signature = None
+
+    def load(self):
+        """(Re)reads the roster file into the index."""
+        records, seen = {}, {}
+        if os.path.exists(self.path):
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f):
+                    enrollment = normalize_enrollment(row.get("Enrollment") or "")
+                    if not enrollment:
+                        continue  # Skip blank lines
+                    name = (row.get("Name") or "").strip()
+                    seen.setdefault(enrollment, []).append(name)
+                    records[enrollment] = {"Enrollment": enrollment, "Name": name}
+
+        duplicates = {e: names for e, names in seen.items() if len(names) > 1}
+        for enrollment, names in duplicates.items():
+            if len(set(names)) > 1:
+                logging.warning(f"Enrollment {enrollment} is registered under several names {names}; using '{names[-1]}'.")
+            else:
+                logging.info(f"Enrollment {enrollment} appears {len(names)} times in {self.path}.")
+
+        with self._lock:
+            self.records = records
+            self.duplicates = duplicates
+            self._signature = self._file_signature()
+        return self
+
+    def _file_signature(self):
+        """Returns (mtime, size) of the roster file, used to detect changes on disk."""
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """Returns True if the roster file changed since it was last loaded."""
+        return self._file_signature() != self._signature
+
+    def get(self, enrollment):
+        """Returns the record for an enrollment number, or None if it is not registered."""
+        return self.records.get(normalize_enrollment(enrollment))
+
+    def name_of(self, enrollment, default=None):
+        """Returns the student's name for an enrollment number."""
+        record = self.get(enrollment)
+        return record["Name"] if record else default
+
+    def add(self, enrollment, name):
+        """
+        Registers a student, appending to the roster CSV unless the exact
+        enrollment/name pair is already present.
+
+        Returns:
+            bool: True if a new row was written.
+        """
+        enrollment = normalize_enrollment(enrollment)
+        name = name.strip()
+        with self._lock:
+            existing = self.records.get(enrollment)
+            if existing and existing["Name"] == name:
+                return False
+            if existing:
+                logging.warning(f"Enrollment {enrollment} re-registered as '{name}' (was '{existing['Name']}').")
+                self.duplicates.setdefault(enrollment, [existing["Name"]]).append(name)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            file_exists = os.path.isfile(self.path)
+            with open(self.path, "a+", newline='') as csvFile:
+                writer = csv.writer(csvFile)
+                # Write header only if the file is new/empty
+                if not file_exists or os.path.getsize(self.path) == 0:
+                    writer.writerow(["Enrollment", "Name"])
+                writer.writerow([enrollment, name])
+            self.records[enrollment] = {"Enrollment": enrollment, "Name": name}
+            self._signature = self._file_signature()
+        return True
+
+    def __contains__(self, enrollment):
+        return normalize_enrollment(enrollment) in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_student_index(path=DEFAULT_DETAILS_PATH):
+    """
+    Returns the shared StudentIndex for a roster file, loading it on first use
+    and reloading it automatically if the file has changed on disk.
+    """
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = StudentIndex(path).load()
+            _indexes[key] = index
+        elif index.is_stale():
+            index.load()
+        return index
@@ -0,0 +1,137 @@
+# subject_roster.py
+
+"""
+Which enrolled students belong to which subject.
+
+Rosters live in StudentDetails/subject_rosters.csv with one Subject,Enrollment
+row per student per subject. A subject without any rows has no roster, and its
+sessions keep matching against every registered student.
+
+Usage:
+    python subject_roster.py --add Math 101 102 103
+    python subject_roster.py --remove Math 103
+    python subject_roster.py --list Math
+"""
+
+import os
+import csv
+import argparse
+import threading
+from student_index import normalize_enrollment
+
+DEFAULT_ROSTER_PATH = os.path.join("StudentDetails", "subject_rosters.csv")
+
+class SubjectRosters:
+    """An in-memory view of the subject roster file, keyed by subject name."""
+    def __init__(self, path=DEFAULT_ROSTER_PATH):
+        self.path = path
+        self.subjects = {}  # subject -> set of enrollment strings
+        self._lock = threading.Lock()
+        self._signature = None
+
+    def load(self):
+        """(Re)reads the roster file."""
+        subjects = {}
+        if os.path.exists(self.path):
+            with open(self.path, newline='') as f:
+                for row in csv.DictReader(f):
+                    subject = (row.get("Subject") or "").strip()
+                    enrollment = normalize_enrollment(row.get("Enrollment") or "")
+                    if subject and enrollment:
+                        subjects.setdefault(subject, set()).add(enrollment)
+        with self._lock:
+            self.subjects = subjects
+            self._signature = self._file_signature()
+        return self
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def is_stale(self):
+        """Returns True if the roster file changed since it was last loaded."""
+        return self._file_signature() != self._signature
+
+    def enrollments_for(self, subject):
+        """Returns the set of enrollments on a subject's roster, or None if the subject has no roster."""
+        enrollments = self.subjects.get(subject)
+        return set(enrollments) if enrollments else None
+
+    def labels_for(self, subject):
+        """Returns the roster as sorted integer model labels, or None if the subject has no roster."""
+        enrollments = self.enrollments_for(subject)
+        if enrollments is None:
+            return None
+        return sorted(int(e) for e in enrollments if e.isdigit())
+
+    def set_roster(self, subject, enrollments):
+        """Replaces a subject's roster (an empty list removes it) and rewrites the file."""
+        with self._lock:
+            subjects = {s: set(e) for s, e in self.subjects.items()}
+            enrollments = {normalize_enrollment(e) for e in enrollments}
+            if enrollments:
+                subjects[subject] = enrollments
+            else:
+                subjects.pop(subject, None)
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Subject", "Enrollment"])
+                for name in sorted(subjects):
+                    for enrollment in sorted(subjects[name], key=lambda e: (len(e), e)):
+                        writer.writerow([name, enrollment])
+            os.replace(tmp_path, self.path)
+            self.subjects = subjects
+            self._signature = self._file_signature()
+
+    def add(self, subject, enrollments):
+        """Adds students to a subject's roster."""
+        self.set_roster(subject, (self.subjects.get(subject) or set()) | {normalize_enrollment(e) for e in enrollments})
+
+    def remove(self, subject, enrollments):
+        """Removes students from a subject's roster."""
+        self.set_roster(subject, (self.subjects.get(subject) or set()) - {normalize_enrollment(e) for e in enrollments})
+
+_rosters = {}
+_rosters_lock = threading.Lock()
+
+def get_subject_rosters(path=DEFAULT_ROSTER_PATH):
+    """Returns the shared SubjectRosters for a file, reloading it if the file changed on disk."""
+    key = os.path.abspath(path)
+    with _rosters_lock:
+        rosters = _rosters.get(key)
+        if rosters is None:
+            rosters = SubjectRosters(path).load()
+            _rosters[key] = rosters
+        elif rosters.is_stale():
+            rosters.load()
+        return rosters
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage which students belong to which subject.")
+    parser.add_argument("--roster", default=DEFAULT_ROSTER_PATH, help="Subject roster CSV file.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--add", nargs="+", metavar=("SUBJECT", "ENROLLMENT"), help="Add students to a subject.")
+    action.add_argument("--remove", nargs="+", metavar=("SUBJECT", "ENROLLMENT"), help="Remove students from a subject.")
+    action.add_argument("--list", nargs="?", const="", metavar="SUBJECT", help="Show one subject's roster, or all subjects.")
+    args = parser.parse_args()
+
+    rosters = get_subject_rosters(args.roster)
+    if args.add:
+        rosters.add(args.add[0], args.add[1:])
+        print(f"{args.add[0]}: {len(rosters.subjects.get(args.add[0], ()))} student(s).")
+    elif args.remove:
+        rosters.remove(args.remove[0], args.remove[1:])
+        print(f"{args.remove[0]}: {len(rosters.subjects.get(args.remove[0], ()))} student(s).")
+    else:
+        for subject in ([args.list] if args.list else sorted(rosters.subjects)):
+            enrollments = sorted(rosters.subjects.get(subject, ()), key=lambda e: (len(e), e))
+            print(f"{subject} ({len(enrollments)}): {', '.join(enrollments) or 'no roster'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# sync_outbox.py
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+OUTBOX_DB = "sync_outbox.db"
+RETRY_BASE_SECONDS = 5.0  # Delay after a session's first failed upload; doubles with every further failure
+RETRY_MAX_SECONDS = 3600.0  # Upper bound for the per-session retry delay
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL UNIQUE,
+    subject TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    source_path TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_retry_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_next_retry ON outbox (next_retry_at);
+"""
+
+class SyncOutbox:
+    """
+    A durable local queue of attendance sessions waiting to be uploaded.
+
+    Each finished session is stored as one row (its documents as a JSON payload)
+    in a single SQLite transaction, so it is either fully queued or not at all,
+    even if the application crashes right after. Rows are removed only once the
+    upload succeeded; a failed upload pushes the row's next retry time back
+    exponentially. Every method opens its own connection, so the outbox can be
+    shared between the UI, attendance and sync threads.
+    """
+    def __init__(self, path=OUTBOX_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Yields a connection whose statements commit together, or not at all, and closes it."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, session_id, subject, documents, source_path=None):
+        """Queues a session's documents. Queuing the same session again replaces its earlier row."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO outbox (session_id, subject, payload, source_path, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, subject, json.dumps(documents), source_path, time.time()))
+
+    def due(self, limit=100, now=None, include_waiting=False):
+        """
+        Returns up to `limit` sessions whose retry time has come, oldest first.
+
+        Returns:
+            list: (row id, subject, documents) tuples.
+        """
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, subject, payload FROM outbox WHERE next_retry_at <= ? ORDER BY id LIMIT ?",
+                (float("inf") if include_waiting else now, limit)).fetchall()
+        return [(row_id, subject, json.loads(payload)) for row_id, subject, payload in rows]
+
+    def mark_sent(self, row_ids):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in row_ids])
+
+    def mark_failed(self, row_ids, error):
+        """Records a failed upload and schedules each session's next attempt."""
+        now = time.time()
+        with self._connect() as conn:
+            for row_id in row_ids:
+                conn.execute(
+                    "UPDATE outbox SET attempts = attempts + 1, last_error = ?, "
+                    "next_retry_at = ? + MIN(?, ? * (1 << MIN(attempts, 20))) WHERE id = ?",
+                    (str(error)[:500], now, RETRY_MAX_SECONDS, RETRY_BASE_SECONDS, row_id))
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def seconds_until_due(self):
+        """Returns how long until the next queued session may be retried, or None if the outbox is empty."""
+        with self._connect() as conn:
+            next_retry_at = conn.execute("SELECT MIN(next_retry_at) FROM outbox").fetchone()[0]
+        return None if next_retry_at is None else max(0.0, next_retry_at - time.time())
+
+class SyncWorker:
+    """
+    Drains the outbox on a background thread.
+
+    The worker sleeps until the earliest queued session is due (or poll_interval
+    passes), then calls drain_fn, which uploads what it can. wake() makes it run
+    immediately, e.g. right after a session was queued.
+    """
+    def __init__(self, outbox, drain_fn, poll_interval=30.0):
+        """
+        Args:
+            outbox (SyncOutbox): The queue to watch.
+            drain_fn (callable): Uploads due sessions; called without arguments on the worker thread.
+                May return a number of seconds to wait before the next attempt (e.g. while offline).
+            poll_interval (float): Longest sleep between drain attempts, in seconds.
+        """
+        self.outbox = outbox
+        self.drain_fn = drain_fn
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="SyncWorker", daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            retry_after = None
+            try:
+                retry_after = self.drain_fn()
+            except Exception as e:
+                logging.error(f"Background sync failed: {e}", exc_info=True)
+            try:
+                wait = self.outbox.seconds_until_due()
+            except sqlite3.Error as e:
+                logging.error(f"Could not read the sync outbox: {e}")
+                wait = None
+            if wait is not None and retry_after:
+                wait = max(wait, retry_after)
+            # Sleep until the next session is due, never longer than poll_interval
+            self._wake.wait(self.poll_interval if wait is None else min(self.poll_interval, max(1.0, wait)))
+            self._wake.clear()
@@ -2,15 +2,16 @@
 
 import os
 import cv2
-import csv
+import time
 import logging
-import numpy as np
+import model_registry
+from frame_grabber import FrameGrabber
+from capture_quality import create_quality_gate
+from image_writer import AsyncImageWriter
+from training_store import StudentPack, pack_path
+from face_preprocessing import create_preprocessor, mark_prepared
 from settings import load_settings
-
-# --- DNN Model Configuration ---
-PROTOTXT_PATH = "deploy.prototxt.txt"
-WEIGHTS_PATH = "res10_300x300_ssd_iter_140000.caffemodel"
-CONFIDENCE_THRESHOLD = 0.7  # Increased for better quality captures
+from student_index import get_student_index
 
 def TakeImage(enrollment, name, train_path, details_csv_path, q):
     """
@@ -24,97 +25,114 @@ def TakeImage(enrollment, name, train_path, details_csv_path, q):
         details_csv_path (str): Path to the CSV file to save student details.
         q (queue.Queue): A queue to send progress and status updates to the UI.
     """
-    cam = None
+    grabber = None
+    writer = None
     success = False
     try:
-        # Check if model files exist
-        if not os.path.exists(PROTOTXT_PATH) or not os.path.exists(WEIGHTS_PATH):
-            raise FileNotFoundError("DNN model files (prototxt/caffemodel) not found.")
-            
+        existing_name = get_student_index(details_csv_path).name_of(enrollment)
+        if existing_name is not None and existing_name != name:
+            q.put({"type": "status", "text": f"Note: enrollment {enrollment} is already registered as '{existing_name}'."})
+
+        # Load settings to get the correct camera index and detector backend
+        app_settings = load_settings()
         q.put({"type": "status", "text": "Loading face detection model..."})
-        net = cv2.dnn.readNetFromCaffe(PROTOTXT_PATH, WEIGHTS_PATH)
+        detector = model_registry.get_detector(app_settings)
+        preprocessor = create_preprocessor(app_settings)
         
-        # Load settings to get the correct camera index
-        app_settings = load_settings()
         camera_index = app_settings.get("camera_index", 0)
         q.put({"type": "status", "text": f"Initializing camera index {camera_index}..."})
 
-        cam = cv2.VideoCapture(camera_index)
-        if not cam.isOpened():
-            raise IOError(f"Cannot open webcam at index {camera_index}. Check settings.")
+        grabber = FrameGrabber(camera_index, max_queue_size=app_settings.get("frame_queue_size", 2)).start()
+        quality_gate = create_quality_gate(app_settings)
 
         sample_num = 0
+        saved_names = []
         max_samples = 60  # Number of images to capture
+        timeout = app_settings.get("capture_timeout_seconds", 30)
         
-        # Create a specific directory for the student's images
+        # Samples go into one pack file for the student, or into the student's own image directory
+        pack = None
         directory = f"{enrollment}_{name}"
         path = os.path.join(train_path, directory)
-        os.makedirs(path, exist_ok=True)
+        if app_settings.get("training_store", "folders") == "packed":
+            pack = StudentPack()
+            writer = AsyncImageWriter(write_fn=pack.add, name="CaptureWriter").start()
+        else:
+            os.makedirs(path, exist_ok=True)
+            writer = AsyncImageWriter(name="CaptureWriter").start()
         
-        q.put({"type": "status", "text": "Look at the camera. Capturing images..."})
+        q.put({"type": "status", "text": "Look at the camera and turn your head slightly. Capturing images..."})
         q.put({"type": "progress_capture", "value": 0})
 
+        started = time.time()
+        last_reason = None
         while sample_num < max_samples:
-            ret, img = cam.read()
+            if time.time() - started > timeout:
+                q.put({"type": "status", "text": f"Capture timed out after {timeout} s."})
+                break
+            ret, img = grabber.read()
             if not ret:
                 q.put({"type": "status", "text": "Failed to grab frame from camera.", "is_error": True})
                 break
             
-            # --- Face Detection using DNN ---
-            (h, w) = img.shape[:2]
-            blob = cv2.dnn.blobFromImage(cv2.resize(img, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-            net.setInput(blob)
-            detections = net.forward()
-            
+            # --- Face Detection ---
             best_face = None
-            max_confidence = 0
-            
-            # Find the best (highest confidence) face in the frame
-            for i in range(0, detections.shape[2]):
-                confidence = detections[0, 0, i, 2]
-                if confidence > CONFIDENCE_THRESHOLD and confidence > max_confidence:
-                    max_confidence = confidence
-                    box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                    (startX, startY, endX, endY) = box.astype("int")
-                    # Ensure the detected box is within the image boundaries
-                    (startX, startY) = (max(0, startX), max(0, startY))
-                    (endX, endY) = (min(w - 1, endX), min(h - 1, endY))
-                    best_face = (startX, startY, endX - startX, endY - startY)
+            faces = detector.detect(img)
+            if faces:
+                # Keep only the best (highest confidence) face in the frame
+                best_face = max(faces, key=lambda face: face[4])[:4]
 
             if best_face is not None:
-                (x, y, face_w, face_h) = best_face
+                (startX, startY, endX, endY) = best_face
                 # Ensure the detected face region is valid
-                if face_w > 0 and face_h > 0:
-                    cv2.rectangle(img, (x, y), (x + face_w, y + face_h), (0, 255, 0), 2)
-                    sample_num += 1
-                    
-                    # Convert to grayscale and save the cropped face
+                if endX > startX and endY > startY:
+                    # Convert to grayscale and prepare the face exactly as the recognizer will see it
                     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-                    img_path = os.path.join(path, f"{name}_{enrollment}_{sample_num}.jpg")
-                    cv2.imwrite(img_path, gray[y:y+face_h, x:x+face_w])
-                    
-                    # Update progress bar in the UI via the queue
-                    q.put({"type": "progress_capture", "value": (sample_num / max_samples) * 100})
+                    face = preprocessor.crop(gray, best_face)
+                    # Only sharp, frontal, new-looking faces count towards max_samples
+                    last_reason = quality_gate.check(gray, best_face, face)
+                    color = (0, 255, 0) if last_reason is None else (0, 165, 255)
+                    cv2.rectangle(img, (startX, startY), (endX, endY), color, 2)
+                    if last_reason is None:
+                        sample_num += 1
+                        saved_names.append(f"{name}_{enrollment}_{sample_num}.jpg")
+                        # Encoding and writing happen on the writer thread, off the capture loop
+                        writer.submit(os.path.join(path, saved_names[-1]), face)
+                        
+                        # Update progress bar in the UI via the queue
+                        q.put({"type": "progress_capture", "value": (sample_num / max_samples) * 100})
 
             # Display capture progress on the camera feed window
             cv2.putText(img, f"Images Captured: {sample_num}/{max_samples}", (10, 30),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+            if last_reason is not None:
+                cv2.putText(img, f"Skipped: {last_reason}", (10, 60),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 165, 255), 2, cv2.LINE_AA)
             cv2.imshow("Capturing Face... (Press 'q' to exit)", img)
             
-            # Allow quitting with the 'q' key
-            if cv2.waitKey(100) & 0xFF == ord('q'):
+            # Allow quitting with the 'q' key; the loop is paced by the camera, not by a sleep
+            if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
+
+        writer.close()
+        if writer.errors:
+            sample_num -= len(writer.errors)
+            q.put({"type": "status", "text": f"{len(writer.errors)} image(s) could not be saved.", "is_error": True})
+        # Record that these samples are already prepared, so training does not crop or align them again
+        failed = {os.path.basename(key) for key, _ in writer.errors}
+        saved_names = [n for n in saved_names if n not in failed]
+        if pack is not None and len(pack):
+            pack.prepared = {n: preprocessor.signature() for n in pack.names}
+            os.makedirs(train_path, exist_ok=True)
+            pack.save(pack_path(train_path, enrollment, name))
+        elif pack is None and saved_names:
+            mark_prepared(path, saved_names, preprocessor.signature())
+        logging.info(f"Registration capture quality - {quality_gate.summary()} in {time.time() - started:.1f} s")
         
         # After the loop, check if any images were captured
         if sample_num > 0:
-            # Save student details to the CSV file
-            file_exists = os.path.isfile(details_csv_path)
-            with open(details_csv_path, "a+", newline='') as csvFile:
-                writer = csv.writer(csvFile)
-                # Write header only if the file is new/empty
-                if not file_exists or os.path.getsize(details_csv_path) == 0:
-                    writer.writerow(["Enrollment", "Name"])
-                writer.writerow([enrollment, name])
+            # Save student details to the roster (skipped if already registered under this name)
+            get_student_index(details_csv_path).add(enrollment, name)
             success = True
             q.put({"type": "status", "text": f"Successfully captured {sample_num} images."})
         else:
@@ -127,8 +145,11 @@ def TakeImage(enrollment, name, train_path, details_csv_path, q):
         success = False
     finally:
         # Crucial cleanup step: always release the camera and destroy windows
-        if cam is not None and cam.isOpened():
-            cam.release()
+        if writer is not None:
+            writer.close()
+        if grabber is not None:
+            grabber.stop()
+            logging.info(f"Registration capture stats - {grabber.summary()}")
         cv2.destroyAllWindows()
         # Notify the UI that the capture process is complete
         q.put({"type": "capture_complete", "success": success})
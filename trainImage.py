@@ -3,10 +3,24 @@
 import os
 import cv2
 import numpy as np
+import time
 import logging
+import argparse
+import queue
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+from lbph_matcher import LBPHModel, is_binary_model, model_exists
+from image_cache import FolderImageCache, IMAGE_CACHE_DIR
+from training_store import StudentPack, find_packs, pack_folder_name
+from model_pruning import prune_model, select_representative_faces
+from face_preprocessing import create_preprocessor, load_prepared
+from settings import load_settings
+import model_registry
 
-def TrainImage(train_path, label_path, q):
+PARALLEL_MIN_IMAGES = 200  # Below this many images to decode, a process pool costs more than it saves
+LOADER_CHUNK_SIZE = 64  # Images handed to a loader process at a time
+
+def TrainImage(train_path, label_path, q, samples_per_student=None):
     """
     Trains the LBPH face recognizer with the captured images.
     This function is designed to run in a separate thread.
@@ -15,14 +29,19 @@ def TrainImage(train_path, label_path, q):
         train_path (str): The root directory containing training images.
         label_path (str): The file path to save the trained model (.yml).
         q (queue.Queue): A queue to send progress and status updates to the UI.
+        samples_per_student (int): Keep only this many representative samples per
+            student (0 keeps all); defaults to the "samples_per_student" setting.
     """
     success = False
     try:
+        app_settings = load_settings()
+        if samples_per_student is None:
+            samples_per_student = app_settings.get("samples_per_student", 0)
         q.put({"type": "status", "text": "Loading images for training..."})
         q.put({"type": "progress_train", "value": 0})
         
         recognizer = cv2.face.LBPHFaceRecognizer_create()
-        faces, ids = get_images_and_labels(train_path, q)
+        faces, ids = get_images_and_labels(train_path, q, preprocessor=create_preprocessor(app_settings))
         
         if not faces:
             raise ValueError("No images found to train. Please capture images for at least one student first.")
@@ -36,8 +55,15 @@ def TrainImage(train_path, label_path, q):
         q.put({"type": "progress_train", "value": 100})
         
         # Save the trained model to the specified file.
-        os.makedirs(os.path.dirname(label_path), exist_ok=True)
-        recognizer.save(label_path)
+        if samples_per_student:
+            model = LBPHModel.from_recognizer(recognizer)
+            pruned = prune_model(model, samples_per_student)
+            q.put({"type": "status", "text": f"Kept {pruned.labels.shape[0]} of {model.labels.shape[0]} samples "
+                                             f"(up to {samples_per_student} per student)."})
+            os.makedirs(os.path.dirname(label_path) or ".", exist_ok=True)
+            save_model(pruned, label_path)
+        else:
+            save_recognizer(recognizer, label_path)
         
         success = True
         
@@ -49,42 +75,317 @@ def TrainImage(train_path, label_path, q):
         # Notify the UI that training is complete.
         q.put({"type": "train_complete", "success": success})
 
-def get_images_and_labels(path, q):
+def UpdateStudent(train_path, label_path, enrollment, q, samples_per_student=None):
+    """
+    Adds one student's images to the existing model with LBPH's update(), so
+    registering a student does not re-read and retrain everybody else. If the
+    student is already in the model, their old samples are replaced. Without
+    an existing model this falls back to a full TrainImage().
+
+    Args:
+        train_path (str): The root directory containing training images.
+        label_path (str): The trained model file (.yml) to update.
+        enrollment (str): The enrollment number of the student to add or replace.
+        q (queue.Queue): A queue to send progress and status updates to the UI.
+        samples_per_student (int): Representative samples to keep for the student
+            (0 keeps all); defaults to the "samples_per_student" setting.
+    """
+    app_settings = load_settings()
+    if samples_per_student is None:
+        samples_per_student = app_settings.get("samples_per_student", 0)
+    if not model_exists(label_path):
+        TrainImage(train_path, label_path, q, samples_per_student)
+        return
+
+    success = False
+    try:
+        label = int(enrollment)
+        q.put({"type": "status", "text": f"Loading images of student {enrollment}..."})
+        q.put({"type": "progress_train", "value": 0})
+        faces, ids = get_images_and_labels(train_path, q, enrollment=enrollment,
+                                           preprocessor=create_preprocessor(app_settings))
+        if not faces:
+            raise ValueError(f"No images found for enrollment {enrollment}. Please capture images first.")
+
+        if is_binary_model(label_path):
+            # Binary models are edited directly: drop the old samples, append the new histograms.
+            # Read, not mapped, so nothing in this process keeps the replaced version open.
+            model = LBPHModel.from_file(label_path, mmap=False)
+            faces, ids = select_representative_faces(faces, ids, samples_per_student, model)
+            if label in model.labels:
+                q.put({"type": "status", "text": f"Replacing existing samples of student {enrollment}..."})
+                model = model.without_labels([label])
+            q.put({"type": "status", "text": f"Adding {len(faces)} images to the model..."})
+            model = model.with_samples([model.histogram(face) for face in faces], ids)
+            q.put({"type": "progress_train", "value": 100})
+            save_model(model, label_path)
+            success = True
+            return
+
+        # The app always trains with the default LBPH parameters, which select_representative_faces uses too
+        faces, ids = select_representative_faces(faces, ids, samples_per_student)
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(label_path)
+        if label in recognizer.getLabels():
+            # LBPH cannot forget samples, so the replacement is assembled in memory and saved once;
+            # the deployed model keeps the old samples until the new ones are safely in place
+            q.put({"type": "status", "text": f"Replacing existing samples of student {enrollment}..."})
+            model = LBPHModel.from_recognizer(recognizer).without_labels([label])
+            # Histograms computed by OpenCV itself, exactly as update() would have stored them
+            added = cv2.face.LBPHFaceRecognizer_create()
+            added.train(faces, np.array(ids))
+            added = LBPHModel.from_recognizer(added)
+            q.put({"type": "status", "text": f"Adding {len(faces)} images to the model..."})
+            model = model.with_samples(added.histograms, added.labels)
+            q.put({"type": "progress_train", "value": 100})
+            save_model(model, label_path)
+            success = True
+            return
+
+        q.put({"type": "status", "text": f"Adding {len(faces)} images to the model..."})
+        recognizer.update(faces, np.array(ids))
+        q.put({"type": "progress_train", "value": 100})
+
+        save_recognizer(recognizer, label_path)
+        success = True
+
+    except Exception as e:
+        logging.error(f"Error during incremental training: {e}", exc_info=True)
+        q.put({"type": "status", "text": f"Error during training: {e}", "is_error": True})
+        success = False
+    finally:
+        # Notify the UI that training is complete.
+        q.put({"type": "train_complete", "success": success})
+
+def remove_student(label_path, enrollment):
+    """
+    Removes every sample of one student from the trained model file.
+
+    Returns:
+        int: The number of samples removed.
+    """
+    model = LBPHModel.from_file(label_path, mmap=False)
+    pruned = model.without_labels([int(enrollment)])
+    removed = len(model.labels) - len(pruned.labels)
+    if removed:
+        save_model(pruned, label_path)
+    return removed
+
+def save_model(model, label_path):
+    """
+    Saves an LBPHModel to label_path after dropping the model registry's cached
+    copy, so this process does not keep the replaced binary version mapped.
+    """
+    model_registry.evict(label_path)
+    model.save(label_path)
+
+def save_recognizer(recognizer, label_path):
+    """Saves a trained recognizer in the format implied by label_path, replacing the model atomically."""
+    if is_binary_model(label_path):
+        save_model(LBPHModel.from_recognizer(recognizer), label_path)
+        return
+    model_registry.evict(label_path)
+    os.makedirs(os.path.dirname(label_path) or ".", exist_ok=True)
+    base, ext = os.path.splitext(label_path)
+    tmp_path = f"{base}.tmp{ext}"  # The extension tells OpenCV which format to write
+    recognizer.save(tmp_path)
+    os.replace(tmp_path, label_path)
+
+def read_face_image(image_path):
+    """
+    Decodes one training image to grayscale and extracts its student ID.
+    Runs in the loader's worker processes, so it must stay a top-level function.
+
+    Returns:
+        tuple: (student_id, face) or (None, error message) if the file is unusable.
+    """
+    try:
+        # Open the image in grayscale format.
+        pil_image = Image.open(image_path).convert('L')
+        image_np = np.array(pil_image, 'uint8')
+        
+        # Extract the student ID from the filename (e.g., Name_123_1.jpg -> 123)
+        student_id = int(os.path.basename(image_path).split('_')[1])
+        return student_id, image_np
+    except Exception as e:
+        return None, str(e)
+
+class ProgressReporter:
+    """Sends progress_train messages only when the bar visibly moves, instead of once per file."""
+    def __init__(self, q, total, start=0, end=50, min_interval=0.2):
+        self.q = q
+        self.total = total
+        self.start = start
+        self.end = end
+        self.min_interval = min_interval
+        self._last_value = None
+        self._last_time = 0.0
+
+    def update(self, done):
+        value = self.start + (done / self.total) * (self.end - self.start) if self.total else self.end
+        now = time.time()
+        if done == self.total or (int(value) != self._last_value and now - self._last_time >= self.min_interval):
+            self.q.put({"type": "progress_train", "value": value})
+            self._last_value, self._last_time = int(value), now
+
+def get_images_and_labels(path, q, enrollment=None, cache_dir=IMAGE_CACHE_DIR, workers=None, preprocessor=None):
     """
     Reads all image files from the training path, extracts face data and student IDs.
+    If enrollment is given, only that student's folders (<enrollment>_<name>) are read.
+    With a preprocessor, every face is prepared like a live crop; images marked as
+    saved already prepared are only resized. The image cache keeps the files' own
+    pixels, so changing the face settings needs no cache rebuild.
+
+    Decoded images are kept in a per-folder cache keyed by file name, mtime and
+    size, so only new or changed images are decoded; those are spread over a
+    process pool when there are enough of them to be worth it. Students stored
+    as packs are read in one go; a student with both a pack and an image folder
+    is trained from whichever was written last.
     """
-    # Find all image paths recursively in the training directory.
-    image_paths = [os.path.join(dirpath, f)
-                   for dirpath, dirnames, filenames in os.walk(path)
-                   for f in filenames if f.endswith(('.jpg', '.png'))]
+    pack_paths = [p for p in find_packs(path, enrollment) if _pack_is_current(p, path)]
+    packs = [StudentPack.load(p) for p in pack_paths]
+    packed_folders = {pack_folder_name(p) for p in pack_paths}
+
+    # Find all image paths recursively in the training directory, grouped by folder.
+    folders = []
+    for dirpath, dirnames, filenames in os.walk(path):
+        names = sorted(f for f in filenames if f.endswith(('.jpg', '.png')))
+        if enrollment is not None and not os.path.basename(dirpath).startswith(f"{enrollment}_"):
+            continue
+        if os.path.dirname(os.path.normpath(dirpath)) == os.path.normpath(path) and os.path.basename(dirpath) in packed_folders:
+            continue
+        if names:
+            folders.append((dirpath, names))
     
+    prepare = preprocessor.prepare_saved if preprocessor is not None else (lambda face, signature: face)
     faces, ids = [], []
-    total_images = len(image_paths)
+    for pack in packs:
+        faces.extend(prepare(face, pack.prepared.get(name)) for name, face in zip(pack.names, pack.faces))
+        ids.extend(pack.ids)
+    total_images = sum(len(names) for _, names in folders)
     
     if total_images == 0:
+        if faces:
+            q.put({"type": "status", "text": f"Loaded {len(faces)} images from {len(packs)} packed students. Now starting training..."})
         return faces, ids
 
-    for i, image_path in enumerate(image_paths):
-        try:
-            # Open the image in grayscale format.
-            pil_image = Image.open(image_path).convert('L')
-            image_np = np.array(pil_image, 'uint8')
-            
-            # Extract the student ID from the filename (e.g., Name_123_1.jpg -> 123)
-            student_id = int(os.path.basename(image_path).split('_')[1])
-            
-            faces.append(image_np)
-            ids.append(student_id)
-            
-            # Report progress for the image loading phase (0% to 50% of the bar).
-            # This provides feedback to the user that something is happening.
-            progress = ((i + 1) / total_images) * 50
-            q.put({"type": "progress_train", "value": progress})
-            if (i + 1) % 50 == 0: # Update status label periodically
-                q.put({"type": "status", "text": f"Loading image {i+1}/{total_images}..."})
-
-        except Exception as e:
-            logging.warning(f"Skipping file {image_path} due to error: {e}")
+    # Serve unchanged images from the cache and collect the ones that need decoding
+    caches, loaded, missing = {}, {}, []
+    for dirpath, names in folders:
+        cache = FolderImageCache.for_folder(dirpath, path, cache_dir).load() if cache_dir else None
+        caches[dirpath] = cache
+        for f in names:
+            image_path = os.path.join(dirpath, f)
+            try:
+                stat = os.stat(image_path)
+            except OSError as e:
+                logging.warning(f"Skipping file {image_path} due to error: {e}")
+                continue
+            hit = cache.get(f, stat) if cache else None
+            if hit is not None:
+                loaded[image_path] = hit
+            else:
+                missing.append((image_path, stat))
+        if cache:
+            cache.retain(names)
+    if loaded:
+        q.put({"type": "status", "text": f"{len(loaded)}/{total_images} images unchanged since last training (cached)."})
+
+    progress = ProgressReporter(q, total_images)
+    progress.update(len(loaded))
+    missing_paths = [image_path for image_path, _ in missing]
+    if len(missing_paths) >= PARALLEL_MIN_IMAGES and (workers is None or workers > 1):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(read_face_image, missing_paths, chunksize=LOADER_CHUNK_SIZE)
+            decoded = _collect_decoded(missing, results, caches, loaded, q, progress)
+    else:
+        decoded = _collect_decoded(missing, map(read_face_image, missing_paths), caches, loaded, q, progress)
+
+    for cache in caches.values():
+        if cache:
+            try:
+                cache.save()
+            except OSError as e:
+                logging.warning(f"Could not write image cache {cache.cache_path}: {e}")
+
+    for dirpath, names in folders:
+        prepared = load_prepared(dirpath) if preprocessor is not None else {}
+        for f in names:
+            hit = loaded.get(os.path.join(dirpath, f))
+            if hit is not None:
+                ids.append(hit[0])
+                faces.append(prepare(hit[1], prepared.get(f)))
             
-    q.put({"type": "status", "text": f"Loaded {len(faces)} images. Now starting training..."})
+    packed = f", {len(packs)} packed students" if packs else ""
+    q.put({"type": "status", "text": f"Loaded {len(faces)} images ({decoded} decoded{packed}). Now starting training..."})
     return faces, ids
+
+def _pack_is_current(pack_path, train_path):
+    """
+    Returns False if the student's image folder holds images newer than the pack,
+    e.g. after capturing the student again in folder mode, so the folder is used instead.
+    """
+    folder = os.path.join(train_path, pack_folder_name(pack_path))
+    if not os.path.isdir(folder):
+        return True
+    try:
+        newest = max((entry.stat().st_mtime for entry in os.scandir(folder)
+                      if entry.name.endswith(('.jpg', '.png'))), default=None)
+        if newest is None:
+            return True
+        use_pack = os.path.getmtime(pack_path) >= newest
+    except OSError as e:
+        logging.warning(f"Could not compare {pack_path} with {folder}: {e}")
+        return True
+    logging.warning(f"Student {pack_folder_name(pack_path)} has both a pack and an image folder; "
+                    f"training from the newer {'pack' if use_pack else 'folder'}.")
+    return use_pack
+
+def _collect_decoded(missing, results, caches, loaded, q, progress):
+    """Stores freshly decoded images in `loaded` and their folder caches. Returns how many succeeded."""
+    decoded = 0
+    for i, ((image_path, stat), (student_id, result)) in enumerate(zip(missing, results)):
+        if student_id is None:
+            logging.warning(f"Skipping file {image_path} due to error: {result}")
+        else:
+            loaded[image_path] = (student_id, result)
+            cache = caches[os.path.dirname(image_path)]
+            if cache:
+                cache.put(os.path.basename(image_path), stat, student_id, result)
+            decoded += 1
+        progress.update(len(loaded) + (i + 1 - decoded))
+        if (i + 1) % 1000 == 0: # Update status label periodically
+            q.put({"type": "status", "text": f"Decoded image {i+1}/{len(missing)}..."})
+    return decoded
+
+def main():
+    parser = argparse.ArgumentParser(description="Train, update or prune the LBPH face recognition model.")
+    parser.add_argument("--images", default="TrainingImage", help="Root directory of the training images.")
+    parser.add_argument("--model", default=os.path.join("TrainingImageLabel", "Trainner.yml"), help="Trained LBPH model file.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--rebuild", action="store_true", help="Retrain the model from every student's images.")
+    action.add_argument("--update", metavar="ENROLLMENT", help="Add or replace one student's samples in the model.")
+    action.add_argument("--remove", metavar="ENROLLMENT", help="Remove one student's samples from the model.")
+    parser.add_argument("--samples-per-student", type=int, default=None,
+                        help="Keep only this many representative samples per student (0 = all; default: from settings).")
+    args = parser.parse_args()
+
+    if args.remove:
+        print(f"Removed {remove_student(args.model, args.remove)} sample(s) of student {args.remove}.")
+        return
+
+    q = queue.Queue()
+    if args.rebuild:
+        TrainImage(args.images, args.model, q, args.samples_per_student)
+    else:
+        UpdateStudent(args.images, args.model, args.update, q, args.samples_per_student)
+    while not q.empty():
+        message = q.get()
+        if message["type"] == "status":
+            print(message["text"])
+        elif message["type"] == "train_complete":
+            print("Done." if message["success"] else "Training failed, see the log for details.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
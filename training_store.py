@@ -0,0 +1,176 @@
+# training_store.py
+
+"""
+Packed per-student training images.
+
+Instead of one JPEG per sample in TrainingImage/<enrollment>_<name>/, a
+student's faces can be kept in a single uncompressed TrainingImage/
+<enrollment>_<name>.pack.npz holding the decoded pixels and an index (sample
+names, student IDs and shapes). Training then reads one file per student
+sequentially and decodes nothing, and a backup copies a few dozen files
+instead of thousands. When a student has both a pack and a folder, training
+uses whichever was written last and logs a warning.
+
+Usage:
+    python training_store.py --import             # pack every student folder
+    python training_store.py --export             # write the packs back out as JPEG folders
+"""
+
+import os
+import cv2
+import json
+import shutil
+import argparse
+import logging
+import threading
+import numpy as np
+from lbph_matcher import load_gray
+from face_preprocessing import load_prepared, mark_prepared
+
+PACK_SUFFIX = ".pack.npz"
+
+def pack_path(train_path, enrollment, name):
+    """Returns the pack file of one student, next to where its image folder would be."""
+    return os.path.join(train_path, f"{enrollment}_{name}{PACK_SUFFIX}")
+
+def find_packs(train_path, enrollment=None):
+    """Lists the student packs directly below train_path, optionally only one enrollment's."""
+    if not os.path.isdir(train_path):
+        return []
+    return [os.path.join(train_path, f) for f in sorted(os.listdir(train_path))
+            if f.endswith(PACK_SUFFIX) and (enrollment is None or f.startswith(f"{enrollment}_"))]
+
+def pack_folder_name(path):
+    """Returns the <enrollment>_<name> folder name a pack replaces."""
+    return os.path.basename(path)[:-len(PACK_SUFFIX)]
+
+class StudentPack:
+    """The faces of one student: sample names, student IDs and grayscale images, kept in order."""
+    def __init__(self):
+        self.names = []
+        self.ids = []
+        self.faces = []
+        self.prepared = {}  # {sample name: preprocessing signature} for samples saved already prepared
+        self._lock = threading.Lock()
+
+    def add(self, name, face, student_id=None):
+        """
+        Appends one sample. Matches AsyncImageWriter's write_fn(key, image) contract,
+        in which case the student ID is read from the sample name (Name_123_1.jpg -> 123).
+        """
+        if student_id is None:
+            student_id = int(os.path.basename(name).split('_')[1])
+        with self._lock:
+            self.names.append(os.path.basename(name))
+            self.ids.append(int(student_id))
+            self.faces.append(np.ascontiguousarray(face, dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.faces)
+
+    @classmethod
+    def load(cls, path):
+        pack = cls()
+        with np.load(path) as data:
+            # Indexing an NpzFile re-reads the member, so pull each array out once
+            names, ids, shapes, pixels = (data[k] for k in ("names", "ids", "shapes", "pixels"))
+            prepared = data["prepared"] if "prepared" in data.files else None  # Absent in packs older than the marker
+        offsets = np.concatenate(([0], np.cumsum(shapes.prod(axis=1))))
+        pack.names = names.tolist()
+        pack.ids = ids.tolist()
+        pack.faces = [pixels[offsets[i]:offsets[i + 1]].reshape(shapes[i]) for i in range(len(pack.names))]
+        pack.prepared = json.loads(str(prepared)) if prepared is not None else {}
+        return pack
+
+    def save(self, path):
+        """Writes the pack, replacing an existing one atomically."""
+        with self._lock:
+            tmp_path = path[:-len(".npz")] + ".tmp.npz"
+            np.savez(tmp_path,
+                     names=np.array(self.names, dtype=str),
+                     ids=np.array(self.ids, dtype=np.int64),
+                     shapes=np.array([f.shape for f in self.faces], dtype=np.int64).reshape(-1, 2),
+                     pixels=np.concatenate([f.ravel() for f in self.faces]) if self.faces else np.zeros(0, np.uint8),
+                     prepared=np.array(json.dumps(self.prepared)))
+            os.replace(tmp_path, path)
+
+def import_folders(train_path, remove_folders=False):
+    """
+    Packs every <enrollment>_<name> image folder below train_path.
+
+    Returns:
+        list: (folder name, samples packed) per student.
+    """
+    imported = []
+    for folder in sorted(os.listdir(train_path)):
+        folder_path = os.path.join(train_path, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        pack = StudentPack()
+        prepared = load_prepared(folder_path)
+        for f in sorted(os.listdir(folder_path)):
+            if not f.endswith(('.jpg', '.png')):
+                continue
+            try:
+                pack.add(f, load_gray(os.path.join(folder_path, f)))
+                if f in prepared:
+                    pack.prepared[f] = prepared[f]
+            except Exception as e:
+                logging.warning(f"Skipping file {os.path.join(folder_path, f)} due to error: {e}")
+        if not len(pack):
+            continue
+        pack.save(os.path.join(train_path, folder + PACK_SUFFIX))
+        if remove_folders:
+            shutil.rmtree(folder_path)
+        imported.append((folder, len(pack)))
+    return imported
+
+def export_packs(train_path, remove_packs=False):
+    """
+    Writes every pack below train_path back out as a folder of images, overwriting
+    files of the same name. JPEG samples are re-encoded, so they are not bit-identical
+    to the originally captured files.
+
+    Returns:
+        list: (folder name, samples exported) per student.
+    """
+    exported = []
+    for path in find_packs(train_path):
+        pack = StudentPack.load(path)
+        folder_path = os.path.join(train_path, pack_folder_name(path))
+        os.makedirs(folder_path, exist_ok=True)
+        for name, face in zip(pack.names, pack.faces):
+            if not cv2.imwrite(os.path.join(folder_path, name), face):
+                raise IOError(f"Could not write {os.path.join(folder_path, name)}.")
+        signatures = {json.dumps(sig, sort_keys=True): sig for sig in pack.prepared.values()}
+        for key, signature in signatures.items():
+            mark_prepared(folder_path, [n for n, sig in pack.prepared.items() if json.dumps(sig, sort_keys=True) == key], signature)
+        if remove_packs:
+            os.remove(path)
+        exported.append((pack_folder_name(path), len(pack)))
+    return exported
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert training images between per-student folders and packed files.")
+    parser.add_argument("--images", default="TrainingImage", help="Root directory of the training images.")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--import", dest="import_folders", action="store_true", help="Pack every student image folder.")
+    action.add_argument("--export", action="store_true", help="Write every pack back out as an image folder.")
+    parser.add_argument("--remove-source", action="store_true",
+                        help="Delete the folders (on import) or packs (on export) once converted.")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.images):
+        parser.error(f"{args.images} is not a directory.")
+    if args.import_folders:
+        converted = import_folders(args.images, args.remove_source)
+    else:
+        converted = export_packs(args.images, args.remove_source)
+    for folder, count in converted:
+        print(f"  {folder}: {count} samples")
+    print(f"{'Packed' if args.import_folders else 'Exported'} {len(converted)} student(s), "
+          f"{sum(count for _, count in converted)} samples.")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()